@@ -0,0 +1,98 @@
+"""Compares the old connect-per-call database access with the pooled WAL connection layer.
+
+Each "poll" replays the queries one poll_chat cycle issues: read the chat settings,
+read the last message id, insert a handful of messages, read the messages due for a
+deletion check and run autoclean.
+
+Usage: python benchmarks/bench_db_connections.py [--polls 2000] [--messages-per-poll 5]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(tempfile.mkdtemp(prefix="tmb_bench_"))
+os.environ["DB_FILE"] = str(BENCH_DIR / "pooled.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database import queries  # noqa: E402
+from src.database.connection import close_pool  # noqa: E402
+from src.database.migrations import init_db  # noqa: E402
+
+USER_ID, PHONE, CHAT_ID = 1, "+10000000000", 1001
+
+
+def legacy_poll(db_file: Path, next_id: int, per_poll: int) -> int:
+    """One poll cycle using a fresh sqlite3 connection for every query, as before."""
+    with sqlite3.connect(db_file) as conn:
+        conn.row_factory = sqlite3.Row
+        conn.execute("SELECT * FROM monitored_chats WHERE user_id=? AND session_phone=? AND chat_id=?", (USER_ID, PHONE, CHAT_ID)).fetchone()
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("SELECT MAX(telethon_message_id) FROM messages WHERE session_phone=? AND chat_id=?", (PHONE, CHAT_ID)).fetchone()
+    for _ in range(per_poll):
+        with sqlite3.connect(db_file) as conn:
+            conn.execute("INSERT OR IGNORE INTO messages (telethon_message_id, chat_id, session_phone, text, sender_id, date, file_path, file_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (next_id, CHAT_ID, PHONE, "hello", 42, datetime.now(timezone.utc), None, None))
+            conn.commit()
+        next_id += 1
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("SELECT id, telethon_message_id, text, file_path, date FROM messages WHERE session_phone=? AND chat_id=? AND status='active' ORDER BY date DESC LIMIT 200", (PHONE, CHAT_ID)).fetchall()
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("DELETE FROM messages WHERE id IN (SELECT id FROM messages WHERE session_phone=? AND chat_id=? ORDER BY date DESC LIMIT -1 OFFSET ?)", (PHONE, CHAT_ID, 1000))
+        conn.commit()
+    return next_id
+
+
+def pooled_poll(next_id: int, per_poll: int) -> int:
+    """The same poll cycle through the db_* functions on the pooled connections."""
+    queries.db_get_chat_settings(USER_ID, PHONE, CHAT_ID)
+    queries.db_get_last_message_id(PHONE, CHAT_ID)
+    for _ in range(per_poll):
+        queries.db_add_message(next_id, CHAT_ID, PHONE, "hello", 42, datetime.now(timezone.utc), None, None)
+        next_id += 1
+    queries.db_get_due_deletion_checks(PHONE, CHAT_ID, int(time.time()), 200)
+    queries.db_autoclean_messages(PHONE, CHAT_ID, 1000)
+    return next_id
+
+
+def run(label: str, polls: int, poll_fn) -> float:
+    next_id = 1
+    started = time.perf_counter()
+    for _ in range(polls):
+        next_id = poll_fn(next_id)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {polls} polls in {elapsed:7.2f}s  ->  {polls / elapsed:9.1f} polls/s, {elapsed / polls * 1000:6.2f} ms/poll")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, default=2000)
+    parser.add_argument("--messages-per-poll", type=int, default=5)
+    args = parser.parse_args()
+
+    init_db()
+    queries.db_add_chat(USER_ID, PHONE, CHAT_ID, "bench", "chat")
+
+    # The legacy database gets the same schema but keeps the default rollback journal.
+    legacy_db = BENCH_DIR / "legacy.db"
+    source = sqlite3.connect(os.environ["DB_FILE"])
+    with sqlite3.connect(legacy_db) as dest:
+        # FTS5 creates its own shadow tables (messages_fts_*) along with the virtual table.
+        for (sql,) in source.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'messages_fts_%'"):
+            dest.execute(sql)
+        dest.execute("INSERT INTO monitored_chats (user_id, session_phone, chat_id, title, type) VALUES (?, ?, ?, ?, ?)", (USER_ID, PHONE, CHAT_ID, "bench", "chat"))
+    source.close()
+
+    per_poll = args.messages_per_poll
+    before = run("before: connect per call", args.polls, lambda n: legacy_poll(legacy_db, n, per_poll))
+    after = run("after: pooled WAL", args.polls, lambda n: pooled_poll(n, per_poll))
+    print(f"speedup: {before / after:.1f}x  (database files in {BENCH_DIR})")
+    close_pool()
+
+
+if __name__ == "__main__":
+    main()
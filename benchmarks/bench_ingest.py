@@ -0,0 +1,68 @@
+"""Measures message ingest throughput for catch-up bursts.
+
+Compares one transaction per message (db_add_message) with one transaction per poll
+batch (db_add_messages).
+
+Usage: python benchmarks/bench_ingest.py [--burst 10000] [--rounds 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(tempfile.mkdtemp(prefix="tmb_bench_"))
+os.environ["DB_FILE"] = str(BENCH_DIR / "ingest.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database import queries  # noqa: E402
+from src.database.connection import close_pool  # noqa: E402
+from src.database.migrations import init_db  # noqa: E402
+
+USER_ID, PHONE = 1, "+10000000000"
+
+
+def make_burst(first_id: int, size: int) -> list[tuple]:
+    now = datetime.now(timezone.utc)
+    return [(first_id + i, f"message {first_id + i}", 42, now, None, None) for i in range(size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    init_db()
+    for chat_id in (1, 2):
+        queries.db_add_chat(USER_ID, PHONE, chat_id, f"bench {chat_id}", "chat")
+
+    next_id = 1
+    for round_no in range(1, args.rounds + 1):
+        rows = make_burst(next_id, args.burst)
+        next_id += args.burst
+
+        started = time.perf_counter()
+        for r in rows:
+            queries.db_add_message(r[0], 1, PHONE, *r[1:])
+        per_row = time.perf_counter() - started
+
+        started = time.perf_counter()
+        queries.db_add_messages(PHONE, 2, rows)
+        batched = time.perf_counter() - started
+
+        print(
+            f"round {round_no}: {args.burst} msgs  "
+            f"per-row {per_row:6.2f}s ({args.burst / per_row:9.0f} msg/s)  "
+            f"batched {batched:6.3f}s ({args.burst / batched:9.0f} msg/s)  "
+            f"speedup {per_row / batched:5.1f}x"
+        )
+
+    assert queries.db_get_last_message_id(PHONE, 2) == next_id - 1
+    close_pool()
+
+
+if __name__ == "__main__":
+    main()
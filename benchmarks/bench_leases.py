@@ -0,0 +1,157 @@
+"""Runs several lease-sharing nodes as separate processes on one local database file.
+
+Every node is a LeaseManager whose launch/halt only report to this script, so no
+Telegram session is needed. The script measures how long the nodes take to pick up
+all sessions, to reclaim the sessions of a node killed with SIGKILL (about the lease
+TTL), to rebalance after a node joins and to take over from a draining node (about one
+heartbeat). It also checks that no session ever runs on two nodes at once. POSIX only:
+draining is triggered with SIGTERM.
+
+Usage: python benchmarks/bench_leases.py [--nodes 3] [--sessions 60] [--ttl 3] [--heartbeat 0.5]
+"""
+import argparse
+import asyncio
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+USER_ID = 1
+
+
+def node_main(node_id: str, events, ttl: float, heartbeat: float):
+    """A node process; DB_FILE is inherited from the parent's environment."""
+    sys.path.insert(0, str(ROOT_DIR))
+    from src.services import leases
+
+    leases.LEASE_TTL, leases.LEASE_HEARTBEAT_INTERVAL = ttl, heartbeat
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    async def launch(user_id: int, session_phone: str):
+        events.put(('launch', node_id, session_phone, time.time()))
+
+    async def halt(user_id: int, session_phone: str):
+        events.put(('halt', node_id, session_phone, time.time()))
+
+    async def run():
+        manager = leases.LeaseManager(node_id, launch, halt)
+        manager.start()
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        await stop.wait()
+        await manager.drain()
+
+    asyncio.run(run())
+
+
+class Tracker:
+    """Follows which node runs each session from the nodes' launch/halt reports."""
+
+    def __init__(self, events):
+        self.events = events
+        self.owner: dict[str, str] = {}
+        self.overlaps = 0
+
+    def drain_events(self, timeout: float = 0.05):
+        try:
+            while True:
+                kind, node_id, session_phone, _ = self.events.get(timeout=timeout)
+                if kind == 'launch':
+                    if self.owner.get(session_phone) not in (None, node_id):
+                        self.overlaps += 1
+                        print(f"  OVERLAP: {session_phone} launched on {node_id} while running on {self.owner[session_phone]}")
+                    self.owner[session_phone] = node_id
+                elif self.owner.get(session_phone) == node_id:
+                    del self.owner[session_phone]
+                timeout = 0
+        except queue.Empty:
+            pass
+
+    def node_died(self, node_id: str):
+        self.drain_events()
+        self.owner = {s: n for s, n in self.owner.items() if n != node_id}
+
+    def counts(self) -> dict[str, int]:
+        result: dict[str, int] = {}
+        for node_id in self.owner.values():
+            result[node_id] = result.get(node_id, 0) + 1
+        return result
+
+
+def wait_for(tracker: Tracker, label: str, live: set[str], sessions: int, timeout: float = 120):
+    """Waits until every session runs on a live node and no node exceeds its even share."""
+    started = time.time()
+    while time.time() - started < timeout:
+        tracker.drain_events()
+        counts = tracker.counts()
+        share = math.ceil(sessions / len(live))
+        if sum(counts.values()) == sessions and set(counts) <= live and max(counts.values()) <= share:
+            print(f"{label:<28} {time.time() - started:6.2f}s  {dict(sorted(counts.items()))}")
+            return
+    print(f"{label:<28} TIMEOUT after {timeout}s  {dict(sorted(tracker.counts().items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=60)
+    parser.add_argument("--ttl", type=float, default=3.0)
+    parser.add_argument("--heartbeat", type=float, default=0.5)
+    args = parser.parse_args()
+
+    bench_dir = Path(tempfile.mkdtemp(prefix="tmb_bench_"))
+    os.environ["DB_FILE"] = str(bench_dir / "leases.db")
+    sys.path.insert(0, str(ROOT_DIR))
+    from src.database import queries
+    from src.database.connection import close_pool
+    from src.database.migrations import init_db
+
+    init_db()
+    for i in range(args.sessions):
+        phone = f"+1000000{i:04d}"
+        queries.db_add_session_credentials(USER_ID, phone, 1, "hash")
+        queries.db_set_monitoring_enabled(USER_ID, phone, True)
+    close_pool()
+
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    tracker = Tracker(events)
+    processes: dict[str, multiprocessing.Process] = {}
+
+    def start_node(node_id: str):
+        processes[node_id] = context.Process(target=node_main, args=(node_id, events, args.ttl, args.heartbeat))
+        processes[node_id].start()
+
+    for i in range(args.nodes):
+        start_node(f"node-{i}")
+    wait_for(tracker, f"{args.nodes} nodes start", set(processes), args.sessions)
+
+    processes["node-0"].kill()
+    processes.pop("node-0").join()
+    tracker.node_died("node-0")
+    wait_for(tracker, "node-0 killed (reclaim)", set(processes), args.sessions)
+
+    start_node(f"node-{args.nodes}")
+    wait_for(tracker, f"node-{args.nodes} joins (rebalance)", set(processes), args.sessions)
+
+    processes["node-1"].terminate()
+    processes.pop("node-1").join()
+    wait_for(tracker, "node-1 drains (takeover)", set(processes), args.sessions)
+
+    for process in processes.values():
+        process.terminate()
+    for process in processes.values():
+        process.join()
+    tracker.drain_events()
+    print(f"sessions left running: {len(tracker.owner)}  overlaps: {tracker.overlaps}")
+    assert tracker.overlaps == 0 and not tracker.owner
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Measures event loop lag while statistics queries run, blocking versus through the DB executor.
+
+A probe task sleeps for a short interval in a loop and records how late it wakes up.
+The same batch of db_calculate_chat_statistics calls is issued first directly on the
+loop (the old behaviour) and then through src.database.async_queries.
+
+Usage: python benchmarks/bench_loop_lag.py [--messages 300000] [--queries 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(tempfile.mkdtemp(prefix="tmb_bench_"))
+os.environ["DB_FILE"] = str(BENCH_DIR / "lag.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database import async_queries, queries  # noqa: E402
+from src.database.connection import close_pool  # noqa: E402
+from src.database.executor import shutdown_executor  # noqa: E402
+from src.database.migrations import init_db  # noqa: E402
+
+USER_ID, PHONE, CHAT_ID = 1, "+10000000000", 1001
+PROBE_INTERVAL = 0.005
+
+
+async def probe(samples: list[float], stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append(max(0.0, loop.time() - started - PROBE_INTERVAL) * 1000)
+
+
+async def measure(label: str, workload):
+    samples: list[float] = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(samples, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    started = time.perf_counter()
+    await workload()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1] if samples else 0.0
+    print(f"{label:<22} wall {elapsed:6.2f}s  probes {len(samples):5d}  loop lag max {max(samples, default=0):8.1f} ms  p99 {p99:8.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=300000)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    init_db()
+    queries.db_add_chat(USER_ID, PHONE, CHAT_ID, "bench", "chat")
+    now = datetime.now(timezone.utc)
+    queries.db_add_messages(PHONE, CHAT_ID, [(i, f"message {i}", 42, now, f"file{i}" if i % 7 == 0 else None, 1024) for i in range(1, args.messages + 1)])
+
+    async def blocking():
+        for _ in range(args.queries):
+            queries.db_calculate_chat_statistics(PHONE, CHAT_ID)
+            await asyncio.sleep(0)
+
+    async def offloaded():
+        await asyncio.gather(*(async_queries.db_calculate_chat_statistics(PHONE, CHAT_ID) for _ in range(args.queries)))
+
+    await measure("before: on the loop", blocking)
+    await measure("after: DB executor", offloaded)
+    shutdown_executor()
+    close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
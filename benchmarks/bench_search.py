@@ -0,0 +1,58 @@
+"""Measures full-text search latency over a synthetic message archive.
+
+Usage: python benchmarks/bench_search.py [--messages 1000000] [--chats 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(tempfile.mkdtemp(prefix="tmb_bench_"))
+os.environ["DB_FILE"] = str(BENCH_DIR / "search.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database import queries  # noqa: E402
+from src.database.connection import close_pool  # noqa: E402
+from src.database.migrations import init_db  # noqa: E402
+from src.utils.helpers import build_fts_query  # noqa: E402
+
+USER_ID, PHONE = 1, "+10000000000"
+VOCABULARY = [f"word{i}" for i in range(20000)]
+QUERIES = ["word17", "word42 word7", "word199", "word1999 word3", "word123", "word9"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--chats", type=int, default=50)
+    args = parser.parse_args()
+
+    init_db()
+    rng = random.Random(1)
+    per_chat = args.messages // args.chats
+    started = time.perf_counter()
+    for chat_id in range(1, args.chats + 1):
+        queries.db_add_chat(USER_ID, PHONE, chat_id, f"chat {chat_id}", "chat")
+        # Zipf-like word frequencies so some terms are common and others rare.
+        rows = [
+            (i, " ".join(VOCABULARY[int(rng.paretovariate(1.1)) % len(VOCABULARY)] for _ in range(12)), 42, 1700000000 + i, None, None)
+            for i in range(1, per_chat + 1)
+        ]
+        queries.db_add_messages(PHONE, chat_id, rows)
+    print(f"indexed {per_chat * args.chats} messages in {time.perf_counter() - started:.1f}s")
+
+    for text in QUERIES:
+        match_query = build_fts_query(text)
+        for label, chat_id in (("session", None), ("chat", 1)):
+            started = time.perf_counter()
+            hits = queries.db_search_messages(USER_ID, PHONE, match_query, 6, 0, chat_id=chat_id)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"{text!r:<18} {label:<8} first page: {len(hits)} hits in {elapsed:8.1f} ms")
+    close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,42 @@
 import asyncio
 import logging
+import signal
 import sys
+from contextlib import suppress
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
-from src.config import load_config
-from src.database.models import init_db
-from src.globals import monitoring_tasks
+from src.config import MONITOR_WORKERS, NODE_ID, RUN_DISPATCHER, load_config
+from src.database.connection import close_pool
+from src.database.executor import shutdown_executor
+from src.database.migrations import init_db
 from src.handlers import (
     add_chat_fsm,
     chat_management,
     connect_account_fsm,
+    search,
     session_management,
     statistics,
 )
+from src.services.bot_outbox import OutboundLimiter, report_outbox_stats
+from src.services.client_registry import close_all_clients
+from src.services.deletion_notifier import flush_deletion_notifications
+from src.services.loop_monitor import monitor_event_loop_lag
+from src.services.media_quota import run_media_quota_enforcer
+from src.services.monitor_control import restore_monitoring, shutdown_monitoring, use_monitor_workers, use_session_leases
+from src.services.scheduler import shutdown_scheduler
+from src.services.sharding import MonitorShards, outbox_limits
+
+async def wait_for_stop_signal():
+    """Blocks a monitor-only node until SIGINT or SIGTERM."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):  # Windows: Ctrl+C still interrupts the wait
+            loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
 
 async def main():
     """Main function to initialize and run the bot."""
@@ -24,6 +45,10 @@ async def main():
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
+    if not RUN_DISPATCHER and not NODE_ID:
+        logging.critical("RUN_DISPATCHER=0 needs a NODE_ID, or this node would duplicate every session. Exiting.")
+        sys.exit(1)
+
     # Initialize database
     init_db()
 
@@ -35,6 +60,15 @@ async def main():
         token=config.bot.token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+    processes = MONITOR_WORKERS + 1 if MONITOR_WORKERS > 0 else 1
+    outbox = OutboundLimiter(*outbox_limits(processes))
+    shards = None
+    if MONITOR_WORKERS > 0:
+        # This process only runs the dispatcher; supervisors run in the workers.
+        shards = MonitorShards(config.bot.token, MONITOR_WORKERS)
+        shards.start_workers()
+        use_monitor_workers(shards)
+    bot.session.middleware(outbox)
     dp = Dispatcher()
 
     # Register routers
@@ -43,25 +77,50 @@ async def main():
     dp.include_router(add_chat_fsm.router)
     dp.include_router(chat_management.router)
     dp.include_router(statistics.router)
+    dp.include_router(search.router)
+
+    if RUN_DISPATCHER:
+        # Drop pending updates
+        await bot.delete_webhook(drop_pending_updates=True)
 
-    # Drop pending updates
-    await bot.delete_webhook(drop_pending_updates=True)
+    if NODE_ID:
+        # Sessions are shared with the other instances on this database, and so is the bot token's limit.
+        def share_outbox(nodes: int):
+            logging.info(f"{nodes} live node(s); sending at 1/{nodes} of the global Bot API limit.")
+            outbox.set_global_limit(*outbox_limits(processes, nodes))
+            if shards is not None:
+                shards.set_cluster_nodes(nodes)
+
+        use_session_leases(NODE_ID, bot, on_live_nodes=share_outbox)
+
+    loop_monitor_task = asyncio.create_task(monitor_event_loop_lag())
+    # Quotas are enforced by the node running the dispatcher only, so no two evict at once.
+    media_quota_task = asyncio.create_task(run_media_quota_enforcer()) if RUN_DISPATCHER else None
+    outbox_report_task = asyncio.create_task(report_outbox_stats(outbox))
+    restore_task = asyncio.create_task(restore_monitoring(bot))
 
     try:
-        logging.info("Bot is starting...")
-        await dp.start_polling(bot)
+        if RUN_DISPATCHER:
+            logging.info("Bot is starting...")
+            await dp.start_polling(bot)
+        else:
+            logging.info(f"Monitor-only node {NODE_ID} is starting...")
+            await wait_for_stop_signal()
     finally:
         logging.info("Stopping monitoring tasks...")
-        tasks_to_await = []
-        for session_info in monitoring_tasks.values():
-            if session_info.get('supervisor'):
-                session_info['supervisor'].cancel()
-                tasks_to_await.append(session_info['supervisor'])
-
-        if tasks_to_await:
-            await asyncio.gather(*tasks_to_await, return_exceptions=True)
+        restore_task.cancel()
+        await shutdown_monitoring()
+        await shutdown_scheduler()
+        await flush_deletion_notifications()
+        await close_all_clients()
 
+        loop_monitor_task.cancel()
+        if media_quota_task:
+            media_quota_task.cancel()
+        outbox_report_task.cancel()
         await bot.session.close()
+        shutdown_executor()
+        close_pool()
         logging.info("Bot has been stopped.")
 
 if __name__ == "__main__":
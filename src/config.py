@@ -6,6 +6,10 @@ import sys
 
 from dotenv import load_dotenv
 
+# Settings below are read from the environment when this module is imported, so .env has
+# to be loaded first. Variables already set in the environment take precedence.
+load_dotenv()
+
 # --- Configuration Dataclasses ---
 @dataclass
 class BotConfig:
@@ -28,11 +32,13 @@ def load_config(path: str | None = None) -> Config:
 BASE_DIR = Path(__file__).resolve().parent.parent
 SESSIONS_DIR = BASE_DIR / "sessions"
 DOWNLOADS_DIR = BASE_DIR / "downloads"
-DB_FILE = BASE_DIR / "bot_database.db"
+MEDIA_STORE_DIR = DOWNLOADS_DIR / "store"  # Content-addressed files, sharded by hash prefix
+DB_FILE = Path(os.getenv("DB_FILE", BASE_DIR / "bot_database.db"))
 
 # Create necessary directories
 SESSIONS_DIR.mkdir(exist_ok=True)
 DOWNLOADS_DIR.mkdir(exist_ok=True)
+MEDIA_STORE_DIR.mkdir(exist_ok=True)
 
 
 # --- Default Settings ---
@@ -41,7 +47,92 @@ DEFAULT_INITIAL_FETCH = 10
 DEFAULT_AUTOCLEAN_LIMIT = 0  # 0 means disabled
 DEFAULT_DOWNLOAD_MEDIA = True
 DEFAULT_DETECT_DELETIONS = True
+DEFAULT_DELETION_CHECK_BUDGET = 2  # getMessages calls per chat per cycle spent on deletion checks
+DEFAULT_ADAPTIVE_POLLING = False
+DEFAULT_MIN_CHECK_FREQUENCY = 5  # Adaptive polling bounds, in seconds
+DEFAULT_MAX_CHECK_FREQUENCY = 300
+DEFAULT_MEDIA_QUOTA_MB = 0  # Per-chat media quota, 0 means unlimited
+DEFAULT_DELETION_DIGEST_MINUTES = 0  # 0 sends deletion alerts right away (coalesced)
 SUPERVISOR_SLEEP_INTERVAL = 30 # How often supervisor checks for new/removed chats
+CLIENT_IDLE_TIMEOUT = 300  # Seconds a client opened for UI actions stays connected after its last use
+LIVE_CLIENT_WAIT_TIMEOUT = 20  # Seconds a UI action waits for a starting supervisor to connect its client
+SESSION_STATUS_TTL = 600  # Seconds before cached session profile data is refreshed in the background
+SUPERVISOR_CONNECT_CONCURRENCY = 4  # Supervisors connecting to Telegram at once
+RESTORE_WAVE_SIZE = 5  # Supervisors started per wave when monitoring is restored at startup
+RESTORE_WAVE_INTERVAL = 10  # Seconds between restore waves, shortened to fit RESTORE_TIME_BUDGET
+RESTORE_TIME_BUDGET = 120  # Seconds within which every restored supervisor has been started
+MONITOR_WORKERS = int(os.getenv("MONITOR_WORKERS", "0"))  # Monitor worker processes; 0 runs supervisors in the bot process
+MONITOR_HASH_REPLICAS = 64  # Points per worker on the consistent-hash ring that assigns sessions
+MONITOR_IPC_TIMEOUT = 10  # Seconds to wait for a monitor worker to answer a command
+MONITOR_WORKER_RESTART_DELAY = 5  # Seconds before a crashed monitor worker is started again
+MONITOR_WORKER_SHUTDOWN_TIMEOUT = 30  # Seconds a monitor worker gets to stop before it is killed
+NODE_ID = os.getenv("NODE_ID", "")  # Unique name of this instance; set it on every instance sharing the database to share sessions through leases
+RUN_DISPATCHER = os.getenv("RUN_DISPATCHER", "1") != "0"  # Only one instance per bot token may receive updates; 0 makes a monitor-only node
+LEASE_TTL = 60  # Seconds a session lease stays valid without a heartbeat
+LEASE_HEARTBEAT_INTERVAL = 15  # Seconds between lease renewals, claims and rebalancing
+LEASE_CLAIM_BATCH = 5  # Sessions a node claims or hands over per heartbeat
+CHAT_SETTINGS_MAX_AGE = LEASE_HEARTBEAT_INTERVAL if NODE_ID else 0  # Re-read cached chat settings changed on other nodes; 0 never
+SCHEDULER_WORKERS = 32  # Chat polls running at once across all sessions
+SCHEDULER_SESSION_CONCURRENCY = 4  # Chat polls running at once per session
+SCHEDULER_JITTER = 0.1  # Each poll interval is randomised by up to +/-10%
+SCHEDULER_STARTUP_SPREAD = 15  # First polls of newly scheduled chats are spread over this many seconds
+SCHEDULER_ERROR_RETRY = 60  # Seconds before a failed poll is retried
+TELEGRAM_REQUESTS_PER_SECOND = 3.0  # Sustained Telegram API requests per session
+TELEGRAM_REQUEST_BURST = 10  # Requests a session may make at once after being idle
+FLOOD_WAIT_MAX_RETRIES = 3  # Retries of one request after FloodWaitError before giving up
+MEDIA_DOWNLOAD_WORKERS = 3  # Concurrent media downloads per session
+MEDIA_BANDWIDTH_BYTES_PER_SECOND = 0  # Per-session download cap, 0 means unlimited
+MEDIA_DOWNLOAD_MAX_ATTEMPTS = 5
+MEDIA_RETRY_BASE_DELAY = 30  # Seconds before the first retry, doubled after each failure
+MEDIA_QUEUE_SIZE = 1000  # Downloads queued in memory per session; the rest wait in the database
+MEDIA_RECOVERY_INTERVAL = 300  # Seconds between scans for pending downloads not queued in memory
+MEDIA_RECOVERY_BATCH_SIZE = 200  # Pending downloads read per query during a recovery scan
+MEDIA_CHUNK_SIZE = 512 * 1024  # Bytes per file request; partial files resume on this boundary
+MEDIA_ORPHAN_SWEEP_BATCH = 500  # Unreferenced media files removed per transaction
+MEDIA_QUOTA_SESSION_BYTES = 0  # Media bytes kept per session, 0 means unlimited
+MEDIA_QUOTA_GLOBAL_BYTES = 0  # Media bytes kept across all sessions, 0 means unlimited
+MEDIA_QUOTA_INTERVAL = 60  # Seconds between quota enforcement passes
+MEDIA_EVICTION_BATCH_SIZE = 200  # Files evicted per transaction
+ADAPTIVE_EWMA_ALPHA = 0.3  # Weight of the latest poll in the messages-per-poll average
+ADAPTIVE_BACKOFF_FACTOR = 2.0  # Interval multiplier after an empty poll
+ADAPTIVE_SPEEDUP_FACTOR = 0.5  # Largest interval multiplier after a poll that found messages
+ADAPTIVE_TARGET_MESSAGES = 1.0  # Average new messages per poll above which polling speeds up further
+AUTOCLEAN_BATCH_SIZE = 500  # Rows deleted per autoclean transaction
+EVENT_DRIVEN_INGEST = True  # Ingest pushed Telethon updates; polling only reconciles gaps
+RECONCILE_INTERVAL = 300  # Minimum seconds between reconciliation polls of a fixed-interval chat when updates are pushed
+INGEST_METRICS_REPORT_INTERVAL = 300  # Seconds between per-session API call / latency summaries
+DELETION_CHECK_BATCH_SIZE = 100  # Telegram's limit on message ids per getMessages request
+DELETION_CHECK_MIN_INTERVAL = 30  # Seconds before a brand-new message is first re-checked
+DELETION_CHECK_MAX_INTERVAL = 7 * 24 * 3600  # Old messages are still re-checked at least weekly
+DELETION_CHECK_AGE_FACTOR = 0.25  # A surviving message is re-checked after a quarter of its age
+DELETION_COALESCE_WINDOW = 5  # Seconds deletions of one chat are collected before one alert goes out
+DELETION_SUMMARY_PREVIEW = 5  # Deleted messages quoted in a summary; all are in the attached file
+BOT_GLOBAL_RATE = 25.0  # Bot API calls per second across all chats (Telegram allows about 30)
+BOT_GLOBAL_BURST = 30
+BOT_CHAT_RATE = 1.0  # Calls per second to one private chat
+BOT_CHAT_BURST = 5  # A menu redraw is a few calls in a row
+BOT_GROUP_RATE = 20 / 60  # Calls per second to one group or channel (Telegram allows 20 a minute)
+BOT_GROUP_BURST = 3
+BOT_SEND_MAX_RETRIES = 3  # Retries of one Bot API call after retry-after, network or server errors
+BOT_SEND_RETRY_BASE_DELAY = 1  # Seconds before retrying a network or server error, doubled each time
+BOT_OUTBOX_REPORT_INTERVAL = 300  # Seconds between Bot API queue summaries in the log
+
+# --- Database Tuning ---
+DB_READER_POOL_SIZE = 4  # Read-only connections kept open alongside the single writer
+DB_BUSY_TIMEOUT_MS = 5000
+DB_CACHE_SIZE_KIB = 16384  # Page cache per connection (16 MiB)
+DB_MMAP_SIZE_BYTES = 256 * 1024 * 1024
+DB_STATEMENT_CACHE_SIZE = 256  # Prepared statements cached per connection
+MIGRATION_BATCH_SIZE = 20000  # Rows per transaction in data migrations
+DB_ANALYSIS_LIMIT = 1000  # Rows ANALYZE samples per index, so it stays fast on large tables
+DB_EXECUTOR_MAX_PENDING = 256  # Queued + running DB calls before callers are made to wait
+LOOP_LAG_SAMPLE_INTERVAL = 0.5  # Seconds between event loop lag probes
+LOOP_LAG_WARN_THRESHOLD = 0.25  # Log a warning when the loop stalls longer than this
+LOOP_LAG_REPORT_INTERVAL = 300  # Seconds between loop lag summaries in the log
+
+# --- UI Constants ---
+STATS_ITEMS_PER_PAGE = 5
+SEARCH_RESULTS_PER_PAGE = 5
 
 # --- FSM Constants ---
 CODE_LENGTH = 5
@@ -0,0 +1,63 @@
+"""Awaitable versions of every function in src.database.queries.
+
+Async code (handlers, supervisors, workers) must import from here so that SQLite
+work never runs on the event loop. The names and signatures match queries.py.
+"""
+from src.database import queries
+from src.database.executor import run_in_db
+
+# --- Session Credentials ---
+db_add_session_credentials = run_in_db(queries.db_add_session_credentials)
+db_get_session_credentials = run_in_db(queries.db_get_session_credentials)
+db_remove_session_credentials = run_in_db(queries.db_remove_session_credentials)
+
+# --- Monitoring State ---
+db_set_monitoring_enabled = run_in_db(queries.db_set_monitoring_enabled)
+db_get_monitored_sessions = run_in_db(queries.db_get_monitored_sessions)
+
+# --- Session Leases ---
+db_renew_leases = run_in_db(queries.db_renew_leases)
+db_claim_lease = run_in_db(queries.db_claim_lease)
+db_release_leases = run_in_db(queries.db_release_leases)
+db_get_lease_overview = run_in_db(queries.db_get_lease_overview)
+
+# --- Monitored Chats ---
+db_add_chat = run_in_db(queries.db_add_chat)
+db_get_chats = run_in_db(queries.db_get_chats)
+db_remove_chat = run_in_db(queries.db_remove_chat)
+db_remove_all_chats_for_session = run_in_db(queries.db_remove_all_chats_for_session)
+db_is_chat_monitored = run_in_db(queries.db_is_chat_monitored)
+
+# --- Chat Settings ---
+db_get_chat_settings = run_in_db(queries.db_get_chat_settings)
+db_update_chat_setting = run_in_db(queries.db_update_chat_setting)
+
+# --- Messages ---
+db_add_message = run_in_db(queries.db_add_message)
+db_add_messages = run_in_db(queries.db_add_messages)
+db_get_last_message_id = run_in_db(queries.db_get_last_message_id)
+db_get_pending_media = run_in_db(queries.db_get_pending_media)
+db_link_known_media = run_in_db(queries.db_link_known_media)
+db_store_media = run_in_db(queries.db_store_media)
+db_sweep_orphan_media = run_in_db(queries.db_sweep_orphan_media)
+db_update_media_status = run_in_db(queries.db_update_media_status)
+db_get_chats_over_media_quota = run_in_db(queries.db_get_chats_over_media_quota)
+db_get_media_usage_by_session = run_in_db(queries.db_get_media_usage_by_session)
+db_evict_media = run_in_db(queries.db_evict_media)
+db_get_due_deletion_checks = run_in_db(queries.db_get_due_deletion_checks)
+db_reschedule_deletion_checks = run_in_db(queries.db_reschedule_deletion_checks)
+db_get_active_messages_by_ids = run_in_db(queries.db_get_active_messages_by_ids)
+db_mark_messages_as_deleted = run_in_db(queries.db_mark_messages_as_deleted)
+db_get_pending_deletion_notices = run_in_db(queries.db_get_pending_deletion_notices)
+db_clear_deletion_notices = run_in_db(queries.db_clear_deletion_notices)
+db_count_chat_messages = run_in_db(queries.db_count_chat_messages)
+db_autoclean_messages = run_in_db(queries.db_autoclean_messages)
+
+# --- Search ---
+db_search_messages = run_in_db(queries.db_search_messages)
+
+# --- Statistics ---
+db_calculate_chat_statistics = run_in_db(queries.db_calculate_chat_statistics)
+db_get_statistics_page = run_in_db(queries.db_get_statistics_page)
+db_rebuild_chat_stats = run_in_db(queries.db_rebuild_chat_stats)
+db_verify_chat_stats = run_in_db(queries.db_verify_chat_stats)
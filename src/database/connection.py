@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from queue import Empty, Queue
+from typing import Iterator
+
+from src.config import (
+    DB_FILE, DB_READER_POOL_SIZE, DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KIB,
+    DB_MMAP_SIZE_BYTES, DB_STATEMENT_CACHE_SIZE
+)
+
+class ConnectionPool:
+    """Long-lived SQLite connections: one serialized writer and a small pool of readers.
+
+    The database runs in WAL mode, so readers never block the writer and vice versa.
+    Connections stay open for the lifetime of the process, which lets sqlite3's
+    per-connection statement cache reuse prepared statements across calls.
+    """
+
+    def __init__(self, path: Path | str, reader_pool_size: int = DB_READER_POOL_SIZE):
+        self.path = str(path)
+        self.reader_pool_size = max(1, reader_pool_size)
+        self._writer: sqlite3.Connection | None = None
+        self._writer_lock = threading.RLock()
+        self._readers: Queue[sqlite3.Connection] = Queue()
+        self._readers_created = 0
+        self._readers_lock = threading.Lock()
+        self._all_connections: list[sqlite3.Connection] = []
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE_BYTES}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            conn.execute("PRAGMA query_only=1")
+        self._all_connections.append(conn)
+        return conn
+
+    def _get_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect(read_only=False)
+            # journal_mode is persistent in the file, but setting it is cheap and idempotent.
+            self._writer.execute("PRAGMA journal_mode=WAL")
+        return self._writer
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except Empty:
+            pass
+        with self._readers_lock:
+            if self._readers_created < self.reader_pool_size:
+                self._readers_created += 1
+                # Make sure the file exists in WAL mode before the first reader attaches.
+                with self._writer_lock:
+                    self._get_writer()
+                return self._connect(read_only=True)
+        return self._readers.get()
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Yields the writer connection inside a transaction that commits on success."""
+        with self._writer_lock:
+            conn = self._get_writer()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Yields a read-only connection from the pool."""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def close(self):
+        with self._writer_lock, self._readers_lock:
+            for conn in self._all_connections:
+                conn.close()
+            self._all_connections.clear()
+            self._writer = None
+            self._readers = Queue()
+            self._readers_created = 0
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+_db_file: Path = DB_FILE
+
+def database_file() -> Path:
+    """The database file this process uses."""
+    return _db_file
+
+def use_database_file(path: Path | str):
+    """Points this process at `path`, e.g. the file a monitor worker's parent uses. Closes an open pool."""
+    global _db_file
+    close_pool()
+    _db_file = Path(path)
+
+def get_pool() -> ConnectionPool:
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(_db_file)
+    return _pool
+
+def close_pool():
+    """Closes every pooled connection. The next call to get_pool() reopens them."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def writer():
+    return get_pool().writer()
+
+def reader():
+    return get_pool().reader()
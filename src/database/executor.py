@@ -0,0 +1,66 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from src.config import DB_READER_POOL_SIZE, DB_EXECUTOR_MAX_PENDING
+
+class DatabaseExecutor:
+    """Runs blocking database calls on dedicated threads and hands back awaitables.
+
+    One thread per pooled connection (the writer plus the readers) does the work.
+    At most `max_pending` calls may be queued or running at once; further callers
+    wait on the event loop instead of growing an unbounded backlog.
+    """
+
+    def __init__(self, max_workers: int = DB_READER_POOL_SIZE + 1, max_pending: int = DB_EXECUTOR_MAX_PENDING):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self._slots = asyncio.Semaphore(max_pending)
+        self._in_flight = 0  # Calls holding a slot; only touched on the event loop
+        self.max_pending = max_pending
+
+    @property
+    def pending(self) -> int:
+        """Number of calls currently queued or running."""
+        return self._in_flight
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        async with self._slots:
+            self._in_flight += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._pool, functools.partial(func, *args, **kwargs))
+            finally:
+                self._in_flight -= 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+_executor: DatabaseExecutor | None = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> DatabaseExecutor:
+    """Returns the process-wide database executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = DatabaseExecutor()
+    return _executor
+
+def shutdown_executor():
+    """Waits for in-flight database calls and stops the executor threads."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+def run_in_db(func: Callable) -> Callable:
+    """Wraps a blocking db_* function into a coroutine function that runs it on the executor."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await get_executor().run(func, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,48 @@
+"""Offline maintenance commands for the bot database.
+
+Usage:
+    python -m src.database.maintenance migrate
+    python -m src.database.maintenance verify-stats
+    python -m src.database.maintenance rebuild-stats
+"""
+import argparse
+import logging
+import sys
+
+from src.database.connection import close_pool
+from src.database.migrations import init_db
+from src.database.queries import db_rebuild_chat_stats, db_verify_chat_stats
+
+def migrate() -> int:
+    # init_db() in main() already applied every pending migration.
+    print("Database schema is up to date.")
+    return 0
+
+def verify_stats() -> int:
+    mismatches = db_verify_chat_stats()
+    for m in mismatches:
+        details = ", ".join(f"{field}: stored={have} actual={want}" for field, (have, want) in m['diff'].items())
+        print(f"{m['session_phone']} / {m['chat_id']}: {details}")
+    print(f"{len(mismatches)} chat(s) with drifted statistics.")
+    return 1 if mismatches else 0
+
+def rebuild_stats() -> int:
+    db_rebuild_chat_stats()
+    print("chat_stats rebuilt from messages.")
+    return 0
+
+def main(argv: list[str] | None = None) -> int:
+    commands = {'migrate': migrate, 'verify-stats': verify_stats, 'rebuild-stats': rebuild_stats}
+    parser = argparse.ArgumentParser(prog="python -m src.database.maintenance", description="Bot database maintenance.")
+    parser.add_argument("command", choices=commands)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    init_db()
+    try:
+        return commands[args.command]()
+    finally:
+        close_pool()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""Versioned schema migrations tracked in PRAGMA user_version.
+
+Each migration is a function that receives the connection pool and is responsible for
+its own transactions. Long data migrations commit in batches of MIGRATION_BATCH_SIZE
+rows, so the bot (or an older bot process) can keep using the database while they run,
+and an interrupted migration resumes where it left off on the next start. An older bot
+still writes text message dates after migration 2 has passed; init_db converts those
+on the next start, finding them through a partial index that holds only such rows.
+"""
+import logging
+from typing import Callable, List, Tuple
+
+from src.config import (
+    DEFAULT_ADAPTIVE_POLLING, DEFAULT_DELETION_CHECK_BUDGET, DEFAULT_DELETION_DIGEST_MINUTES, DEFAULT_MAX_CHECK_FREQUENCY, DEFAULT_MEDIA_QUOTA_MB, DEFAULT_MIN_CHECK_FREQUENCY, DELETION_CHECK_AGE_FACTOR, DELETION_CHECK_MAX_INTERVAL,
+    DELETION_CHECK_MIN_INTERVAL, DB_ANALYSIS_LIMIT, MIGRATION_BATCH_SIZE
+)
+from src.database.connection import ConnectionPool, get_pool
+from src.database.models import create_base_schema
+
+def _get_version(pool: ConnectionPool) -> int:
+    with pool.writer() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _set_version(pool: ConnectionPool, version: int):
+    with pool.writer() as conn:
+        conn.execute(f"PRAGMA user_version={int(version)}")
+
+def _run_in_batches(pool: ConnectionPool, label: str, sql: str, high: int | None = None):
+    """Runs `sql` (which must accept a lower and upper messages.id bound) over the messages table in id ranges.
+
+    `high` caps the last id visited; by default every current row is covered.
+    """
+    with pool.writer() as conn:
+        low, max_id = conn.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM messages").fetchone()
+    high = max_id if high is None else high
+    if high == 0:
+        return
+    total = high - low + 1
+    start, last_logged = low, 0.0
+    while start <= high:
+        end = start + MIGRATION_BATCH_SIZE - 1
+        with pool.writer() as conn:
+            conn.execute(sql, (start, end))
+        done = min(end, high) - low + 1
+        percent = done / total * 100
+        if percent - last_logged >= 5 or end >= high:
+            logging.info(f"{label}: {done}/{total} rows ({percent:.0f}%)")
+            last_logged = percent
+        start = end + 1
+
+# --- Migrations ---
+
+def _m1_base_schema(pool: ConnectionPool):
+    with pool.writer() as conn:
+        create_base_schema(conn)
+
+def _convert_text_dates(pool: ConnectionPool):
+    """Converts datetime text in messages.date and chat_stats to integer Unix seconds. Idempotent."""
+    _run_in_batches(
+        pool, "Converting message dates to epoch seconds",
+        "UPDATE messages SET date = CAST(strftime('%s', date) AS INTEGER) WHERE id BETWEEN ? AND ? AND typeof(date) = 'text'"
+    )
+    with pool.writer() as conn:
+        conn.execute("""
+            UPDATE chat_stats SET
+                first_message_ts = CASE WHEN typeof(first_message_ts) = 'text' THEN CAST(strftime('%s', first_message_ts) AS INTEGER) ELSE first_message_ts END,
+                last_message_ts = CASE WHEN typeof(last_message_ts) = 'text' THEN CAST(strftime('%s', last_message_ts) AS INTEGER) ELSE last_message_ts END
+        """)
+
+def _m2_epoch_dates(pool: ConnectionPool):
+    """Stores messages.date as integer Unix seconds instead of datetime text."""
+    _convert_text_dates(pool)
+    with pool.writer() as conn:
+        # Empty once converted, so init_db finds dates an older bot wrote without a table scan.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_text_date ON messages (id) WHERE typeof(date) = 'text'")
+
+def _m3_covering_indexes(pool: ConnectionPool):
+    """Indexes that answer the hot queries without touching the table rows."""
+    with pool.writer() as conn:
+        # Seeding a re-added chat's high-water mark: MAX(telethon_message_id) per chat.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_msg_id ON messages (session_phone, chat_id, telethon_message_id)")
+    with pool.writer() as conn:
+        # Autoclean reads (id, file_path) oldest-first; stats triggers read MIN/MAX(date).
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_date_file ON messages (session_phone, chat_id, date, file_path)")
+        conn.execute("DROP INDEX IF EXISTS idx_messages_chat_date")
+    with pool.writer() as conn:
+        # Deletion checks read the newest active messages of a chat.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_active_recent ON messages (session_phone, chat_id, status, date, telethon_message_id)")
+        conn.execute("DROP INDEX IF EXISTS idx_messages_for_deletion_check")
+    with pool.writer() as conn:
+        conn.execute(f"PRAGMA analysis_limit={int(DB_ANALYSIS_LIMIT)}")
+        conn.execute("ANALYZE")
+
+def _m4_full_text_search(pool: ConnectionPool):
+    """External-content FTS5 index over messages.text, kept in sync by triggers.
+
+    The session is indexed alongside the text, so a search only visits that session's rows.
+    """
+    with pool.writer() as conn:
+        conn.execute("DROP TABLE IF EXISTS messages_fts")  # Restart cleanly if a previous run was interrupted
+        conn.execute("""
+            CREATE VIRTUAL TABLE messages_fts USING fts5(
+                text, session_phone, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_messages_fts_insert AFTER INSERT ON messages WHEN NEW.text IS NOT NULL AND NEW.text != '' BEGIN
+                INSERT INTO messages_fts (rowid, text, session_phone) VALUES (NEW.id, NEW.text, NEW.session_phone);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_messages_fts_delete AFTER DELETE ON messages WHEN OLD.text IS NOT NULL AND OLD.text != '' BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, text, session_phone) VALUES ('delete', OLD.id, OLD.text, OLD.session_phone);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_messages_fts_update AFTER UPDATE OF text ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, text, session_phone) SELECT 'delete', OLD.id, OLD.text, OLD.session_phone WHERE OLD.text IS NOT NULL AND OLD.text != '';
+                INSERT INTO messages_fts (rowid, text, session_phone) SELECT NEW.id, NEW.text, NEW.session_phone WHERE NEW.text IS NOT NULL AND NEW.text != '';
+            END
+        """)
+        # Rows inserted from here on are indexed by the triggers; backfill only the older ones.
+        high = conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+    _run_in_batches(
+        pool, "Building full-text search index",
+        "INSERT INTO messages_fts (rowid, text, session_phone) SELECT id, text, session_phone FROM messages WHERE id BETWEEN ? AND ? AND text IS NOT NULL AND text != ''",
+        high=high
+    )
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+
+def _m5_deletion_check_schedule(pool: ConnectionPool):
+    """Per-message next deletion check time and a per-chat API budget for those checks."""
+    with pool.writer() as conn:
+        if 'next_check_at' not in {r[1] for r in conn.execute("PRAGMA table_info(messages)")}:
+            conn.execute("ALTER TABLE messages ADD COLUMN next_check_at INTEGER")
+        if 'deletion_check_budget' not in {r[1] for r in conn.execute("PRAGMA table_info(monitored_chats)")}:
+            conn.execute(f"ALTER TABLE monitored_chats ADD COLUMN deletion_check_budget INTEGER DEFAULT {DEFAULT_DELETION_CHECK_BUDGET} NOT NULL")
+    # Same schedule as queries.deletion_check_delay: the older the message, the later its first check.
+    _run_in_batches(
+        pool, "Scheduling deletion checks",
+        f"""
+        UPDATE messages SET next_check_at = strftime('%s', 'now') + MIN({DELETION_CHECK_MAX_INTERVAL}, MAX({DELETION_CHECK_MIN_INTERVAL},
+            CAST((strftime('%s', 'now') - COALESCE(date, strftime('%s', 'now'))) * {DELETION_CHECK_AGE_FACTOR} AS INTEGER)))
+        WHERE id BETWEEN ? AND ? AND status = 'active' AND next_check_at IS NULL
+        """
+    )
+    with pool.writer() as conn:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_deletion_due ON messages (session_phone, chat_id, next_check_at) WHERE status = 'active'")
+        conn.execute("DROP INDEX IF EXISTS idx_messages_active_recent")
+
+def _m6_adaptive_polling(pool: ConnectionPool):
+    """Per-chat switch and bounds for adaptive poll intervals."""
+    columns = {
+        'adaptive_polling': f"INTEGER DEFAULT {int(DEFAULT_ADAPTIVE_POLLING)} NOT NULL",
+        'min_check_frequency_seconds': f"INTEGER DEFAULT {DEFAULT_MIN_CHECK_FREQUENCY} NOT NULL",
+        'max_check_frequency_seconds': f"INTEGER DEFAULT {DEFAULT_MAX_CHECK_FREQUENCY} NOT NULL",
+    }
+    with pool.writer() as conn:
+        existing = {r[1] for r in conn.execute("PRAGMA table_info(monitored_chats)")}
+        for name, definition in columns.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE monitored_chats ADD COLUMN {name} {definition}")
+
+def _m7_media_pipeline(pool: ConnectionPool):
+    """Download state for media fetched outside the ingest path."""
+    with pool.writer() as conn:
+        existing = {r[1] for r in conn.execute("PRAGMA table_info(messages)")}
+        if 'media_status' not in existing:
+            conn.execute("ALTER TABLE messages ADD COLUMN media_status TEXT")  # NULL, 'pending', 'done' or 'failed'
+        if 'media_attempts' not in existing:
+            conn.execute("ALTER TABLE messages ADD COLUMN media_attempts INTEGER DEFAULT 0 NOT NULL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_media_pending ON messages (session_phone, id) WHERE media_status = 'pending'")
+
+def _m8_media_store(pool: ConnectionPool):
+    """Content-addressed media files shared by every message that carries them.
+
+    media_files holds one row per distinct content hash with the number of messages
+    referencing it; media_aliases maps Telegram document/photo ids to those rows so a
+    known file is linked without downloading it again. Files downloaded before this
+    migration stay owned by their message (media_file_id NULL).
+    """
+    with pool.writer() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS media_files (
+                id INTEGER PRIMARY KEY, content_hash TEXT NOT NULL UNIQUE, file_path TEXT NOT NULL,
+                file_size INTEGER NOT NULL, refcount INTEGER DEFAULT 0 NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_media_files_orphans ON media_files (id) WHERE refcount = 0")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS media_aliases (
+                telegram_media_id TEXT PRIMARY KEY, media_file_id INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_media_aliases_file ON media_aliases (media_file_id)")
+        if 'media_file_id' not in {r[1] for r in conn.execute("PRAGMA table_info(messages)")}:
+            conn.execute("ALTER TABLE messages ADD COLUMN media_file_id INTEGER")
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_media_ref_insert AFTER INSERT ON messages WHEN NEW.media_file_id IS NOT NULL BEGIN
+                UPDATE media_files SET refcount = refcount + 1 WHERE id = NEW.media_file_id;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_media_ref_update AFTER UPDATE OF media_file_id ON messages
+            WHEN OLD.media_file_id IS NOT NEW.media_file_id BEGIN
+                UPDATE media_files SET refcount = refcount - 1 WHERE id = OLD.media_file_id;
+                UPDATE media_files SET refcount = refcount + 1 WHERE id = NEW.media_file_id;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_media_ref_delete AFTER DELETE ON messages WHEN OLD.media_file_id IS NOT NULL BEGIN
+                UPDATE media_files SET refcount = refcount - 1 WHERE id = OLD.media_file_id;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_media_files_delete AFTER DELETE ON media_files BEGIN
+                DELETE FROM media_aliases WHERE media_file_id = OLD.id;
+            END
+        """)
+
+def _m9_media_quotas(pool: ConnectionPool):
+    """Per-chat media quota and the indexes eviction walks, oldest media first per message status."""
+    with pool.writer() as conn:
+        if 'media_quota_mb' not in {r[1] for r in conn.execute("PRAGMA table_info(monitored_chats)")}:
+            conn.execute(f"ALTER TABLE monitored_chats ADD COLUMN media_quota_mb INTEGER DEFAULT {DEFAULT_MEDIA_QUOTA_MB} NOT NULL")
+    with pool.writer() as conn:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_media_chat_age ON messages (session_phone, chat_id, status, date) WHERE file_path IS NOT NULL")
+    with pool.writer() as conn:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_media_session_age ON messages (session_phone, status, date) WHERE file_path IS NOT NULL")
+    with pool.writer() as conn:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_media_age ON messages (status, date) WHERE file_path IS NOT NULL")
+
+def _m10_deletion_digest(pool: ConnectionPool):
+    """Per-chat digest interval for deletion notifications."""
+    with pool.writer() as conn:
+        if 'deletion_digest_minutes' not in {r[1] for r in conn.execute("PRAGMA table_info(monitored_chats)")}:
+            conn.execute(f"ALTER TABLE monitored_chats ADD COLUMN deletion_digest_minutes INTEGER DEFAULT {DEFAULT_DELETION_DIGEST_MINUTES} NOT NULL")
+
+def _m11_monitoring_state(pool: ConnectionPool):
+    """Sessions the user has started monitoring, restored when the bot starts."""
+    with pool.writer() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS monitoring_state (
+                user_id INTEGER NOT NULL,
+                session_phone TEXT NOT NULL,
+                started_at INTEGER NOT NULL,
+                PRIMARY KEY (user_id, session_phone)
+            ) WITHOUT ROWID
+        """)
+
+def _m12_session_leases(pool: ConnectionPool):
+    """Nodes sharing the database and the sessions each of them has leased."""
+    with pool.writer() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cluster_nodes (
+                node_id TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL,
+                draining INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_leases (
+                user_id INTEGER NOT NULL,
+                session_phone TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (user_id, session_phone)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_session_leases_owner ON session_leases (owner)")
+
+def _m13_pending_deletion_notices(pool: ConnectionPool):
+    """Flags deleted messages whose notification has not gone out yet, so a restart still sends it."""
+    with pool.writer() as conn:
+        if 'deletion_notice_pending' not in {r[1] for r in conn.execute("PRAGMA table_info(messages)")}:
+            conn.execute("ALTER TABLE messages ADD COLUMN deletion_notice_pending INTEGER DEFAULT 0 NOT NULL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_pending_notice ON messages (session_phone, chat_id) WHERE deletion_notice_pending = 1")
+
+MIGRATIONS: List[Tuple[int, str, Callable[[ConnectionPool], None]]] = [
+    (1, "base schema", _m1_base_schema),
+    (2, "integer epoch message dates", _m2_epoch_dates),
+    (3, "covering indexes", _m3_covering_indexes),
+    (4, "full-text search", _m4_full_text_search),
+    (5, "deletion check schedule", _m5_deletion_check_schedule),
+    (6, "adaptive polling settings", _m6_adaptive_polling),
+    (7, "media download pipeline", _m7_media_pipeline),
+    (8, "deduplicated media store", _m8_media_store),
+    (9, "media quotas", _m9_media_quotas),
+    (10, "deletion digest setting", _m10_deletion_digest),
+    (11, "persisted monitoring state", _m11_monitoring_state),
+    (12, "session leases", _m12_session_leases),
+    (13, "pending deletion notices", _m13_pending_deletion_notices),
+]
+
+def run_migrations(pool: ConnectionPool | None = None) -> int:
+    """Applies every migration newer than the database's user_version. Returns the final version."""
+    pool = pool or get_pool()
+    version = _get_version(pool)
+    for target, description, migrate in MIGRATIONS:
+        if target <= version:
+            continue
+        logging.info(f"Applying database migration {target}: {description}")
+        migrate(pool)
+        _set_version(pool, target)
+        version = target
+    return version
+
+def init_db():
+    """Initializes the database, bringing its schema up to the latest version.
+
+    Text dates written by an older bot since migration 2 ran are converted as well.
+    """
+    pool = get_pool()
+    if _get_version(pool) >= 2:
+        with pool.reader() as conn:
+            stale = conn.execute("SELECT 1 FROM messages WHERE typeof(date) = 'text' LIMIT 1").fetchone()
+        if stale:
+            logging.info("Converting message dates written by an older bot version")
+            _convert_text_dates(pool)
+    run_migrations(pool)
@@ -1,49 +1,147 @@
-import sqlite3
 from src.config import (
-    DB_FILE, DEFAULT_CHECK_FREQUENCY, DEFAULT_INITIAL_FETCH,
+    DEFAULT_CHECK_FREQUENCY, DEFAULT_INITIAL_FETCH,
     DEFAULT_AUTOCLEAN_LIMIT, DEFAULT_DOWNLOAD_MEDIA, DEFAULT_DETECT_DELETIONS
 )
+import sqlite3
 
-def init_db():
-    """Initializes the database and creates tables if they don't exist."""
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                user_id INTEGER, phone TEXT, api_id INTEGER, api_hash TEXT, PRIMARY KEY(user_id, phone)
-            )
-        """)
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS monitored_chats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                session_phone TEXT NOT NULL,
-                chat_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                type TEXT NOT NULL,
-                check_frequency_seconds INTEGER DEFAULT {DEFAULT_CHECK_FREQUENCY},
-                initial_fetch_limit INTEGER DEFAULT {DEFAULT_INITIAL_FETCH},
-                db_autoclean_limit INTEGER DEFAULT {DEFAULT_AUTOCLEAN_LIMIT},
-                download_media INTEGER DEFAULT {int(DEFAULT_DOWNLOAD_MEDIA)},
-                detect_deletions INTEGER DEFAULT {int(DEFAULT_DETECT_DELETIONS)},
-                UNIQUE(user_id, session_phone, chat_id)
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, telethon_message_id INTEGER NOT NULL, chat_id INTEGER NOT NULL,
-                session_phone TEXT NOT NULL, text TEXT, sender_id INTEGER, date TIMESTAMP, file_path TEXT,
-                file_size INTEGER,
-                status TEXT DEFAULT 'active' NOT NULL, UNIQUE(telethon_message_id, chat_id, session_phone)
-            )
-        """)
+# Per-chat aggregates computed from scratch; used to build and verify chat_stats.
+CHAT_STATS_AGGREGATE_SQL = """
+    SELECT session_phone, chat_id,
+           COUNT(*) AS total_messages,
+           COALESCE(SUM(status = 'deleted'), 0) AS deleted_messages,
+           COALESCE(SUM(file_path IS NOT NULL), 0) AS media_files,
+           COALESCE(SUM(CASE WHEN file_path IS NOT NULL THEN file_size END), 0) AS media_size_bytes,
+           MIN(date) AS first_message_ts,
+           MAX(date) AS last_message_ts
+    FROM messages
+    GROUP BY session_phone, chat_id
+"""
+
+def create_base_schema(conn: sqlite3.Connection):
+    """Creates the unversioned schema and upgrades databases that predate versioned migrations."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            user_id INTEGER, phone TEXT, api_id INTEGER, api_hash TEXT, PRIMARY KEY(user_id, phone)
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS monitored_chats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            session_phone TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            type TEXT NOT NULL,
+            check_frequency_seconds INTEGER DEFAULT {DEFAULT_CHECK_FREQUENCY},
+            initial_fetch_limit INTEGER DEFAULT {DEFAULT_INITIAL_FETCH},
+            db_autoclean_limit INTEGER DEFAULT {DEFAULT_AUTOCLEAN_LIMIT},
+            download_media INTEGER DEFAULT {int(DEFAULT_DOWNLOAD_MEDIA)},
+            detect_deletions INTEGER DEFAULT {int(DEFAULT_DETECT_DELETIONS)},
+            last_message_id INTEGER DEFAULT 0 NOT NULL,
+            UNIQUE(user_id, session_phone, chat_id)
+        )
+    """)
+    # High-water mark updates and lookups address chats by (session_phone, chat_id) only
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_monitored_chats_session_chat ON monitored_chats (session_phone, chat_id)
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, telethon_message_id INTEGER NOT NULL, chat_id INTEGER NOT NULL,
+            session_phone TEXT NOT NULL, text TEXT, sender_id INTEGER, date TIMESTAMP, file_path TEXT,
+            file_size INTEGER,
+            status TEXT DEFAULT 'active' NOT NULL, UNIQUE(telethon_message_id, chat_id, session_phone)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_for_deletion_check ON messages (session_phone, chat_id, status, date)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_chat_date ON messages (session_phone, chat_id, date)
+    """)
+    # Backward compatibility check for file_size column
+    cursor.execute("PRAGMA table_info(messages)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'file_size' not in columns:
+        cursor.execute("ALTER TABLE messages ADD COLUMN file_size INTEGER")
+
+    # Backward compatibility check for the per-chat high-water mark
+    cursor.execute("PRAGMA table_info(monitored_chats)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'last_message_id' not in columns:
+        cursor.execute("ALTER TABLE monitored_chats ADD COLUMN last_message_id INTEGER DEFAULT 0 NOT NULL")
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_messages_for_deletion_check ON messages (session_phone, chat_id, status, date)
+            UPDATE monitored_chats SET last_message_id = COALESCE((
+                SELECT MAX(m.telethon_message_id) FROM messages m
+                WHERE m.session_phone = monitored_chats.session_phone AND m.chat_id = monitored_chats.chat_id
+            ), 0)
         """)
-        # Backward compatibility check for file_size column
-        cursor.execute("PRAGMA table_info(messages)")
-        columns = [column[1] for column in cursor.fetchall()]
-        if 'file_size' not in columns:
-            cursor.execute("ALTER TABLE messages ADD COLUMN file_size INTEGER")
 
-        conn.commit()
\ No newline at end of file
+    # Incrementally maintained per-chat statistics
+    has_chat_stats = cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='chat_stats'").fetchone()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_stats (
+            session_phone TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            total_messages INTEGER DEFAULT 0 NOT NULL,
+            deleted_messages INTEGER DEFAULT 0 NOT NULL,
+            media_files INTEGER DEFAULT 0 NOT NULL,
+            media_size_bytes INTEGER DEFAULT 0 NOT NULL,
+            first_message_ts TIMESTAMP,
+            last_message_ts TIMESTAMP,
+            PRIMARY KEY(session_phone, chat_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chat_stats_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO chat_stats (session_phone, chat_id, total_messages, deleted_messages, media_files, media_size_bytes, first_message_ts, last_message_ts)
+            VALUES (
+                NEW.session_phone, NEW.chat_id, 1, NEW.status = 'deleted', NEW.file_path IS NOT NULL,
+                CASE WHEN NEW.file_path IS NOT NULL THEN COALESCE(NEW.file_size, 0) ELSE 0 END, NEW.date, NEW.date
+            )
+            ON CONFLICT(session_phone, chat_id) DO UPDATE SET
+                total_messages = total_messages + 1,
+                deleted_messages = deleted_messages + excluded.deleted_messages,
+                media_files = media_files + excluded.media_files,
+                media_size_bytes = media_size_bytes + excluded.media_size_bytes,
+                first_message_ts = CASE WHEN first_message_ts IS NULL OR excluded.first_message_ts < first_message_ts THEN excluded.first_message_ts ELSE first_message_ts END,
+                last_message_ts = CASE WHEN last_message_ts IS NULL OR excluded.last_message_ts > last_message_ts THEN excluded.last_message_ts ELSE last_message_ts END;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chat_stats_update AFTER UPDATE OF status, file_path, file_size ON messages BEGIN
+            UPDATE chat_stats SET
+                deleted_messages = deleted_messages + (NEW.status = 'deleted') - (OLD.status = 'deleted'),
+                media_files = media_files + (NEW.file_path IS NOT NULL) - (OLD.file_path IS NOT NULL),
+                media_size_bytes = media_size_bytes
+                    + CASE WHEN NEW.file_path IS NOT NULL THEN COALESCE(NEW.file_size, 0) ELSE 0 END
+                    - CASE WHEN OLD.file_path IS NOT NULL THEN COALESCE(OLD.file_size, 0) ELSE 0 END
+            WHERE session_phone = NEW.session_phone AND chat_id = NEW.chat_id;
+        END
+    """)
+    # MIN/MAX(date) only need recomputing when the boundary row itself goes away,
+    # and idx_messages_chat_date turns that into an index seek.
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chat_stats_delete AFTER DELETE ON messages BEGIN
+            UPDATE chat_stats SET
+                total_messages = total_messages - 1,
+                deleted_messages = deleted_messages - (OLD.status = 'deleted'),
+                media_files = media_files - (OLD.file_path IS NOT NULL),
+                media_size_bytes = media_size_bytes - CASE WHEN OLD.file_path IS NOT NULL THEN COALESCE(OLD.file_size, 0) ELSE 0 END,
+                first_message_ts = CASE WHEN OLD.date IS first_message_ts
+                    THEN (SELECT MIN(date) FROM messages WHERE session_phone = OLD.session_phone AND chat_id = OLD.chat_id)
+                    ELSE first_message_ts END,
+                last_message_ts = CASE WHEN OLD.date IS last_message_ts
+                    THEN (SELECT MAX(date) FROM messages WHERE session_phone = OLD.session_phone AND chat_id = OLD.chat_id)
+                    ELSE last_message_ts END
+            WHERE session_phone = OLD.session_phone AND chat_id = OLD.chat_id;
+        END
+    """)
+    if not has_chat_stats:
+        cursor.execute(f"INSERT INTO chat_stats {CHAT_STATS_AGGREGATE_SQL}")
+    # Every monitored chat owns a stats row so the statistics list can be driven from chat_stats.
+    cursor.execute("INSERT OR IGNORE INTO chat_stats (session_phone, chat_id) SELECT session_phone, chat_id FROM monitored_chats")
+    # One index per statistics sort order; chat_id breaks ties so paging is stable.
+    for column in ('total_messages', 'deleted_messages', 'media_size_bytes', 'last_message_ts'):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_chat_stats_{column} ON chat_stats (session_phone, {column}, chat_id)")
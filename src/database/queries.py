@@ -1,116 +1,500 @@
-import sqlite3
-from typing import List, Dict, Any, Tuple
-from src.config import DB_FILE
+import time
+from datetime import datetime
+from typing import Any, Collection, Dict, List, Tuple
+from src.config import (
+    AUTOCLEAN_BATCH_SIZE, DELETION_CHECK_AGE_FACTOR, DELETION_CHECK_MAX_INTERVAL,
+    DELETION_CHECK_MIN_INTERVAL, MEDIA_EVICTION_BATCH_SIZE
+)
+from src.database.connection import reader, writer
+from src.database.models import CHAT_STATS_AGGREGATE_SQL
+
+ID_LOOKUP_CHUNK = 500  # Ids per IN (...) lookup, well below SQLite's bound-variable limit
 
 # --- Session Credentials ---
 def db_add_session_credentials(user_id: int, phone: str, api_id: int, api_hash: str):
-    with sqlite3.connect(DB_FILE) as conn:
+    with writer() as conn:
         conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)", (user_id, phone, api_id, api_hash))
-        conn.commit()
 
 def db_get_session_credentials(user_id: int, phone: str) -> Tuple[int, str] | None:
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT api_id, api_hash FROM sessions WHERE user_id=? AND phone=?", (user_id, phone))
-        return cursor.fetchone()
+    with reader() as conn:
+        row = conn.execute("SELECT api_id, api_hash FROM sessions WHERE user_id=? AND phone=?", (user_id, phone)).fetchone()
+        return tuple(row) if row else None
 
 def db_remove_session_credentials(user_id: int, phone: str):
-    with sqlite3.connect(DB_FILE) as conn:
+    with writer() as conn:
         conn.execute("DELETE FROM sessions WHERE user_id=? AND phone=?", (user_id, phone))
-        conn.commit()
+        conn.execute("DELETE FROM monitoring_state WHERE user_id=? AND session_phone=?", (user_id, phone))
+
+# --- Monitoring State ---
+def db_set_monitoring_enabled(user_id: int, phone: str, enabled: bool):
+    with writer() as conn:
+        if enabled:
+            conn.execute("INSERT OR IGNORE INTO monitoring_state (user_id, session_phone, started_at) VALUES (?, ?, ?)", (user_id, phone, int(time.time())))
+        else:
+            conn.execute("DELETE FROM monitoring_state WHERE user_id=? AND session_phone=?", (user_id, phone))
+
+def db_get_monitored_sessions() -> List[Tuple[int, str]]:
+    """(user_id, session_phone) of every session to monitor that still has credentials, oldest first."""
+    with reader() as conn:
+        return [tuple(r) for r in conn.execute("""
+            SELECT m.user_id, m.session_phone FROM monitoring_state m
+            JOIN sessions s ON s.user_id = m.user_id AND s.phone = m.session_phone
+            ORDER BY m.started_at
+        """).fetchall()]
+
+# --- Session Leases ---
+def db_renew_leases(node_id: str, now: float, expires_at: float, draining: bool = False) -> List[Tuple[int, str]]:
+    """Heartbeat of a node: extends the node's registration and its leases to `expires_at`.
+
+    Returns the sessions the node still holds. A lease that expired and was claimed by
+    another node in the meantime is not among them.
+    """
+    with writer() as conn:
+        conn.execute("""
+            INSERT INTO cluster_nodes (node_id, expires_at, draining) VALUES (?, ?, ?)
+            ON CONFLICT(node_id) DO UPDATE SET expires_at = excluded.expires_at, draining = excluded.draining
+        """, (node_id, expires_at, int(draining)))
+        conn.execute("DELETE FROM cluster_nodes WHERE expires_at < ?", (now,))
+        conn.execute("UPDATE session_leases SET expires_at = ? WHERE owner = ?", (expires_at, node_id))
+        return [tuple(r) for r in conn.execute("SELECT user_id, session_phone FROM session_leases WHERE owner = ?", (node_id,)).fetchall()]
+
+def db_claim_lease(user_id: int, phone: str, node_id: str, now: float, expires_at: float) -> bool:
+    """Takes the session's lease if it is free, expired or already held by the node."""
+    with writer() as conn:
+        cursor = conn.execute("""
+            INSERT INTO session_leases (user_id, session_phone, owner, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, session_phone) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE session_leases.expires_at < ? OR session_leases.owner = excluded.owner
+        """, (user_id, phone, node_id, expires_at, now))
+        return cursor.rowcount > 0
+
+def db_release_leases(node_id: str, sessions: Collection[Tuple[int, str]] | None = None, leave: bool = False):
+    """Gives up the node's leases on `sessions` (all of them if None); `leave` also deregisters the node."""
+    with writer() as conn:
+        if sessions is None:
+            conn.execute("DELETE FROM session_leases WHERE owner = ?", (node_id,))
+        else:
+            conn.executemany(
+                "DELETE FROM session_leases WHERE user_id = ? AND session_phone = ? AND owner = ?",
+                [(user_id, phone, node_id) for user_id, phone in sessions]
+            )
+        if leave:
+            conn.execute("DELETE FROM cluster_nodes WHERE node_id = ?", (node_id,))
+
+def db_get_lease_overview(now: float) -> Dict[str, Any]:
+    """Live nodes that take sessions, and every session to monitor with its current owner (None if free)."""
+    with reader() as conn:
+        live_nodes = conn.execute("SELECT COUNT(*) FROM cluster_nodes WHERE expires_at >= ? AND draining = 0", (now,)).fetchone()[0]
+        sessions = {
+            (r['user_id'], r['session_phone']): r['owner'] for r in conn.execute("""
+                SELECT m.user_id, m.session_phone, l.owner FROM monitoring_state m
+                JOIN sessions s ON s.user_id = m.user_id AND s.phone = m.session_phone
+                LEFT JOIN session_leases l ON l.user_id = m.user_id AND l.session_phone = m.session_phone AND l.expires_at >= ?
+                ORDER BY m.started_at
+            """, (now,)).fetchall()
+        }
+        return {'live_nodes': live_nodes, 'sessions': sessions}
 
 # --- Monitored Chats ---
 def db_add_chat(user_id: int, phone: str, chat_id: int, title: str, chat_type: str):
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute("INSERT OR IGNORE INTO monitored_chats (user_id, session_phone, chat_id, title, type) VALUES (?, ?, ?, ?, ?)", (user_id, phone, chat_id, title, chat_type))
-        conn.commit()
+    with writer() as conn:
+        # A re-added chat resumes from whatever is already archived instead of refetching it.
+        conn.execute("""
+            INSERT OR IGNORE INTO monitored_chats (user_id, session_phone, chat_id, title, type, last_message_id)
+            VALUES (?, ?, ?, ?, ?, COALESCE((SELECT MAX(telethon_message_id) FROM messages WHERE session_phone=? AND chat_id=?), 0))
+        """, (user_id, phone, chat_id, title, chat_type, phone, chat_id))
+        conn.execute("INSERT OR IGNORE INTO chat_stats (session_phone, chat_id) VALUES (?, ?)", (phone, chat_id))
 
 def db_get_chats(user_id: int, phone: str) -> List[Dict[str, Any]]:
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT chat_id, title, type FROM monitored_chats WHERE user_id=? AND session_phone=?", (user_id, phone))
+    with reader() as conn:
+        cursor = conn.execute("SELECT chat_id, title, type FROM monitored_chats WHERE user_id=? AND session_phone=?", (user_id, phone))
         return [{'id': r['chat_id'], 'title': r['title'], 'type': r['type']} for r in cursor.fetchall()]
 
 def db_remove_chat(user_id: int, phone: str, chat_id: int):
-    with sqlite3.connect(DB_FILE) as conn:
+    with writer() as conn:
         conn.execute("DELETE FROM monitored_chats WHERE user_id=? AND session_phone=? AND chat_id=?", (user_id, phone, chat_id))
-        conn.commit()
 
 def db_remove_all_chats_for_session(user_id: int, phone: str):
-    with sqlite3.connect(DB_FILE) as conn:
+    with writer() as conn:
         conn.execute("DELETE FROM monitored_chats WHERE user_id=? AND session_phone=?", (user_id, phone))
-        conn.commit()
 
 def db_is_chat_monitored(user_id: int, phone: str, chat_id: int) -> bool:
-    with sqlite3.connect(DB_FILE) as conn:
+    with reader() as conn:
         return conn.execute("SELECT 1 FROM monitored_chats WHERE user_id=? AND session_phone=? AND chat_id=?", (user_id, phone, chat_id)).fetchone() is not None
 
 # --- Chat Settings ---
 def db_get_chat_settings(user_id: int, session_phone: str, chat_id: int) -> Dict[str, Any] | None:
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        row = cursor.execute("SELECT * FROM monitored_chats WHERE user_id=? AND session_phone=? AND chat_id=?", (user_id, session_phone, chat_id)).fetchone()
+    with reader() as conn:
+        row = conn.execute("SELECT * FROM monitored_chats WHERE user_id=? AND session_phone=? AND chat_id=?", (user_id, session_phone, chat_id)).fetchone()
         return dict(row) if row else None
 
 def db_update_chat_setting(user_id: int, session_phone: str, chat_id: int, setting_key: str, setting_value: Any):
-    with sqlite3.connect(DB_FILE) as conn:
-        allowed_keys = ['check_frequency_seconds', 'initial_fetch_limit', 'db_autoclean_limit', 'download_media', 'detect_deletions']
-        if setting_key not in allowed_keys:
-            raise ValueError("Invalid setting key")
+    allowed_keys = ['check_frequency_seconds', 'initial_fetch_limit', 'db_autoclean_limit', 'download_media', 'detect_deletions', 'deletion_check_budget',
+                    'adaptive_polling', 'min_check_frequency_seconds', 'max_check_frequency_seconds', 'media_quota_mb',
+                    'deletion_digest_minutes']
+    if setting_key not in allowed_keys:
+        raise ValueError("Invalid setting key")
+    with writer() as conn:
         conn.execute(f"UPDATE monitored_chats SET {setting_key}=? WHERE user_id=? AND session_phone=? AND chat_id=?", (setting_value, user_id, session_phone, chat_id))
-        conn.commit()
 
 # --- Messages ---
+def _to_epoch(date) -> int | None:
+    """Message dates are stored as integer Unix seconds."""
+    if isinstance(date, datetime):
+        return int(date.timestamp())
+    return date
+
+def deletion_check_delay(age_seconds: float) -> int:
+    """Seconds until a message of the given age should be checked for deletion again.
+
+    Messages are mostly deleted soon after they are sent, so young messages are checked
+    often and the interval grows with the message's age.
+    """
+    delay = age_seconds * DELETION_CHECK_AGE_FACTOR
+    return int(min(DELETION_CHECK_MAX_INTERVAL, max(DELETION_CHECK_MIN_INTERVAL, delay)))
+
 def db_add_message(telethon_message_id: int, chat_id: int, session_phone: str, text: str, sender_id: int, date, file_path: str | None, file_size: int | None):
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute("INSERT OR IGNORE INTO messages (telethon_message_id, chat_id, session_phone, text, sender_id, date, file_path, file_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (telethon_message_id, chat_id, session_phone, text, sender_id, date, file_path, file_size))
-        conn.commit()
+    db_add_messages(session_phone, chat_id, [(telethon_message_id, text, sender_id, date, file_path, file_size)])
+
+def db_add_messages(session_phone: str, chat_id: int, rows: List[Tuple], pending_media: Collection[int] = (), advance_mark: bool = True) -> List[int]:
+    """Stores a batch of messages, skipping those already archived, in one transaction.
+
+    Each row is (telethon_message_id, text, sender_id, date, file_path, file_size).
+    Messages whose id is in `pending_media` are stored with media_status 'pending' for
+    the media pipeline. With `advance_mark` the chat's high-water mark (the id up to
+    which its history has been fetched completely) moves to the batch's highest id.
+    Returns the ids of the rows actually inserted.
+    """
+    if not rows:
+        return []
+    now = int(time.time())
+    with writer() as conn:
+        ids = list(dict.fromkeys(r[0] for r in rows))
+        existing = set()
+        for start in range(0, len(ids), ID_LOOKUP_CHUNK):
+            batch = ids[start:start + ID_LOOKUP_CHUNK]
+            existing.update(r[0] for r in conn.execute(
+                f"SELECT telethon_message_id FROM messages WHERE session_phone=? AND chat_id=? AND telethon_message_id IN ({','.join('?' * len(batch))})",
+                (session_phone, chat_id, *batch)
+            ))
+        params = []
+        for r in rows:
+            if r[0] in existing:
+                continue
+            existing.add(r[0])
+            date = _to_epoch(r[3])
+            next_check_at = now + deletion_check_delay(now - date if date is not None else 0)
+            media_status = 'pending' if r[0] in pending_media else None
+            params.append((r[0], chat_id, session_phone, r[1], r[2], date, r[4], r[5], next_check_at, media_status))
+        conn.executemany(
+            "INSERT OR IGNORE INTO messages (telethon_message_id, chat_id, session_phone, text, sender_id, date, file_path, file_size, next_check_at, media_status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            params
+        )
+        if advance_mark:
+            conn.execute(
+                "UPDATE monitored_chats SET last_message_id=MAX(last_message_id, ?) WHERE session_phone=? AND chat_id=?",
+                (max(ids), session_phone, chat_id)
+            )
+        return [p[0] for p in params]
 
 def db_get_last_message_id(session_phone: str, chat_id: int) -> int:
-    with sqlite3.connect(DB_FILE) as conn:
-        res = conn.execute("SELECT MAX(telethon_message_id) FROM messages WHERE session_phone=? AND chat_id=?", (session_phone, chat_id)).fetchone()
+    """Returns the chat's stored high-water mark. Unlike MAX(telethon_message_id), autoclean cannot move it backwards."""
+    with reader() as conn:
+        res = conn.execute("SELECT MAX(last_message_id) FROM monitored_chats WHERE session_phone=? AND chat_id=?", (session_phone, chat_id)).fetchone()
         return res[0] if res and res[0] is not None else 0
 
-def db_get_recent_active_messages(session_phone: str, chat_id: int) -> List[Dict]:
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.row_factory = sqlite3.Row
-        return [dict(r) for r in conn.execute("SELECT id, telethon_message_id, text, file_path, date FROM messages WHERE session_phone=? AND chat_id=? AND status='active' ORDER BY date DESC LIMIT 200", (session_phone, chat_id)).fetchall()]
+def db_get_pending_media(session_phone: str, after_id: int, limit: int) -> List[Dict]:
+    """Messages of a session still waiting for their media, in id order after `after_id` (idx_messages_media_pending)."""
+    with reader() as conn:
+        return [dict(r) for r in conn.execute(
+            "SELECT id, chat_id, telethon_message_id, media_attempts FROM messages WHERE session_phone=? AND media_status='pending' AND id > ? ORDER BY id LIMIT ?",
+            (session_phone, after_id, limit)
+        ).fetchall()]
+
+def db_link_known_media(session_phone: str, chat_id: int, telethon_message_id: int, telegram_media_id: str) -> bool:
+    """Points the message at an already stored copy of a Telegram document/photo.
+
+    Returns False if the media is not in the store yet (or the message row is gone).
+    """
+    with writer() as conn:
+        cursor = conn.execute("""
+            UPDATE messages SET (media_file_id, file_path, file_size, media_status) = (
+                SELECT f.id, f.file_path, f.file_size, 'done'
+                FROM media_aliases a JOIN media_files f ON f.id = a.media_file_id WHERE a.telegram_media_id = ?
+            )
+            WHERE telethon_message_id=? AND chat_id=? AND session_phone=?
+              AND EXISTS (SELECT 1 FROM media_aliases WHERE telegram_media_id = ?)
+        """, (telegram_media_id, telethon_message_id, chat_id, session_phone, telegram_media_id))
+        return cursor.rowcount > 0
+
+def db_store_media(session_phone: str, chat_id: int, telethon_message_id: int, telegram_media_id: str,
+                   content_hash: str, file_size: int, store_path: str) -> bool:
+    """Records a file already moved to `store_path` in the media store and links the message to it.
+
+    If a file with the same content is already stored, the message is linked to that one
+    and False is returned; the caller then removes `store_path`. `store_path` must be a
+    name no media_files row has used before, so an orphan sweep unlinking an old row's
+    file after its commit can never hit it.
+    """
+    with writer() as conn:
+        created = conn.execute(
+            "INSERT INTO media_files (content_hash, file_path, file_size) VALUES (?, ?, ?) ON CONFLICT (content_hash) DO NOTHING",
+            (content_hash, store_path, file_size)
+        ).rowcount > 0
+        media_file = conn.execute("SELECT id, file_path, file_size FROM media_files WHERE content_hash=?", (content_hash,)).fetchone()
+        conn.execute("INSERT OR IGNORE INTO media_aliases (telegram_media_id, media_file_id) VALUES (?, ?)", (telegram_media_id, media_file['id']))
+        conn.execute(
+            "UPDATE messages SET media_file_id=?, file_path=?, file_size=?, media_status='done' WHERE telethon_message_id=? AND chat_id=? AND session_phone=?",
+            (media_file['id'], media_file['file_path'], media_file['file_size'], telethon_message_id, chat_id, session_phone)
+        )
+        return created
+
+def db_sweep_orphan_media(limit: int) -> Tuple[int, int, List[str]]:
+    """Deletes up to `limit` stored files no message references any more (idx_media_files_orphans).
+
+    Only the rows are deleted here; the caller unlinks the returned paths after the commit.
+    A concurrent db_store_media of the same content either links the row first, keeping it
+    alive, or creates a new row under a new path. Returns (files_removed, bytes_freed, file_paths_to_unlink).
+    """
+    paths, freed = [], 0
+    with writer() as conn:
+        orphans = conn.execute("SELECT id, file_path, file_size FROM media_files WHERE refcount <= 0 LIMIT ?", (limit,)).fetchall()
+        for orphan in orphans:
+            if conn.execute("DELETE FROM media_files WHERE id=? AND refcount <= 0", (orphan['id'],)).rowcount == 0:
+                continue  # Referenced again in the meantime
+            paths.append(orphan['file_path'])
+            freed += orphan['file_size']
+    return len(paths), freed, paths
+
+def db_get_chats_over_media_quota() -> List[Dict[str, Any]]:
+    """Chats whose stored media exceeds their media_quota_mb, with the excess in bytes."""
+    with reader() as conn:
+        return [dict(r) for r in conn.execute("""
+            SELECT s.session_phone, s.chat_id, s.media_size_bytes - MIN(m.media_quota_mb) * 1048576 AS excess
+            FROM monitored_chats m JOIN chat_stats s ON s.session_phone = m.session_phone AND s.chat_id = m.chat_id
+            WHERE m.media_quota_mb > 0
+            GROUP BY s.session_phone, s.chat_id
+            HAVING excess > 0
+        """).fetchall()]
+
+def db_get_media_usage_by_session() -> Dict[str, int]:
+    """Stored media bytes per session, summed from the maintained chat_stats rows."""
+    with reader() as conn:
+        return {r[0]: r[1] for r in conn.execute("SELECT session_phone, SUM(media_size_bytes) FROM chat_stats GROUP BY session_phone")}
 
-def db_mark_message_as_deleted(db_id: int):
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute("UPDATE messages SET status='deleted' WHERE id=?", (db_id,))
-        conn.commit()
+def db_evict_media(excess: int, session_phone: str | None = None, chat_id: int | None = None,
+                   batch_size: int = MEDIA_EVICTION_BATCH_SIZE) -> Tuple[int, int, List[str]]:
+    """Drops the media of up to `batch_size` messages until `excess` bytes are released.
 
-def db_autoclean_messages(session_phone: str, chat_id: int, limit: int):
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute("DELETE FROM messages WHERE id IN (SELECT id FROM messages WHERE session_phone=? AND chat_id=? ORDER BY date DESC LIMIT -1 OFFSET ?)", (session_phone, chat_id, limit))
-        conn.commit()
+    Scope is one chat, one session or (both None) everything. Media of active messages
+    goes first, oldest first; media of messages deleted upstream is the evidence the bot
+    exists to keep, so it is only touched once no active message has media left. The
+    message rows stay, with media_status 'evicted'. Stored files are released through
+    their reference count. Returns (evicted, bytes_released, file_paths_to_unlink) where
+    the paths are files downloaded before the media store existed.
+    """
+    scope, params = "", []
+    if session_phone is not None:
+        scope += " AND session_phone=?"
+        params.append(session_phone)
+    if chat_id is not None:
+        scope += " AND chat_id=?"
+        params.append(chat_id)
+    victims, released = [], 0
+    with writer() as conn:
+        for status in ('active', 'deleted'):
+            if released >= excess or len(victims) >= batch_size:
+                break
+            rows = conn.execute(
+                f"SELECT id, file_path, file_size, media_file_id FROM messages WHERE file_path IS NOT NULL AND status=?{scope} ORDER BY date LIMIT ?",
+                (status, *params, batch_size - len(victims))
+            ).fetchall()
+            for row in rows:
+                victims.append(row)
+                released += row['file_size'] or 0
+                if released >= excess:
+                    break
+        conn.executemany(
+            "UPDATE messages SET file_path=NULL, file_size=NULL, media_file_id=NULL, media_status='evicted' WHERE id=?",
+            [(v['id'],) for v in victims]
+        )
+    return len(victims), released, [v['file_path'] for v in victims if v['media_file_id'] is None]
+
+def db_update_media_status(session_phone: str, chat_id: int, telethon_message_id: int, status: str, attempts: int):
+    """Stores a download attempt: status stays 'pending' while retries remain, 'failed' once they are used up."""
+    with writer() as conn:
+        conn.execute(
+            "UPDATE messages SET media_status=?, media_attempts=? WHERE telethon_message_id=? AND chat_id=? AND session_phone=?",
+            (status, attempts, telethon_message_id, chat_id, session_phone)
+        )
+
+def db_get_due_deletion_checks(session_phone: str, chat_id: int, now: int, limit: int) -> List[Dict]:
+    """Active messages whose next deletion check is due, most overdue first (idx_messages_deletion_due)."""
+    with reader() as conn:
+        return [dict(r) for r in conn.execute(
+            "SELECT id, telethon_message_id, text, file_path, date FROM messages WHERE session_phone=? AND chat_id=? AND status='active' AND next_check_at <= ? ORDER BY next_check_at LIMIT ?",
+            (session_phone, chat_id, now, limit)
+        ).fetchall()]
+
+def db_reschedule_deletion_checks(schedule: List[Tuple[int, int]]):
+    """Sets the next deletion check of messages; `schedule` holds (next_check_at, message db id) pairs."""
+    if not schedule:
+        return
+    with writer() as conn:
+        conn.executemany("UPDATE messages SET next_check_at=? WHERE id=?", schedule)
+
+def db_get_active_messages_by_ids(session_phone: str, telethon_ids: List[int], chat_id: int | None = None) -> List[Dict]:
+    """Active messages of a session with the given Telegram ids, optionally limited to one chat.
+
+    Used for pushed deletion updates, which carry no chat id outside channels.
+    """
+    if not telethon_ids:
+        return []
+    placeholders = ",".join("?" * len(telethon_ids))
+    sql = f"SELECT id, chat_id, telethon_message_id, text, file_path, date FROM messages WHERE telethon_message_id IN ({placeholders}) AND session_phone=? AND status='active'"
+    params = [*telethon_ids, session_phone]
+    if chat_id is not None:
+        sql += " AND chat_id=?"
+        params.append(chat_id)
+    with reader() as conn:
+        return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+def db_mark_messages_as_deleted(db_ids: List[int]):
+    """Marks messages deleted, with their notification pending until db_clear_deletion_notices."""
+    with writer() as conn:
+        conn.executemany("UPDATE messages SET status='deleted', deletion_notice_pending=1 WHERE id=?", [(db_id,) for db_id in db_ids])
+
+def db_get_pending_deletion_notices(user_id: int, session_phone: str) -> List[Dict[str, Any]]:
+    """Deleted messages of the user's chats whose notification was never sent, with the chat's title and digest setting."""
+    with reader() as conn:
+        return [dict(r) for r in conn.execute("""
+            SELECT m.id, m.chat_id, m.telethon_message_id, m.text, m.file_path, m.date, c.title, c.deletion_digest_minutes
+            FROM messages m JOIN monitored_chats c ON c.session_phone = m.session_phone AND c.chat_id = m.chat_id
+            WHERE m.session_phone=? AND m.deletion_notice_pending=1 AND c.user_id=?
+        """, (session_phone, user_id)).fetchall()]
+
+def db_clear_deletion_notices(db_ids: List[int]):
+    with writer() as conn:
+        for start in range(0, len(db_ids), ID_LOOKUP_CHUNK):
+            batch = db_ids[start:start + ID_LOOKUP_CHUNK]
+            conn.execute(f"UPDATE messages SET deletion_notice_pending=0 WHERE id IN ({','.join('?' * len(batch))})", batch)
+
+def db_count_chat_messages(session_phone: str, chat_id: int) -> int:
+    with reader() as conn:
+        row = conn.execute("SELECT total_messages FROM chat_stats WHERE session_phone=? AND chat_id=?", (session_phone, chat_id)).fetchone()
+        return row[0] if row else 0
+
+def db_autoclean_messages(session_phone: str, chat_id: int, limit: int, batch_size: int = AUTOCLEAN_BATCH_SIZE) -> Tuple[int, List[str]]:
+    """Deletes up to `batch_size` of the oldest messages above the chat's `limit`.
+
+    The excess comes from the maintained chat_stats count and the oldest rows are read
+    in date order from idx_messages_chat_date_file, so nothing is scanned when the chat is
+    within its limit. Returns (deleted_rows, file_paths_of_deleted_rows); files in the
+    media store are not included, they are released through their reference count.
+    """
+    with writer() as conn:
+        row = conn.execute("SELECT total_messages FROM chat_stats WHERE session_phone=? AND chat_id=?", (session_phone, chat_id)).fetchone()
+        excess = (row[0] if row else 0) - limit
+        if excess <= 0:
+            return 0, []
+        victims = conn.execute(
+            "SELECT id, file_path, media_file_id FROM messages WHERE session_phone=? AND chat_id=? ORDER BY date ASC LIMIT ?",
+            (session_phone, chat_id, min(excess, batch_size))
+        ).fetchall()
+        conn.executemany("DELETE FROM messages WHERE id=?", [(v['id'],) for v in victims])
+        return len(victims), [v['file_path'] for v in victims if v['file_path'] and v['media_file_id'] is None]
+
+# --- Search ---
+SNIPPET_OPEN, SNIPPET_CLOSE = '\x02', '\x03'  # Highlight markers, swapped for HTML after escaping
+
+def db_search_messages(user_id: int, session_phone: str, match_query: str, limit: int, offset: int, chat_id: int | None = None) -> List[Dict[str, Any]]:
+    """Full-text search over a session's archived messages, best matches first.
+
+    `match_query` must already be a valid FTS5 expression. It is matched against the
+    text column only, together with the session's token in the session_phone column, so
+    FTS5 intersects the two and never visits other sessions' matches. Highlighted terms
+    in the returned `snippet` are wrapped in SNIPPET_OPEN/SNIPPET_CLOSE.
+    """
+    session_term = '"' + session_phone.replace('"', '""') + '"'
+    scoped_query = f"session_phone : {session_term} AND text : ({match_query})"
+    chat_filter = "AND m.chat_id = ?" if chat_id is not None else ""
+    params = [SNIPPET_OPEN, SNIPPET_CLOSE, user_id, scoped_query, session_phone]
+    if chat_id is not None:
+        params.append(chat_id)
+    params += [limit, offset]
+    with reader() as conn:
+        rows = conn.execute(f"""
+            SELECT m.id, m.chat_id, m.telethon_message_id, m.date, m.status,
+                   snippet(messages_fts, 0, ?, ?, '…', 16) AS snippet, c.title
+            FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            LEFT JOIN monitored_chats c ON c.session_phone = m.session_phone AND c.chat_id = m.chat_id AND c.user_id = ?
+            WHERE messages_fts MATCH ? AND m.session_phone = ? {chat_filter}
+            ORDER BY messages_fts.rank
+            LIMIT ? OFFSET ?
+        """, params).fetchall()
+    return [dict(r) for r in rows]
 
 # --- Statistics ---
+CHAT_STATS_FIELDS = ('total_messages', 'deleted_messages', 'media_files', 'media_size_bytes', 'first_message_ts', 'last_message_ts')
+EMPTY_CHAT_STATS = {'total_messages': 0, 'deleted_messages': 0, 'media_files': 0, 'media_size_bytes': 0, 'first_message_ts': None, 'last_message_ts': None}
+
 def db_calculate_chat_statistics(session_phone: str, chat_id: int) -> Dict[str, Any]:
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        base_query = "FROM messages WHERE session_phone=? AND chat_id=?"
-        
-        cursor.execute(f"SELECT COUNT(*) {base_query}", (session_phone, chat_id))
-        total_messages = cursor.fetchone()[0]
-
-        cursor.execute(f"SELECT COUNT(*) {base_query} AND status='deleted'", (session_phone, chat_id))
-        deleted_messages = cursor.fetchone()[0]
-
-        cursor.execute(f"SELECT COUNT(*), SUM(file_size) {base_query} AND file_path IS NOT NULL", (session_phone, chat_id))
-        media_files, media_size_bytes = cursor.fetchone()
-
-        cursor.execute(f"SELECT MIN(date), MAX(date) {base_query}", (session_phone, chat_id))
-        first_message_ts, last_message_ts = cursor.fetchone()
-
-        return {
-            'total_messages': total_messages or 0,
-            'deleted_messages': deleted_messages or 0,
-            'media_files': media_files or 0,
-            'media_size_bytes': media_size_bytes or 0,
-            'first_message_ts': first_message_ts,
-            'last_message_ts': last_message_ts
-        }
\ No newline at end of file
+    with reader() as conn:
+        row = conn.execute(f"SELECT {', '.join(CHAT_STATS_FIELDS)} FROM chat_stats WHERE session_phone=? AND chat_id=?", (session_phone, chat_id)).fetchone()
+    if not row:
+        return dict(EMPTY_CHAT_STATS)
+    return dict(row)
+
+STATS_SORT_COLUMNS = {
+    'total': 'total_messages',
+    'deleted': 'deleted_messages',
+    'volume': 'media_size_bytes',
+    'activity': 'last_message_ts',
+}
+
+def db_get_statistics_page(user_id: int, session_phone: str, sort_key: str, limit: int, offset: int) -> Tuple[List[Dict[str, Any]], int, bool]:
+    """Returns one sorted page of a session's chats with their statistics.
+
+    The result is (page_rows, total_chats, has_messages). Rows are read in sort order
+    straight from the matching chat_stats index, so the cost of a page depends on its
+    position, not on how many chats the session monitors.
+    """
+    sort_column = STATS_SORT_COLUMNS.get(sort_key, STATS_SORT_COLUMNS['total'])
+    with reader() as conn:
+        # CROSS JOIN pins chat_stats as the outer loop so the sort index is used.
+        rows = conn.execute(f"""
+            SELECT s.chat_id AS id, m.title, m.type, {', '.join('s.' + f for f in CHAT_STATS_FIELDS)}
+            FROM chat_stats s CROSS JOIN monitored_chats m
+            WHERE s.session_phone=? AND m.user_id=? AND m.session_phone=s.session_phone AND m.chat_id=s.chat_id
+            ORDER BY s.{sort_column} DESC, s.chat_id DESC
+            LIMIT ? OFFSET ?
+        """, (session_phone, user_id, limit, offset)).fetchall()
+        total_chats = conn.execute("SELECT COUNT(*) FROM monitored_chats WHERE user_id=? AND session_phone=?", (user_id, session_phone)).fetchone()[0]
+        has_messages = conn.execute("""
+            SELECT 1 FROM chat_stats s CROSS JOIN monitored_chats m
+            WHERE s.session_phone=? AND s.total_messages > 0 AND m.user_id=? AND m.session_phone=s.session_phone AND m.chat_id=s.chat_id
+            LIMIT 1
+        """, (session_phone, user_id)).fetchone() is not None
+    return [dict(r) for r in rows], total_chats, has_messages
+
+def db_rebuild_chat_stats():
+    """Recomputes the whole chat_stats table from the messages table."""
+    with writer() as conn:
+        conn.execute("DELETE FROM chat_stats")
+        conn.execute(f"INSERT INTO chat_stats {CHAT_STATS_AGGREGATE_SQL}")
+        conn.execute("INSERT OR IGNORE INTO chat_stats (session_phone, chat_id) SELECT session_phone, chat_id FROM monitored_chats")
+
+def db_verify_chat_stats() -> List[Dict[str, Any]]:
+    """Compares chat_stats with a full recount and returns every chat whose aggregates drifted."""
+    with reader() as conn:
+        expected = {(r['session_phone'], r['chat_id']): dict(r) for r in conn.execute(CHAT_STATS_AGGREGATE_SQL)}
+        stored = {(r['session_phone'], r['chat_id']): dict(r) for r in conn.execute("SELECT * FROM chat_stats")}
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        want = expected.get(key, EMPTY_CHAT_STATS)
+        have = stored.get(key, {})
+        diff = {f: (have.get(f), want.get(f)) for f in CHAT_STATS_FIELDS if have.get(f) != want.get(f)}
+        if diff:
+            mismatches.append({'session_phone': key[0], 'chat_id': key[1], 'diff': diff})
+    return mismatches
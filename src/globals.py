@@ -3,4 +3,7 @@ from typing import Dict, Any
 # Shared, mutable state to be accessed across modules
 # This helps avoid circular import issues.
 active_sessions: Dict[int, str] = {}
-monitoring_tasks: Dict[tuple, Dict[str, Any]] = {}
\ No newline at end of file
+monitoring_tasks: Dict[tuple, Dict[str, Any]] = {}
+
+# Event loop responsiveness, maintained by src.services.loop_monitor
+loop_lag_stats: Dict[str, float] = {'samples': 0, 'last_ms': 0.0, 'max_ms': 0.0, 'total_ms': 0.0, 'stalls': 0}
\ No newline at end of file
@@ -7,10 +7,11 @@ from aiogram.filters import StateFilter
 from aiogram.types import Message, CallbackQuery
 from aiogram.exceptions import TelegramBadRequest
 
+from src.config import EVENT_DRIVEN_INGEST
 from src.states.user_states import ChatManagement, ChatSettings
-from src.database.queries import (
-    db_get_chats, db_remove_chat, db_get_chat_settings, db_update_chat_setting
-)
+from src.database.async_queries import db_get_chats
+from src.services.chat_registry import get_chat_settings, remove_chat, update_chat_setting
+from src.services.monitor_control import get_poll_status
 from src.utils.lexicon import LEXICON
 from src.utils.helpers import get_details_for_callback
 from src.keyboards.inline import (
@@ -25,7 +26,7 @@ router = Router()
 
 async def display_chat_list(callback: CallbackQuery, phone: str, page: int):
     user_id = callback.from_user.id
-    chats = db_get_chats(user_id, phone)
+    chats = await db_get_chats(user_id, phone)
     if not chats:
         text = LEXICON['no_chats_monitored']
         reply_markup = InlineKeyboardBuilder().add(InlineKeyboardButton(text=LEXICON['back_button'], callback_data=f"view_session:{phone}")).as_markup()
@@ -52,7 +53,7 @@ async def chat_list_page_handler(callback: CallbackQuery):
 async def view_chat_handler(callback: CallbackQuery):
     phone, chat_id, page = await get_details_for_callback(callback)
     user_id = callback.from_user.id
-    chats = db_get_chats(user_id, phone)
+    chats = await db_get_chats(user_id, phone)
     chat = next((c for c in chats if c['id'] == chat_id), None)
     if not chat:
         await callback.answer("Error: Chat not found.", show_alert=True)
@@ -67,7 +68,7 @@ async def view_chat_handler(callback: CallbackQuery):
 async def delete_chat_prompt_handler(callback: CallbackQuery, state: FSMContext):
     phone, chat_id, page = await get_details_for_callback(callback)
     user_id = callback.from_user.id
-    chats = db_get_chats(user_id, phone)
+    chats = await db_get_chats(user_id, phone)
     chat = next((c for c in chats if c['id'] == chat_id), None)
     if not chat:
         await callback.answer("Error: Chat not found.", show_alert=True)
@@ -84,10 +85,10 @@ async def confirm_delete_chat_handler(callback: CallbackQuery, state: FSMContext
     parts = callback.data.split(":")
     phone, chat_id_to_delete = parts[1], int(parts[2])
     user_id = callback.from_user.id
-    chats = db_get_chats(user_id, phone)
+    chats = await db_get_chats(user_id, phone)
     chat_to_delete = next((c for c in chats if c['id'] == chat_id_to_delete), None)
     if chat_to_delete:
-        db_remove_chat(user_id, phone, chat_id_to_delete)
+        await remove_chat(user_id, phone, chat_id_to_delete)
         await callback.answer(LEXICON['chat_deleted_success'].format(chat_title=chat_to_delete['title']), show_alert=True)
     await state.clear()
     await display_chat_list(callback, phone, page=1)
@@ -97,7 +98,7 @@ async def confirm_delete_chat_handler(callback: CallbackQuery, state: FSMContext
 
 async def show_chat_settings_menu(callback: CallbackQuery):
     phone, chat_id, page = await get_details_for_callback(callback)
-    settings = db_get_chat_settings(callback.from_user.id, phone, chat_id)
+    settings = await get_chat_settings(callback.from_user.id, phone, chat_id)
     if not settings:
         return await callback.answer("Error: Chat not found.", show_alert=True)
     
@@ -105,14 +106,40 @@ async def show_chat_settings_menu(callback: CallbackQuery):
         LEXICON['autoclean_disabled_text'] if settings['db_autoclean_limit'] <= 0
         else LEXICON['autoclean_enabled_text'].format(count=settings['db_autoclean_limit'])
     )
+    media_quota_text = (
+        LEXICON['media_quota_disabled_text'] if settings['media_quota_mb'] <= 0
+        else LEXICON['media_quota_enabled_text'].format(mb=settings['media_quota_mb'])
+    )
+    deletion_alerts_text = (
+        LEXICON['deletion_alerts_digest_text'].format(minutes=settings['deletion_digest_minutes'])
+        if settings['deletion_digest_minutes'] > 0 else LEXICON['deletion_alerts_instant_text']
+    )
+    adaptive_text = (
+        LEXICON['adaptive_enabled_text'].format(
+            min_interval=settings['min_check_frequency_seconds'], max_interval=settings['max_check_frequency_seconds']
+        ) if settings['adaptive_polling'] else LEXICON['off_text']
+    )
+    if settings['adaptive_polling'] and EVENT_DRIVEN_INGEST:
+        adaptive_text += LEXICON['adaptive_event_driven_note']
+    # The interval the scheduler actually used last, published by poll_chat
+    poll_status = await get_poll_status(callback.from_user.id, phone, chat_id)
+    effective_text = (
+        LEXICON['effective_interval_text'].format(interval=round(poll_status['interval']))
+        if 'interval' in poll_status else LEXICON['effective_interval_unknown']
+    )
     
     text = LEXICON['chat_settings_title'].format(chat_title=settings['title']) + "\n\n" + \
            LEXICON['chat_settings_menu_text'].format(
                 frequency=settings['check_frequency_seconds'],
+                adaptive_polling=adaptive_text,
+                effective_interval=effective_text,
                 initial_fetch=settings['initial_fetch_limit'],
                 autoclean_limit=autoclean_text,
                 download_media=LEXICON['on_text'] if settings['download_media'] else LEXICON['off_text'],
-                detect_deletions=LEXICON['on_text'] if settings['detect_deletions'] else LEXICON['off_text']
+                media_quota=media_quota_text,
+                detect_deletions=LEXICON['on_text'] if settings['detect_deletions'] else LEXICON['off_text'],
+                deletion_alerts=deletion_alerts_text,
+                deletion_budget=settings['deletion_check_budget']
             )
     await callback.message.edit_text(text, reply_markup=create_chat_settings_menu(phone, chat_id, page))
 
@@ -127,14 +154,14 @@ async def chat_settings_handler(callback: CallbackQuery):
 async def toggle_setting_handler(callback: CallbackQuery):
     _, key, phone, chat_id_str, page_str = callback.data.split(':')
     chat_id, page, user_id = int(chat_id_str), int(page_str), callback.from_user.id
-    settings = db_get_chat_settings(user_id, phone, chat_id)
+    settings = await get_chat_settings(user_id, phone, chat_id)
     if not settings:
         return await callback.answer("Error.", show_alert=True)
     
-    db_key_map = {'media': 'download_media', 'deletions': 'detect_deletions'}
+    db_key_map = {'media': 'download_media', 'deletions': 'detect_deletions', 'adaptive': 'adaptive_polling'}
     db_key = db_key_map[key]
     new_value = not settings[db_key]
-    db_update_chat_setting(user_id, phone, chat_id, db_key, int(new_value))
+    await update_chat_setting(user_id, phone, chat_id, db_key, int(new_value))
     await callback.answer(LEXICON['setting_updated_alert'])
     await show_chat_settings_menu(callback)
 
@@ -150,8 +177,13 @@ async def set_setting_handler(callback: CallbackQuery, state: FSMContext):
     )
     prompts = {
         'freq': (ChatSettings.entering_frequency, LEXICON['prompt_frequency']),
+        'minfreq': (ChatSettings.entering_min_frequency, LEXICON['prompt_min_frequency']),
+        'maxfreq': (ChatSettings.entering_max_frequency, LEXICON['prompt_max_frequency']),
         'fetch': (ChatSettings.entering_initial_fetch, LEXICON['prompt_initial_fetch']),
-        'clean': (ChatSettings.entering_autoclean, LEXICON['prompt_autoclean'])
+        'clean': (ChatSettings.entering_autoclean, LEXICON['prompt_autoclean']),
+        'budget': (ChatSettings.entering_deletion_budget, LEXICON['prompt_deletion_budget']),
+        'quota': (ChatSettings.entering_media_quota, LEXICON['prompt_media_quota']),
+        'digest': (ChatSettings.entering_deletion_digest, LEXICON['prompt_deletion_digest'])
     }
     target_state, prompt_text = prompts[key]
     await state.set_state(target_state)
@@ -169,7 +201,7 @@ async def process_numeric_setting(message: Message, state: FSMContext, bot: Bot,
         return
 
     data = await state.get_data()
-    db_update_chat_setting(message.from_user.id, data['phone'], data['chat_id'], key, value)
+    await update_chat_setting(message.from_user.id, data['phone'], data['chat_id'], key, value)
     
     await message.delete()  # Delete user's numeric input message
     
@@ -198,10 +230,30 @@ async def process_numeric_setting(message: Message, state: FSMContext, bot: Bot,
 async def process_frequency(message: Message, state: FSMContext, bot: Bot):
     await process_numeric_setting(message, state, bot, 'check_frequency_seconds', 5)
 
+@router.message(StateFilter(ChatSettings.entering_min_frequency))
+async def process_min_frequency(message: Message, state: FSMContext, bot: Bot):
+    await process_numeric_setting(message, state, bot, 'min_check_frequency_seconds', 5)
+
+@router.message(StateFilter(ChatSettings.entering_max_frequency))
+async def process_max_frequency(message: Message, state: FSMContext, bot: Bot):
+    await process_numeric_setting(message, state, bot, 'max_check_frequency_seconds', 5)
+
 @router.message(StateFilter(ChatSettings.entering_initial_fetch))
 async def process_initial_fetch(message: Message, state: FSMContext, bot: Bot):
     await process_numeric_setting(message, state, bot, 'initial_fetch_limit', 1)
 
 @router.message(StateFilter(ChatSettings.entering_autoclean))
 async def process_autoclean(message: Message, state: FSMContext, bot: Bot):
-    await process_numeric_setting(message, state, bot, 'db_autoclean_limit', 0)
\ No newline at end of file
+    await process_numeric_setting(message, state, bot, 'db_autoclean_limit', 0)
+
+@router.message(StateFilter(ChatSettings.entering_deletion_budget))
+async def process_deletion_budget(message: Message, state: FSMContext, bot: Bot):
+    await process_numeric_setting(message, state, bot, 'deletion_check_budget', 1)
+
+@router.message(StateFilter(ChatSettings.entering_media_quota))
+async def process_media_quota(message: Message, state: FSMContext, bot: Bot):
+    await process_numeric_setting(message, state, bot, 'media_quota_mb', 0)
+
+@router.message(StateFilter(ChatSettings.entering_deletion_digest))
+async def process_deletion_digest(message: Message, state: FSMContext, bot: Bot):
+    await process_numeric_setting(message, state, bot, 'deletion_digest_minutes', 0)
\ No newline at end of file
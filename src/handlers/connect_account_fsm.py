@@ -13,7 +13,7 @@ from telethon.errors import (
 from telethon.sessions import StringSession
 
 from src.config import CODE_LENGTH, SESSIONS_DIR
-from src.database.queries import db_add_session_credentials
+from src.database.async_queries import db_add_session_credentials
 from src.globals import active_sessions
 from src.handlers.session_management import show_session_menu
 from src.keyboards.inline import (
@@ -92,7 +92,7 @@ async def process_phone(message: Message, state: FSMContext):
     try:
         await client.connect()
         sent_code = await client.send_code_request(phone)
-        db_add_session_credentials(message.from_user.id, phone, api_id, api_hash)
+        await db_add_session_credentials(message.from_user.id, phone, api_id, api_hash)
         await state.update_data(
             phone=phone,
             phone_code_hash=sent_code.phone_code_hash,
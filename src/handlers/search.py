@@ -0,0 +1,102 @@
+import html
+
+from aiogram import F, Router
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message
+
+from src.config import SEARCH_RESULTS_PER_PAGE
+from src.database.async_queries import db_search_messages
+from src.database.queries import SNIPPET_OPEN, SNIPPET_CLOSE
+from src.keyboards.inline import create_cancel_keyboard, create_search_results_keyboard
+from src.services.chat_registry import get_chat_settings
+from src.states.user_states import SearchMessages
+from src.utils.helpers import build_fts_query, format_timestamp, get_details_for_callback, render_snippet
+from src.utils.lexicon import LEXICON
+
+router = Router()
+
+# --- Search Prompt ---
+
+def search_prompt_text(data: dict) -> str:
+    if data.get('chat_id') is not None:
+        return LEXICON['prompt_search_chat'].format(chat_title=data['chat_title'])
+    return LEXICON['prompt_search_session'].format(phone=data['phone'])
+
+@router.callback_query(F.data.startswith("search:"))
+async def start_session_search(callback: CallbackQuery, state: FSMContext):
+    phone = callback.data.split(":", 1)[1]
+    data = {'phone': phone, 'chat_id': None, 'chat_title': None, 'back_callback': f"view_session:{phone}"}
+    await state.set_data(data)
+    await state.set_state(SearchMessages.entering_query)
+    await callback.message.edit_text(search_prompt_text(data), reply_markup=create_cancel_keyboard())
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("search_chat:"))
+async def start_chat_search(callback: CallbackQuery, state: FSMContext):
+    phone, chat_id, page = await get_details_for_callback(callback)
+    settings = await get_chat_settings(callback.from_user.id, phone, chat_id)
+    if not settings:
+        return await callback.answer("Error: Chat not found.", show_alert=True)
+    data = {'phone': phone, 'chat_id': chat_id, 'chat_title': settings['title'], 'back_callback': f"view_chat:{phone}:{chat_id}:{page}"}
+    await state.set_data(data)
+    await state.set_state(SearchMessages.entering_query)
+    await callback.message.edit_text(search_prompt_text(data), reply_markup=create_cancel_keyboard())
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("search_again:"))
+async def restart_search(callback: CallbackQuery, state: FSMContext):
+    phone = callback.data.split(":", 1)[1]
+    data = await state.get_data()
+    if data.get('phone') != phone:
+        return await callback.answer(LEXICON['search_expired'], show_alert=True)
+    await state.set_state(SearchMessages.entering_query)
+    await callback.message.edit_text(search_prompt_text(data), reply_markup=create_cancel_keyboard())
+    await callback.answer()
+
+# --- Results ---
+
+async def render_search_page(user_id: int, data: dict, page: int):
+    offset = (page - 1) * SEARCH_RESULTS_PER_PAGE
+    # One extra row tells us whether a next page exists without counting every hit.
+    hits = await db_search_messages(user_id, data['phone'], data['match_query'], SEARCH_RESULTS_PER_PAGE + 1, offset, chat_id=data.get('chat_id'))
+    has_next = len(hits) > SEARCH_RESULTS_PER_PAGE
+    hits = hits[:SEARCH_RESULTS_PER_PAGE]
+
+    query = html.escape(data['query'])
+    if not hits:
+        text = LEXICON['search_no_results'].format(query=query)
+    else:
+        items = [
+            LEXICON['search_result_item'].format(
+                chat_title=html.escape(hit['title'] or str(hit['chat_id'])),
+                date=format_timestamp(hit['date'], '%Y-%m-%d %H:%M') or LEXICON['stats_not_available'],
+                deleted_mark=LEXICON['search_deleted_mark'] if hit['status'] == 'deleted' else "",
+                snippet=render_snippet(hit['snippet'], SNIPPET_OPEN, SNIPPET_CLOSE)
+            ) for hit in hits
+        ]
+        text = LEXICON['search_results_title'].format(query=query, page=page) + "\n\n" + "\n\n".join(items)
+    reply_markup = create_search_results_keyboard(data['phone'], page, has_next, data['back_callback'])
+    return text, reply_markup
+
+@router.message(StateFilter(SearchMessages.entering_query))
+async def process_search_query(message: Message, state: FSMContext):
+    match_query = build_fts_query(message.text)
+    if not match_query:
+        await message.answer(LEXICON['search_invalid_query'], reply_markup=create_cancel_keyboard())
+        return
+    await state.update_data(query=message.text, match_query=match_query)
+    # Leave the input state but keep the data so result pages can be flipped.
+    await state.set_state(None)
+    text, reply_markup = await render_search_page(message.from_user.id, await state.get_data(), page=1)
+    await message.answer(text, reply_markup=reply_markup)
+
+@router.callback_query(F.data.startswith("search_page:"))
+async def search_page_handler(callback: CallbackQuery, state: FSMContext):
+    _, phone, page = callback.data.split(":")
+    data = await state.get_data()
+    if data.get('phone') != phone or not data.get('match_query'):
+        return await callback.answer(LEXICON['search_expired'], show_alert=True)
+    text, reply_markup = await render_search_page(callback.from_user.id, data, int(page))
+    await callback.message.edit_text(text, reply_markup=reply_markup)
+    await callback.answer()
@@ -1,6 +1,6 @@
-import asyncio
 import logging
 import os
+import time
 from contextlib import suppress
 
 from aiogram import F, Router, Bot
@@ -8,22 +8,19 @@ from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import CommandStart, Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
-from telethon import TelegramClient
-from telethon.sessions import StringSession
-
 from src.config import SESSIONS_DIR
-from src.database.queries import (
-    db_get_session_credentials, db_get_chats, db_remove_session_credentials,
-    db_remove_all_chats_for_session
-)
-from src.globals import active_sessions, monitoring_tasks
+from src.database.async_queries import db_remove_session_credentials
+from src.globals import active_sessions
 from src.keyboards.inline import (
     create_session_management_menu, create_session_details_menu,
     create_confirm_delete_keyboard
 )
-from src.services.monitoring import session_supervisor
+from src.services.chat_registry import count_session_chats, remove_all_chats_for_session
+from src.services.client_registry import close_session_client
+from src.services.monitor_control import is_monitoring, start_monitoring, stop_monitoring
+from src.services.session_status import forget_session_status, get_session_status, refresh_session_status
 from src.states.user_states import SessionManagement
-from src.utils.helpers import get_user_sessions
+from src.utils.helpers import format_age, get_user_sessions
 from src.utils.lexicon import LEXICON
 
 router = Router()
@@ -59,50 +56,45 @@ async def back_to_session_menu(callback: CallbackQuery, state: FSMContext):
 
 # --- Session Details & Actions ---
 
-async def show_session_details(message_or_callback: Message | CallbackQuery, user_id: int, phone: str):
+async def show_session_details(message_or_callback: Message | CallbackQuery, user_id: int, phone: str, refresh: bool = False):
+    """Renders the session from the status cache; `refresh` fetches the profile first."""
     message_to_edit = message_or_callback.message if isinstance(message_or_callback, CallbackQuery) else message_or_callback
     
-    credentials = db_get_session_credentials(user_id, phone)
-    session_path = SESSIONS_DIR / f"{user_id}_{phone}.session"
-
-    if not credentials or not session_path.exists():
-        if isinstance(message_or_callback, CallbackQuery):
-            await message_or_callback.answer("Error: Session data not found.", show_alert=True)
-        return
-
-    api_id, api_hash = credentials
-    with open(session_path, "r") as f:
-        session_string = f.read()
-    
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
     try:
-        await client.connect()
-        if await client.is_user_authorized():
-            me = await client.get_me()
-            status, first_name, last_name, tg_user_id = "🟢 Online", me.first_name, me.last_name or "", me.id
+        if refresh:
+            session_status = await refresh_session_status(user_id, phone)
+        else:
+            session_status = await get_session_status(user_id, phone)
+        if session_status is None:
+            if isinstance(message_or_callback, CallbackQuery):
+                await message_or_callback.answer("Error: Session data not found.", show_alert=True)
+            return
+        if session_status['authorized'] and session_status['tg_user_id'] is not None:
+            status = "🟢 Online"
+            first_name, last_name, tg_user_id = session_status['first_name'], session_status['last_name'], session_status['tg_user_id']
+        elif session_status['elsewhere']:
+            status, first_name, last_name, tg_user_id = "🔵 Connected on another node", "N/A", "", "N/A"
         else:
             status, first_name, last_name, tg_user_id = "🔴 Disconnected", "N/A", "", "N/A"
-        
-        task_key = (user_id, phone)
-        is_monitoring = task_key in monitoring_tasks and not monitoring_tasks[task_key]['supervisor'].done()
-        monitoring_status = LEXICON['monitoring_status_active'] if is_monitoring else LEXICON['monitoring_status_inactive']
+
+        monitoring = is_monitoring(user_id, phone)
+        monitoring_status = LEXICON['monitoring_status_active'] if monitoring else LEXICON['monitoring_status_inactive']
         
         text = LEXICON['session_details_template'].format(
             first_name=first_name, last_name=last_name, phone=phone, user_id=tg_user_id,
-            status=status, monitoring_status=monitoring_status
+            status=status, monitoring_status=monitoring_status,
+            age=format_age(time.monotonic() - session_status['fetched_at'])
         )
-        monitored_chats_count = len(db_get_chats(user_id, phone))
-        reply_markup = create_session_details_menu(phone, monitored_chats_count, is_monitoring)
+        monitored_chats_count = await count_session_chats(user_id, phone)
+        reply_markup = create_session_details_menu(phone, monitored_chats_count, monitoring)
         
-        await message_to_edit.edit_text(text, reply_markup=reply_markup)
+        with suppress(TelegramBadRequest):  # Unchanged text after a refresh
+            await message_to_edit.edit_text(text, reply_markup=reply_markup)
 
     except Exception as e:
         logging.error(f"Failed to connect to session {phone}: {e}")
         if isinstance(message_or_callback, CallbackQuery):
             await message_or_callback.answer("Error: Could not connect to this session.", show_alert=True)
-    finally:
-        if client.is_connected():
-            await client.disconnect()
 
 @router.callback_query(F.data.startswith("view_session:"))
 async def view_session_details_handler(callback: CallbackQuery):
@@ -110,6 +102,12 @@ async def view_session_details_handler(callback: CallbackQuery):
     await show_session_details(callback, callback.from_user.id, phone)
     await callback.answer()
 
+@router.callback_query(F.data.startswith("refresh_session:"))
+async def refresh_session_details_handler(callback: CallbackQuery):
+    phone = callback.data.split(":", 1)[1]
+    await show_session_details(callback, callback.from_user.id, phone, refresh=True)
+    await callback.answer()
+
 @router.callback_query(F.data.startswith("set_active:"))
 async def set_active_session_handler(callback: CallbackQuery):
     phone = callback.data.split(":", 1)[1]
@@ -134,19 +132,19 @@ async def confirm_delete_session(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
     
     # Stop monitoring if active
-    task_key = (user_id, phone)
-    session_task_info = monitoring_tasks.pop(task_key, None)
-    if session_task_info and not session_task_info['supervisor'].done():
-        session_task_info['supervisor'].cancel()
+    await stop_monitoring(user_id, phone)
         
+    await close_session_client(user_id, phone)
+    forget_session_status(user_id, phone)
+
     # Delete session file
     session_file = SESSIONS_DIR / f"{user_id}_{phone}.session"
     if os.path.exists(session_file):
         os.remove(session_file)
         
     # Clean up database
-    db_remove_session_credentials(user_id, phone)
-    db_remove_all_chats_for_session(user_id, phone)
+    await db_remove_session_credentials(user_id, phone)
+    await remove_all_chats_for_session(user_id, phone)
     
     # Clear from active session cache
     if active_sessions.get(user_id) == phone:
@@ -162,14 +160,10 @@ async def confirm_delete_session(callback: CallbackQuery, state: FSMContext):
 async def start_monitoring_handler(callback: CallbackQuery, bot: Bot):
     phone = callback.data.split(":", 1)[1]
     user_id = callback.from_user.id
-    task_key = (user_id, phone)
     
-    if task_key in monitoring_tasks and not monitoring_tasks[task_key]['supervisor'].done():
+    if not await start_monitoring(user_id, phone, bot):
         await callback.answer("Monitoring is already active.", show_alert=True)
         return
-        
-    supervisor_task = asyncio.create_task(session_supervisor(user_id, phone, bot))
-    monitoring_tasks[task_key] = {'supervisor': supervisor_task, 'workers': {}}
     
     await callback.answer(LEXICON['monitoring_started_alert'], show_alert=True)
     await show_session_details(callback, user_id, phone)
@@ -178,11 +172,8 @@ async def start_monitoring_handler(callback: CallbackQuery, bot: Bot):
 async def stop_monitoring_handler(callback: CallbackQuery):
     phone = callback.data.split(":", 1)[1]
     user_id = callback.from_user.id
-    task_key = (user_id, phone)
     
-    session_task_info = monitoring_tasks.pop(task_key, None)
-    if session_task_info and not session_task_info['supervisor'].done():
-        session_task_info['supervisor'].cancel()
+    if await stop_monitoring(user_id, phone):
         await callback.answer(LEXICON['monitoring_stopped_alert'], show_alert=True)
     else:
         await callback.answer("Monitoring is not currently active.", show_alert=True)
@@ -1,48 +1,33 @@
-from datetime import datetime
-
 from aiogram import F, Router
 from aiogram.types import CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder, InlineKeyboardButton
 
-from src.database.queries import db_get_chats, db_calculate_chat_statistics, db_get_chat_settings
+from src.config import STATS_ITEMS_PER_PAGE
+from src.database.async_queries import db_get_statistics_page, db_calculate_chat_statistics, db_get_chat_settings
 from src.keyboards.inline import create_statistics_list_keyboard, create_detailed_stats_keyboard
-from src.utils.helpers import format_bytes
+from src.utils.helpers import format_bytes, format_timestamp
 from src.utils.lexicon import LEXICON
 
 router = Router()
 
 async def display_statistics_list(callback: CallbackQuery, phone: str, sort_key: str, page: int):
     user_id = callback.from_user.id
-    chats = db_get_chats(user_id, phone)
-    
-    if not chats:
+    offset = (max(page, 1) - 1) * STATS_ITEMS_PER_PAGE
+    page_chats, total_chats, has_messages = await db_get_statistics_page(user_id, phone, sort_key, STATS_ITEMS_PER_PAGE, offset)
+
+    if not total_chats:
         await callback.message.edit_text(
             LEXICON['no_chats_monitored'],
             reply_markup=InlineKeyboardBuilder().add(InlineKeyboardButton(text=LEXICON['back_button'], callback_data=f"view_session:{phone}")).as_markup()
         )
         return
 
-    chats_with_stats = []
-    for chat in chats:
-        stats = db_calculate_chat_statistics(phone, chat['id'])
-        chats_with_stats.append({**chat, **stats})
-    
-    sort_map = {
-        'total': ('total_messages', True),
-        'deleted': ('deleted_messages', True),
-        'volume': ('media_size_bytes', True),
-        'activity': ('last_message_ts', True),
-    }
-    sort_field, reverse = sort_map.get(sort_key, ('total_messages', True))
-    
-    chats_with_stats.sort(key=lambda x: (x[sort_field] is not None, x[sort_field]), reverse=reverse)
-
-    if not any(c['total_messages'] > 0 for c in chats_with_stats):
+    if not has_messages:
         text = LEXICON['no_stats_yet']
     else:
         text = LEXICON['statistics_title'].format(phone=phone)
     
-    reply_markup = create_statistics_list_keyboard(chats_with_stats, phone, sort_key, current_page=page)
+    reply_markup = create_statistics_list_keyboard(page_chats, total_chats, phone, sort_key, current_page=page, items_per_page=STATS_ITEMS_PER_PAGE)
     await callback.message.edit_text(text, reply_markup=reply_markup)
 
 
@@ -70,15 +55,14 @@ async def view_detailed_stats_handler(callback: CallbackQuery):
     chat_id, page = int(chat_id_str), int(page_str)
     user_id = callback.from_user.id
 
-    chat_info = db_get_chat_settings(user_id, phone, chat_id)
+    chat_info = await db_get_chat_settings(user_id, phone, chat_id)
     if not chat_info:
         return await callback.answer("Chat not found.", show_alert=True)
     
-    stats = db_calculate_chat_statistics(phone, chat_id)
+    stats = await db_calculate_chat_statistics(phone, chat_id)
 
     def format_ts(ts):
-        if not ts: return LEXICON['stats_not_available']
-        return datetime.fromisoformat(ts).strftime('%Y-%m-%d %H:%M:%S')
+        return format_timestamp(ts) or LEXICON['stats_not_available']
 
     deletion_rate = (stats['deleted_messages'] / stats['total_messages'] * 100) if stats['total_messages'] > 0 else 0
 
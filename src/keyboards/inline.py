@@ -28,8 +28,12 @@ def create_session_details_menu(phone: str, num_chats: int, is_monitoring: bool)
         InlineKeyboardButton(text=f"{num_chats}{LEXICON['my_chats_button']}", callback_data=f"my_chats:{phone}"),
         InlineKeyboardButton(text=LEXICON['statistics_button'], callback_data=f"stats_menu:{phone}")
     )
+    builder.row(InlineKeyboardButton(text=LEXICON['search_button'], callback_data=f"search:{phone}"))
     builder.row(InlineKeyboardButton(text=LEXICON['add_chat_button'], callback_data=f"add_chat:{phone}"))
-    builder.row(InlineKeyboardButton(text=LEXICON['back_button'], callback_data="back_to_sessions"))
+    builder.row(
+        InlineKeyboardButton(text=LEXICON['refresh_session_button'], callback_data=f"refresh_session:{phone}"),
+        InlineKeyboardButton(text=LEXICON['back_button'], callback_data="back_to_sessions")
+    )
     return builder.as_markup()
 
 def create_paginated_chat_list_keyboard(chats: List[Dict[str, Any]], phone: str, current_page: int = 1, items_per_page: int = 5) -> InlineKeyboardMarkup:
@@ -66,6 +70,7 @@ def create_paginated_chat_list_keyboard(chats: List[Dict[str, Any]], phone: str,
 def create_chat_details_menu(phone: str, chat_id: int, page: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=LEXICON['chat_settings_button'], callback_data=f"chat_settings:{phone}:{chat_id}:{page}"))
+    builder.row(InlineKeyboardButton(text=LEXICON['search_chat_button'], callback_data=f"search_chat:{phone}:{chat_id}:{page}"))
     builder.row(InlineKeyboardButton(text=LEXICON['delete_chat_button'], callback_data=f"delete_chat:{phone}:{chat_id}:{page}"))
     builder.row(InlineKeyboardButton(text=LEXICON['back_to_chats_button'], callback_data=f"chat_page:{phone}:{page}"))
     return builder.as_markup()
@@ -73,10 +78,18 @@ def create_chat_details_menu(phone: str, chat_id: int, page: int) -> InlineKeybo
 def create_chat_settings_menu(phone: str, chat_id: int, page: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=LEXICON['set_frequency_button'], callback_data=f"set_setting:freq:{phone}:{chat_id}:{page}"))
+    builder.row(InlineKeyboardButton(text=LEXICON['toggle_adaptive_button'], callback_data=f"toggle_setting:adaptive:{phone}:{chat_id}:{page}"))
+    builder.row(
+        InlineKeyboardButton(text=LEXICON['set_min_frequency_button'], callback_data=f"set_setting:minfreq:{phone}:{chat_id}:{page}"),
+        InlineKeyboardButton(text=LEXICON['set_max_frequency_button'], callback_data=f"set_setting:maxfreq:{phone}:{chat_id}:{page}")
+    )
     builder.row(InlineKeyboardButton(text=LEXICON['set_initial_fetch_button'], callback_data=f"set_setting:fetch:{phone}:{chat_id}:{page}"))
     builder.row(InlineKeyboardButton(text=LEXICON['set_autoclean_button'], callback_data=f"set_setting:clean:{phone}:{chat_id}:{page}"))
     builder.row(InlineKeyboardButton(text=LEXICON['toggle_media_button'], callback_data=f"toggle_setting:media:{phone}:{chat_id}:{page}"))
+    builder.row(InlineKeyboardButton(text=LEXICON['set_media_quota_button'], callback_data=f"set_setting:quota:{phone}:{chat_id}:{page}"))
     builder.row(InlineKeyboardButton(text=LEXICON['toggle_deletions_button'], callback_data=f"toggle_setting:deletions:{phone}:{chat_id}:{page}"))
+    builder.row(InlineKeyboardButton(text=LEXICON['set_deletion_budget_button'], callback_data=f"set_setting:budget:{phone}:{chat_id}:{page}"))
+    builder.row(InlineKeyboardButton(text=LEXICON['set_deletion_digest_button'], callback_data=f"set_setting:digest:{phone}:{chat_id}:{page}"))
     builder.row(InlineKeyboardButton(text=LEXICON['back_to_chat_details_button'], callback_data=f"view_chat:{phone}:{chat_id}:{page}"))
     return builder.as_markup()
 
@@ -117,7 +130,7 @@ def create_confirm_delete_chat_keyboard(phone: str, chat_id: int, page: int) ->
     )
     return builder.as_markup()
 
-def create_statistics_list_keyboard(chats_with_stats: List[Dict[str, Any]], phone: str, sort_key: str, current_page: int = 1, items_per_page: int = 5) -> InlineKeyboardMarkup:
+def create_statistics_list_keyboard(page_chats: List[Dict[str, Any]], total_items: int, phone: str, sort_key: str, current_page: int = 1, items_per_page: int = 5) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
     sort_buttons = {
@@ -134,12 +147,9 @@ def create_statistics_list_keyboard(chats_with_stats: List[Dict[str, Any]], phon
     ]
     builder.row(*sort_row)
 
-    total_items = len(chats_with_stats)
     total_pages = math.ceil(total_items / items_per_page)
-    start_index = (current_page - 1) * items_per_page
-    end_index = start_index + items_per_page
 
-    for chat in chats_with_stats[start_index:end_index]:
+    for chat in page_chats:
         title = (chat['title'][:48] + '...') if len(chat['title']) > 50 else chat['title']
         callback_data = f"view_stats:{phone}:{chat['id']}:{sort_key}:{current_page}"
         builder.row(InlineKeyboardButton(text=title, callback_data=callback_data))
@@ -166,4 +176,20 @@ def create_statistics_list_keyboard(chats_with_stats: List[Dict[str, Any]], phon
 def create_detailed_stats_keyboard(phone: str, sort_key: str, page: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=LEXICON['back_to_stats_button'], callback_data=f"stats_page:{phone}:{sort_key}:{page}"))
+    return builder.as_markup()
+
+def create_search_results_keyboard(phone: str, current_page: int, has_next: bool, back_callback: str) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    page_nav_row = []
+    if current_page > 1:
+        page_nav_row.extend([
+            InlineKeyboardButton(text=LEXICON['first_page'], callback_data=f"search_page:{phone}:1"),
+            InlineKeyboardButton(text=LEXICON['prev_page'], callback_data=f"search_page:{phone}:{current_page - 1}")
+        ])
+    if has_next:
+        page_nav_row.append(InlineKeyboardButton(text=LEXICON['next_page'], callback_data=f"search_page:{phone}:{current_page + 1}"))
+    if page_nav_row:
+        builder.row(*page_nav_row)
+    builder.row(InlineKeyboardButton(text=LEXICON['new_search_button'], callback_data=f"search_again:{phone}"))
+    builder.row(InlineKeyboardButton(text=LEXICON['back_button'], callback_data=back_callback))
     return builder.as_markup()
\ No newline at end of file
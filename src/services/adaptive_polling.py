@@ -0,0 +1,18 @@
+from typing import Tuple
+
+from src.config import ADAPTIVE_BACKOFF_FACTOR, ADAPTIVE_EWMA_ALPHA, ADAPTIVE_SPEEDUP_FACTOR, ADAPTIVE_TARGET_MESSAGES
+
+def next_poll_interval(current: float, new_messages: int, rate: float, lower: float, upper: float) -> Tuple[float, float]:
+    """Moves a chat's poll interval towards its observed traffic.
+
+    `rate` is the EWMA of new messages per poll. An empty poll multiplies the interval by
+    ADAPTIVE_BACKOFF_FACTOR; a poll that found messages shrinks it by at least
+    ADAPTIVE_SPEEDUP_FACTOR, and further while the EWMA is above ADAPTIVE_TARGET_MESSAGES.
+    The result is kept within [lower, upper]. Returns (interval, rate).
+    """
+    rate = ADAPTIVE_EWMA_ALPHA * new_messages + (1 - ADAPTIVE_EWMA_ALPHA) * rate
+    if new_messages == 0:
+        interval = current * ADAPTIVE_BACKOFF_FACTOR
+    else:
+        interval = current * min(ADAPTIVE_SPEEDUP_FACTOR, ADAPTIVE_TARGET_MESSAGES / rate)
+    return min(max(interval, lower), max(lower, upper)), rate
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+import os
+
+from src.config import AUTOCLEAN_BATCH_SIZE
+from src.database.async_queries import db_autoclean_messages, db_count_chat_messages
+from src.services.media_pipeline import sweep_orphan_media
+
+def unlink_media_files(file_paths: list[str]):
+    for file_path in file_paths:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not remove media file {file_path}: {e}")
+
+async def autoclean_chat(session_phone: str, chat_id: int, limit: int) -> int:
+    """Trims a chat down to its newest `limit` messages and removes their media from disk.
+
+    Deletes in batches of AUTOCLEAN_BATCH_SIZE so a large backlog never holds the
+    writer for long. Stored media shared with newer messages or other chats is kept
+    until its last reference is gone. Returns the number of deleted messages.
+    """
+    if limit <= 0 or await db_count_chat_messages(session_phone, chat_id) <= limit:
+        return 0
+
+    removed = 0
+    while True:
+        deleted, file_paths = await db_autoclean_messages(session_phone, chat_id, limit, AUTOCLEAN_BATCH_SIZE)
+        if file_paths:
+            await asyncio.to_thread(unlink_media_files, file_paths)
+        removed += deleted
+        if deleted < AUTOCLEAN_BATCH_SIZE:
+            break
+    if removed:
+        await sweep_orphan_media()
+        logging.info(f"Autoclean removed {removed} messages from chat {chat_id} ({session_phone}).")
+    return removed
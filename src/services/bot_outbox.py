@@ -0,0 +1,198 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from src.config import (
+    BOT_CHAT_BURST, BOT_CHAT_RATE, BOT_GLOBAL_BURST, BOT_GLOBAL_RATE, BOT_GROUP_BURST, BOT_GROUP_RATE,
+    BOT_OUTBOX_REPORT_INTERVAL, BOT_SEND_MAX_RETRIES, BOT_SEND_RETRY_BASE_DELAY
+)
+
+# Lower values are sent first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# Methods that post a message: one may have been delivered before a network error
+NON_IDEMPOTENT_PREFIXES = ('send', 'forward', 'copy')
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar('bot_outbox_priority', default=PRIORITY_INTERACTIVE)
+
+@contextmanager
+def bulk_sends() -> Iterator[None]:
+    """Bot API calls made inside this block queue behind interactive replies."""
+    token = _priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class _Bucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at: float | None = None
+
+    def wait_time(self, now: float) -> float:
+        """Refills the bucket and returns the seconds until it holds a token (0 if it does now)."""
+        if self.refilled_at is not None:
+            if now < self.refilled_at:  # Paused by a retry-after
+                return self.refilled_at - now + max(0.0, 1 - self.tokens) / self.rate
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+        return max(0.0, 1 - self.tokens) / self.rate
+
+    def pause(self, now: float, seconds: float):
+        self.tokens = 0.0
+        self.refilled_at = now + seconds
+
+class OutboundLimiter(BaseRequestMiddleware):
+    """Bot session middleware that paces every Bot API call addressed to a chat.
+
+    A global token bucket keeps the bot under Telegram's overall limit and a bucket per
+    chat under the per-chat one (stricter for groups). Calls wait in one priority queue:
+    interactive replies go before anything sent inside bulk_sends(), such as deletion
+    alerts. TelegramRetryAfter pauses the chat for the requested time and the call is
+    retried, as are server errors with exponential back-off, up to BOT_SEND_MAX_RETRIES
+    times. Network errors are retried only for calls that do not post a message, as a
+    resend could duplicate one.
+    """
+
+    def __init__(self, global_rate: float = BOT_GLOBAL_RATE, global_burst: int = BOT_GLOBAL_BURST):
+        # Processes sharing one bot token each get a share of the global limit.
+        self._global = _Bucket(global_rate, global_burst)
+        self._chats: Dict[int | str, _Bucket] = {}
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self._pump: asyncio.Task | None = None
+        self.stats: Dict[str, float] = {'sent': 0, 'queued_max': 0, 'delay_total': 0.0, 'delay_max': 0.0, 'retry_after': 0, 'retries': 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def set_global_limit(self, rate: float, burst: int):
+        """Changes this process's share of the global limit, e.g. when bot instances join or leave."""
+        self._global.rate, self._global.burst = rate, burst
+        self._global.tokens = min(self._global.tokens, burst)
+
+    def _chat_bucket(self, chat_id: int | str) -> _Bucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Private chats have positive ids; groups, channels and @usernames get the group limit.
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = _Bucket(BOT_CHAT_RATE, BOT_CHAT_BURST)
+            else:
+                bucket = _Bucket(BOT_GROUP_RATE, BOT_GROUP_BURST)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType], bot: Bot, method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await make_request(bot, method)
+        for attempt in range(BOT_SEND_MAX_RETRIES + 1):
+            await self._acquire(chat_id, _priority.get())
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.stats['retry_after'] += 1
+                logging.warning(f"Bot API asked to retry {method.__api_method__} to chat {chat_id} after {e.retry_after}s.")
+                self._chat_bucket(chat_id).pause(asyncio.get_running_loop().time(), e.retry_after)
+                if attempt == BOT_SEND_MAX_RETRIES:
+                    raise
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt == BOT_SEND_MAX_RETRIES:
+                    raise
+                if isinstance(e, TelegramNetworkError) and method.__api_method__.startswith(NON_IDEMPOTENT_PREFIXES):
+                    raise
+                delay = BOT_SEND_RETRY_BASE_DELAY * 2 ** attempt
+                logging.warning(f"Bot API {method.__api_method__} to chat {chat_id} failed: {e}. Retrying in {delay}s.")
+                await asyncio.sleep(delay)
+            self.stats['retries'] += 1
+
+    async def _acquire(self, chat_id: int | str, priority: int):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        grant = loop.create_future()
+        self._waiters.append((priority, next(self._seq), chat_id, grant))
+        self.stats['queued_max'] = max(self.stats['queued_max'], len(self._waiters))
+        self._changed.set()
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._grant())
+        try:
+            await grant
+        finally:
+            grant.cancel()  # A cancelled waiter is dropped by the pump
+        delay = loop.time() - started
+        self.stats['sent'] += 1
+        self.stats['delay_total'] += delay
+        self.stats['delay_max'] = max(self.stats['delay_max'], delay)
+
+    async def _grant(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._changed.clear()
+            self._waiters = sorted(w for w in self._waiters if not w[3].done())
+            if not self._waiters:
+                return
+            now = loop.time()
+            sleep = self._global.wait_time(now) or self._grant_next(now)
+            if sleep is None:
+                continue
+            # Wake early if a new call arrives; it may be for an idle chat.
+            changed = asyncio.ensure_future(self._changed.wait())
+            try:
+                await asyncio.wait({changed}, timeout=sleep)
+            finally:
+                changed.cancel()
+
+    def _grant_next(self, now: float) -> float | None:
+        """Lets the most urgent waiter whose chat has a token through.
+
+        Returns None if one was granted, otherwise the seconds until a chat has a token.
+        """
+        soonest, blocked = None, set()
+        for waiter in self._waiters:
+            chat_id = waiter[2]
+            if chat_id in blocked:
+                continue
+            bucket = self._chat_bucket(chat_id)
+            wait = bucket.wait_time(now)
+            if not wait:
+                self._waiters.remove(waiter)
+                self._global.tokens -= 1
+                bucket.tokens -= 1
+                waiter[3].set_result(None)
+                return None
+            blocked.add(chat_id)
+            soonest = wait if soonest is None else min(soonest, wait)
+        return soonest
+
+    def log_stats(self):
+        sent = self.stats['sent']
+        avg = self.stats['delay_total'] / sent if sent else 0.0
+        logging.info(
+            f"Bot outbox: {sent:.0f} calls, {self.queued} queued (max {self.stats['queued_max']:.0f}), "
+            f"delay avg {avg:.2f}s, max {self.stats['delay_max']:.1f}s, "
+            f"{self.stats['retry_after']:.0f} retry-after, {self.stats['retries']:.0f} retries."
+        )
+
+
+async def report_outbox_stats(limiter: OutboundLimiter, interval: float = BOT_OUTBOX_REPORT_INTERVAL):
+    """Logs the outbox queue depth and delays every `interval` seconds while there is traffic."""
+    last_sent = 0
+    while True:
+        await asyncio.sleep(interval)
+        if limiter.stats['sent'] != last_sent or limiter.queued:
+            limiter.log_stats()
+            last_sent = limiter.stats['sent']
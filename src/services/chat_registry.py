@@ -0,0 +1,94 @@
+import time
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from src.config import CHAT_SETTINGS_MAX_AGE
+from src.database.async_queries import (
+    db_add_chat, db_get_chat_settings, db_get_chats, db_remove_all_chats_for_session,
+    db_remove_chat, db_update_chat_setting
+)
+from src.services.scheduler import wake_poll
+
+ChatKey = Tuple[int, str, int]  # (user_id, session_phone, chat_id)
+
+# Process-wide view of monitored_chats rows. Writers go through the functions below,
+# which update the database first and then publish the new row here.
+_settings: Dict[ChatKey, Dict[str, Any]] = {}
+# When the settings were loaded. With several nodes sharing the database they are
+# re-read after CHAT_SETTINGS_MAX_AGE seconds, since the change was published elsewhere.
+_loaded_at: Dict[ChatKey, float] = {}
+# Monitored chat ids per (user_id, session_phone), loaded on first use and kept in step
+# with the writes below.
+_session_chats: Dict[Tuple[int, str], Set[int]] = {}
+# Called with (user_id, session_phone, chat_id) after every change, e.g. to tell a
+# monitor worker process that owns the session to reload the chat.
+_listeners: List[Callable[[int, str, int], None]] = []
+
+def add_chat_listener(listener: Callable[[int, str, int], None]):
+    _listeners.append(listener)
+
+def reload_chat_settings(user_id: int, session_phone: str, chat_id: int):
+    """Drops the cached settings of a chat changed by another process; the next read loads them."""
+    _settings.pop((user_id, session_phone, chat_id), None)
+    _loaded_at[(user_id, session_phone, chat_id)] = time.monotonic()  # Discards loads already in flight
+    _session_chats.pop((user_id, session_phone), None)
+    wake_poll((user_id, session_phone, chat_id))
+
+def publish_chat_settings(user_id: int, session_phone: str, chat_id: int, settings: Dict[str, Any] | None):
+    """Replaces the cached settings of a chat (None marks it removed) and polls it right away."""
+    key = (user_id, session_phone, chat_id)
+    chat_ids = _session_chats.get((user_id, session_phone))
+    _loaded_at[key] = time.monotonic()
+    if settings is None:
+        _settings.pop(key, None)
+        if chat_ids is not None:
+            chat_ids.discard(chat_id)
+    else:
+        _settings[key] = settings
+        if chat_ids is not None:
+            chat_ids.add(chat_id)
+    wake_poll(key)
+    for listener in _listeners:
+        listener(user_id, session_phone, chat_id)
+
+async def get_chat_settings(user_id: int, session_phone: str, chat_id: int) -> Dict[str, Any] | None:
+    """Returns the chat's settings from memory, loading them from the database on first use."""
+    key = (user_id, session_phone, chat_id)
+    stale = CHAT_SETTINGS_MAX_AGE > 0 and time.monotonic() - _loaded_at.get(key, 0.0) > CHAT_SETTINGS_MAX_AGE
+    if key not in _settings or stale:
+        loaded_at = time.monotonic()
+        settings = await db_get_chat_settings(user_id, session_phone, chat_id)
+        if _loaded_at.get(key, 0.0) < loaded_at:  # Not published meanwhile
+            _loaded_at[key] = loaded_at
+            if settings is None:
+                _settings.pop(key, None)
+            else:
+                _settings[key] = settings
+    return _settings.get(key)
+
+async def count_session_chats(user_id: int, session_phone: str) -> int:
+    """Number of chats the session monitors, from memory after the first call."""
+    key = (user_id, session_phone)
+    if key not in _session_chats:
+        chat_ids = {c['id'] for c in await db_get_chats(user_id, session_phone)}
+        _session_chats.setdefault(key, chat_ids)
+    return len(_session_chats[key])
+
+async def add_chat(user_id: int, session_phone: str, chat_id: int, title: str, chat_type: str):
+    await db_add_chat(user_id, session_phone, chat_id, title, chat_type)
+    settings = await db_get_chat_settings(user_id, session_phone, chat_id)
+    publish_chat_settings(user_id, session_phone, chat_id, settings)
+
+async def update_chat_setting(user_id: int, session_phone: str, chat_id: int, setting_key: str, setting_value: Any):
+    await db_update_chat_setting(user_id, session_phone, chat_id, setting_key, setting_value)
+    settings = await db_get_chat_settings(user_id, session_phone, chat_id)
+    publish_chat_settings(user_id, session_phone, chat_id, settings)
+
+async def remove_chat(user_id: int, session_phone: str, chat_id: int):
+    await db_remove_chat(user_id, session_phone, chat_id)
+    publish_chat_settings(user_id, session_phone, chat_id, None)
+
+async def remove_all_chats_for_session(user_id: int, session_phone: str):
+    await db_remove_all_chats_for_session(user_id, session_phone)
+    for key in [k for k in _settings if k[:2] == (user_id, session_phone)]:
+        publish_chat_settings(*key, None)
+    _session_chats[(user_id, session_phone)] = set()
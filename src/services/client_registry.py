@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Tuple
+
+from telethon import TelegramClient
+from telethon.sessions import StringSession
+
+from src.config import CLIENT_IDLE_TIMEOUT, LIVE_CLIENT_WAIT_TIMEOUT, SESSIONS_DIR
+from src.database.async_queries import db_get_session_credentials
+
+SessionKey = Tuple[int, str]  # (user_id, session_phone)
+# Runs func(client, *args) in the process that holds the session's connection.
+RemoteRunner = Callable[..., Awaitable[Any]]
+
+class SessionOwnedElsewhere(Exception):
+    """The session is connected by another bot instance that this process cannot reach."""
+
+# Connected clients of running supervisors, and clients opened for UI actions while a
+# session is not monitored. Each pooled entry: client, users, lock, idle timer handle.
+_live: Dict[SessionKey, TelegramClient] = {}
+# Set once a supervisor that announced itself with expect_live_client has connected.
+_live_ready: Dict[SessionKey, asyncio.Event] = {}
+_pooled: Dict[SessionKey, Dict[str, Any]] = {}
+# Set by monitor_control when supervisors may run in other processes: returns how to reach
+# the process that runs the session, or None if this process may connect it itself.
+# A second connection on the same auth key risks AuthKeyDuplicatedError.
+_remote_runner: Callable[[int, str], RemoteRunner | None] = lambda user_id, session_phone: None
+
+def set_remote_runner(runner: Callable[[int, str], RemoteRunner | None]):
+    global _remote_runner
+    _remote_runner = runner
+
+async def load_session(user_id: int, session_phone: str) -> Tuple[int, str, str] | None:
+    """Returns (api_id, api_hash, session_string), or None if the credentials or session file are missing."""
+    credentials = await db_get_session_credentials(user_id, session_phone)
+    session_path = SESSIONS_DIR / f"{user_id}_{session_phone}.session"
+    if not credentials or not session_path.exists():
+        return None
+    session_string = await asyncio.to_thread(session_path.read_text)
+    return credentials[0], credentials[1], session_string
+
+def expect_live_client(user_id: int, session_phone: str):
+    """Announces a supervisor that is about to connect; UI actions wait for its client meanwhile."""
+    _live_ready.setdefault((user_id, session_phone), asyncio.Event())
+
+def register_live_client(user_id: int, session_phone: str, client: TelegramClient):
+    """Offers a supervisor's connected client to UI actions; an idle pooled client is closed."""
+    key = (user_id, session_phone)
+    _live[key] = client
+    _live_ready.setdefault(key, asyncio.Event()).set()
+    entry = _pooled.get(key)
+    if entry is not None and entry['users'] == 0:
+        asyncio.create_task(_close_pooled(key, entry))
+
+def unregister_live_client(user_id: int, session_phone: str, client: TelegramClient):
+    key = (user_id, session_phone)
+    if _live.get(key) is client:
+        del _live[key]
+    ready = _live_ready.pop(key, None)
+    if ready is not None:
+        ready.set()  # Waiters fall back to a pooled client
+
+@asynccontextmanager
+async def session_client(user_id: int, session_phone: str) -> AsyncIterator[TelegramClient | None]:
+    """Yields a connected client of the session for a UI action, or None if the session is gone.
+
+    While the session is monitored this is the supervisor's own client. Otherwise a
+    pooled client is connected on first use and kept for CLIENT_IDLE_TIMEOUT seconds
+    after the last action, so consecutive button presses share one MTProto connection.
+    Sessions run by another process need run_with_client() instead.
+    """
+    key = (user_id, session_phone)
+    live = _live.get(key)
+    if live is not None and live.is_connected():
+        yield live
+        return
+
+    entry = _pooled.get(key)
+    if entry is None:
+        entry = _pooled[key] = {'client': None, 'users': 0, 'lock': asyncio.Lock(), 'idle_timer': None}
+    entry['users'] += 1
+    if entry['idle_timer'] is not None:
+        entry['idle_timer'].cancel()
+        entry['idle_timer'] = None
+    try:
+        async with entry['lock']:
+            if entry['client'] is None or not entry['client'].is_connected():
+                session = await load_session(user_id, session_phone)
+                if session is None:
+                    entry['client'] = None
+                else:
+                    api_id, api_hash, session_string = session
+                    entry['client'] = TelegramClient(StringSession(session_string), api_id, api_hash)
+                    await entry['client'].connect()
+        yield entry['client']
+    finally:
+        entry['users'] -= 1
+        if entry['users'] == 0 and _pooled.get(key) is entry:
+            if key in _live or entry['client'] is None or _remote_runner(*key) is not None:
+                asyncio.create_task(_close_pooled(key, entry))
+            else:
+                entry['idle_timer'] = asyncio.get_running_loop().call_later(
+                    CLIENT_IDLE_TIMEOUT, lambda: asyncio.create_task(_close_pooled(key, entry))
+                )
+
+async def run_with_client(user_id: int, session_phone: str, func: Callable[..., Awaitable[Any]], *args) -> Any:
+    """Returns `await func(client, *args)` with a connected client of the session (None if it is gone).
+
+    When a monitor worker process runs the session, `func` runs there on the supervisor's
+    client, so it must be a module-level function with picklable arguments and result.
+    If a supervisor here is still connecting, its client is awaited rather than a second
+    one opened on the same auth key. Raises SessionOwnedElsewhere if another bot instance
+    runs the session.
+    """
+    key = (user_id, session_phone)
+    if key not in _live:
+        runner = _remote_runner(user_id, session_phone)
+        if runner is not None:
+            await close_session_client(user_id, session_phone)  # Opened before the session moved
+            return await runner(func, *args)
+        ready = _live_ready.get(key)
+        if ready is not None:
+            await asyncio.wait_for(ready.wait(), LIVE_CLIENT_WAIT_TIMEOUT)
+    async with session_client(user_id, session_phone) as client:
+        return await func(client, *args)
+
+async def _close_pooled(key: SessionKey, entry: Dict[str, Any], force: bool = False):
+    if _pooled.get(key) is not entry or (entry['users'] > 0 and not force):
+        return  # Already closed, or back in use
+    del _pooled[key]
+    if entry['idle_timer'] is not None:
+        entry['idle_timer'].cancel()
+    client = entry['client']
+    if client is not None and client.is_connected():
+        try:
+            await client.disconnect()
+        except Exception as e:
+            logging.warning(f"Error while closing idle client for {key[1]}: {e}")
+
+async def close_session_client(user_id: int, session_phone: str):
+    """Drops the pooled client of a session, e.g. when the session is deleted."""
+    key = (user_id, session_phone)
+    entry = _pooled.get(key)
+    if entry is not None:
+        await _close_pooled(key, entry, force=True)
+
+async def close_all_clients():
+    for key in list(_pooled):
+        await close_session_client(*key)
@@ -0,0 +1,33 @@
+import time
+from typing import List
+
+from telethon import TelegramClient
+
+from src.config import DELETION_CHECK_BATCH_SIZE
+from src.database.async_queries import db_get_due_deletion_checks, db_reschedule_deletion_checks
+from src.database.queries import deletion_check_delay
+from src.services.rate_limiter import PRIORITY_DELETION_CHECK, RequestGovernor
+
+async def check_due_deletions(client: TelegramClient, governor: RequestGovernor, session_phone: str, chat_id: int, budget: int) -> List[dict]:
+    """Checks the chat's messages whose deletion check is due, using at most `budget` API calls.
+
+    Each call covers DELETION_CHECK_BATCH_SIZE ids. Messages that do not fit into the
+    budget stay due and are picked up, most overdue first, on later cycles. Surviving
+    messages are rescheduled further out the older they are. Returns the messages
+    found deleted.
+    """
+    now = int(time.time())
+    due = await db_get_due_deletion_checks(session_phone, chat_id, now, max(1, budget) * DELETION_CHECK_BATCH_SIZE)
+    deleted, schedule = [], []
+    for start in range(0, len(due), DELETION_CHECK_BATCH_SIZE):
+        batch = due[start:start + DELETION_CHECK_BATCH_SIZE]
+        ids = [m['telethon_message_id'] for m in batch]
+        live_msgs = {m.id for m in await governor.call(client.get_messages, chat_id, ids=ids, priority=PRIORITY_DELETION_CHECK) if m}
+        for db_msg in batch:
+            if db_msg['telethon_message_id'] in live_msgs:
+                age = now - db_msg['date'] if db_msg['date'] is not None else 0
+                schedule.append((now + deletion_check_delay(age), db_msg['id']))
+            else:
+                deleted.append(db_msg)
+    await db_reschedule_deletion_checks(schedule)
+    return deleted
@@ -0,0 +1,160 @@
+import asyncio
+import html
+import logging
+from typing import Any, Dict, List, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import BufferedInputFile
+
+from src.config import DELETION_COALESCE_WINDOW, DELETION_SUMMARY_PREVIEW
+from src.database.async_queries import db_clear_deletion_notices
+from src.services.bot_outbox import bulk_sends
+from src.utils.helpers import format_timestamp
+from src.utils.lexicon import LEXICON
+
+ChatKey = Tuple[int, str, int]  # (user_id, session_phone, chat_id)
+
+PREVIEW_TEXT_LENGTH = 80
+CAPTION_MAX_LENGTH = 1024  # Telegram rejects longer document captions
+
+def _date_text(deleted: dict) -> str:
+    try:
+        return format_timestamp(deleted['date'], '%Y-%m-%d %H:%M:%S UTC') or "N/A"
+    except (ValueError, TypeError):
+        return "N/A"
+
+def format_single_deletion(session_phone: str, chat_title: str, deleted: dict) -> str:
+    header = LEXICON['deletion_notification_title']
+    body = LEXICON['deletion_notification_body'].format(
+        chat_title=html.escape(chat_title), session_phone=session_phone, date=_date_text(deleted)
+    )
+    content = ""
+    if deleted.get('text'):
+        content += LEXICON['deleted_text_content'].format(text=html.escape(deleted['text']))
+    if deleted.get('file_path'):
+        content += "\n" + LEXICON['deleted_file_content'].format(file_path=html.escape(deleted['file_path']))
+    if not content:
+        content = LEXICON['deleted_media_only_content']
+    return f"{header}\n{body}{content}"
+
+def format_deletion_summary(session_phone: str, chat_title: str, deleted: List[dict], limit: int = CAPTION_MAX_LENGTH) -> str:
+    """One message for many deletions: a count and the first DELETION_SUMMARY_PREVIEW of them.
+
+    Previews are dropped from the end until the summary fits in `limit` characters; the
+    rest is counted in the closing line.
+    """
+    title = LEXICON['deletion_summary_title'].format(count=len(deleted), chat_title=html.escape(chat_title), session_phone=session_phone)
+    items = []
+    for item in deleted[:DELETION_SUMMARY_PREVIEW]:
+        text = (item.get('text') or "").replace("\n", " ")
+        if len(text) > PREVIEW_TEXT_LENGTH:
+            text = text[:PREVIEW_TEXT_LENGTH - 1] + "…"
+        if not text:
+            text = LEXICON['deletion_summary_media_only'] if item.get('file_path') else LEXICON['deletion_summary_empty']
+        else:
+            text = html.escape(text)
+        items.append(LEXICON['deletion_summary_item'].format(date=_date_text(item), text=text))
+    shown = len(items)
+    while True:
+        lines = [title, *items[:shown]]
+        if len(deleted) > shown:
+            lines.append(LEXICON['deletion_summary_more'].format(count=len(deleted) - shown))
+        summary = "\n".join(lines)
+        # Measured with the HTML markup, which Telegram does not count, so it always fits
+        if len(summary) <= limit or shown == 0:
+            return summary
+        shown -= 1
+
+def format_deletion_report(session_phone: str, chat_title: str, deleted: List[dict]) -> str:
+    """Plain-text attachment with every deleted message in full."""
+    parts = [f"Deleted messages in {chat_title} (monitored by {session_phone}): {len(deleted)}\n"]
+    for item in deleted:
+        parts.append(f"--- Message {item.get('telethon_message_id', '?')}, sent {_date_text(item)}")
+        if item.get('text'):
+            parts.append(item['text'])
+        if item.get('file_path'):
+            parts.append(f"[Attached file: {item['file_path']}]")
+        if not item.get('text') and not item.get('file_path'):
+            parts.append("[Media without text]")
+        parts.append("")
+    return "\n".join(parts)
+
+class DeletionNotifier:
+    """Collects deleted messages per user and chat and sends them as one notification.
+
+    The first deletion of a chat opens a window of DELETION_COALESCE_WINDOW seconds, or
+    of the chat's digest interval when digest mode is on; everything deleted until the
+    window closes goes out together. A single deletion keeps the detailed message, more
+    become a short summary with the full text attached as a file. Notifications are
+    sent as bulk traffic, behind interactive replies.
+
+    Collected deletions stay flagged in the database until their notification has been
+    attempted, so a crash delays them to the session's next start instead of losing them.
+    """
+
+    def __init__(self):
+        self._pending: Dict[ChatKey, Dict[str, Any]] = {}
+
+    def add(self, bot: Bot, user_id: int, session_phone: str, chat_id: int, chat_title: str,
+            deleted: List[dict], digest_minutes: int = 0):
+        if not deleted:
+            return
+        key = (user_id, session_phone, chat_id)
+        entry = self._pending.get(key)
+        if entry is None:
+            delay = digest_minutes * 60 if digest_minutes > 0 else DELETION_COALESCE_WINDOW
+            entry = self._pending[key] = {'bot': bot, 'title': chat_title, 'deleted': [], 'ids': set(), 'task': None}
+            entry['task'] = asyncio.create_task(self._flush_later(key, delay))
+        entry['title'] = chat_title
+        # A restarted supervisor resubmits what is still flagged, possibly while it is collected here
+        for item in deleted:
+            if item['id'] not in entry['ids']:
+                entry['ids'].add(item['id'])
+                entry['deleted'].append(item)
+
+    async def _flush_later(self, key: ChatKey, delay: float):
+        await asyncio.sleep(delay)
+        entry = self._pending.pop(key, None)
+        if entry is not None:
+            await self._send(key, entry)
+
+    async def flush(self):
+        """Sends everything still collected, e.g. before shutdown."""
+        entries, self._pending = self._pending, {}
+        for key, entry in entries.items():
+            entry['task'].cancel()
+            await self._send(key, entry)
+
+    async def _send(self, key: ChatKey, entry: Dict[str, Any]):
+        user_id, session_phone, _ = key
+        bot, title, deleted = entry['bot'], entry['title'], entry['deleted']
+        deleted.sort(key=lambda d: (d.get('date') or 0, d.get('telethon_message_id') or 0))
+        if len(deleted) == 1:
+            method, kwargs = bot.send_message, {'text': format_single_deletion(session_phone, title, deleted[0])}
+        else:
+            report = format_deletion_report(session_phone, title, deleted).encode()
+            method, kwargs = bot.send_document, {
+                'document': BufferedInputFile(report, filename=f"deleted_{key[2]}_{len(deleted)}.txt"),
+                'caption': format_deletion_summary(session_phone, title, deleted),
+            }
+        try:
+            with bulk_sends():
+                await method(user_id, **kwargs)
+        except TelegramAPIError as e:
+            logging.warning(f"Failed to send {len(deleted)} deletion notification(s) to user {user_id}: {e}")
+        await db_clear_deletion_notices(list(entry['ids']))
+
+
+_notifier: DeletionNotifier | None = None
+
+def get_deletion_notifier() -> DeletionNotifier:
+    """Returns the process-wide deletion notifier."""
+    global _notifier
+    if _notifier is None:
+        _notifier = DeletionNotifier()
+    return _notifier
+
+async def flush_deletion_notifications():
+    if _notifier is not None:
+        await _notifier.flush()
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Set, Tuple
+
+from src.config import LEASE_CLAIM_BATCH, LEASE_HEARTBEAT_INTERVAL, LEASE_TTL
+from src.database.async_queries import db_claim_lease, db_get_lease_overview, db_release_leases, db_renew_leases
+
+SessionKey = Tuple[int, str]  # (user_id, session_phone)
+SessionAction = Callable[[int, str], Awaitable[Any]]
+
+class LeaseManager:
+    """Shares the monitored sessions between bot instances using one database.
+
+    A node runs a session's supervisor only while it holds the session's lease. Every
+    LEASE_HEARTBEAT_INTERVAL seconds it extends its leases by LEASE_TTL, stops
+    supervisors whose lease another node has taken over, and releases sessions whose
+    monitoring was stopped. Free or expired leases are claimed up to an even share of
+    the sessions per live node, LEASE_CLAIM_BATCH per heartbeat, and a node above its
+    share (after another node joined) hands the excess over at the same pace. drain()
+    stops every supervisor and releases the leases for other nodes to pick up at once.
+    `on_live_nodes` is called with the number of live nodes whenever it changes.
+    """
+
+    def __init__(self, node_id: str, launch: SessionAction, halt: SessionAction, on_live_nodes: Callable[[int], None] | None = None):
+        self.node_id = node_id
+        self._launch = launch
+        self._halt = halt
+        self._on_live_nodes = on_live_nodes
+        self.live_nodes = 1
+        self.owned: Set[SessionKey] = set()  # Leases held, with the supervisor running here
+        self.leased: Set[SessionKey] = set()  # Sessions leased by any node at the last heartbeat
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._draining = False
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def is_running(self, user_id: int, session_phone: str) -> bool:
+        return (user_id, session_phone) in self.owned or (user_id, session_phone) in self.leased
+
+    async def _run(self):
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logging.error(f"Lease heartbeat of node {self.node_id} failed: {e!r}")
+            await asyncio.sleep(LEASE_HEARTBEAT_INTERVAL)
+
+    async def _start_session(self, key: SessionKey):
+        try:
+            await self._launch(*key)
+            self.owned.add(key)
+        except Exception as e:
+            logging.error(f"Could not start {key[1]} on node {self.node_id}: {e!r}")
+            await db_release_leases(self.node_id, [key])
+
+    async def _stop_session(self, key: SessionKey) -> bool:
+        self.owned.discard(key)
+        try:
+            await self._halt(*key)
+            return True
+        except Exception as e:
+            logging.error(f"Could not stop {key[1]} on node {self.node_id}: {e!r}")
+            return False
+
+    async def heartbeat(self):
+        async with self._lock:
+            if self._draining:
+                return
+            now = time.time()
+            held = set(await db_renew_leases(self.node_id, now, now + LEASE_TTL))
+            for key in self.owned - held:
+                logging.warning(f"Node {self.node_id} lost the lease on {key[1]} to another node; stopping it here.")
+                await self._stop_session(key)
+
+            overview = await db_get_lease_overview(now)
+            live_nodes = max(1, overview['live_nodes'])
+            if live_nodes != self.live_nodes:
+                self.live_nodes = live_nodes
+                if self._on_live_nodes is not None:
+                    self._on_live_nodes(live_nodes)
+            sessions = overview['sessions']
+            share = math.ceil(len(sessions) / live_nodes)
+            # Stopped by the user, or deleted
+            release = {key for key in held if key not in sessions}
+            kept = [key for key in sessions if key in held]
+            release.update(kept[share:][:LEASE_CLAIM_BATCH])
+            if release:
+                for key in release & self.owned:
+                    # A rebalanced session is kept until its client is surely gone, and adopted again below
+                    if not await self._stop_session(key) and key in sessions:
+                        release.discard(key)
+                await db_release_leases(self.node_id, release)
+            held -= release
+
+            # Leases held by an earlier run of this node, e.g. after a quick restart
+            for key in held - self.owned:
+                await self._start_session(key)
+
+            room = min(share - len(held), LEASE_CLAIM_BATCH)
+            for key in [key for key, owner in sessions.items() if owner is None][:max(0, room)]:
+                if await db_claim_lease(*key, self.node_id, now, now + LEASE_TTL):
+                    await self._start_session(key)
+            self.leased = {key for key, owner in sessions.items() if owner is not None} - release | self.owned
+
+    async def claim_now(self, user_id: int, session_phone: str) -> bool:
+        """Claims a session right away, e.g. when a user starts monitoring it. False if another node holds it."""
+        key = (user_id, session_phone)
+        async with self._lock:
+            if self._draining:
+                return False
+            now = time.time()
+            if not await db_claim_lease(user_id, session_phone, self.node_id, now, now + LEASE_TTL):
+                return False
+            if key not in self.owned:
+                await self._start_session(key)
+            self.leased.add(key)
+            return key in self.owned
+
+    async def release_now(self, user_id: int, session_phone: str):
+        """Stops a session held here and releases its lease; elsewhere it stops at that node's next heartbeat."""
+        key = (user_id, session_phone)
+        async with self._lock:
+            if key in self.owned:
+                await self._stop_session(key)
+                await db_release_leases(self.node_id, [key])
+            self.leased.discard(key)
+
+    async def drain(self):
+        """Stops every supervisor of this node and releases its leases for the other nodes."""
+        if self._task is not None:
+            self._task.cancel()
+        async with self._lock:
+            self._draining = True
+            now = time.time()
+            await db_renew_leases(self.node_id, now, now + LEASE_TTL, draining=True)
+            logging.info(f"Node {self.node_id} is draining {len(self.owned)} session(s).")
+            for key in list(self.owned):
+                await self._stop_session(key)
+            await db_release_leases(self.node_id, None, leave=True)
+            self.leased.clear()
@@ -0,0 +1,36 @@
+import asyncio
+import logging
+
+from src.config import LOOP_LAG_SAMPLE_INTERVAL, LOOP_LAG_WARN_THRESHOLD, LOOP_LAG_REPORT_INTERVAL
+from src.globals import loop_lag_stats
+
+async def monitor_event_loop_lag(interval: float = LOOP_LAG_SAMPLE_INTERVAL):
+    """Measures how late the event loop wakes up from a fixed sleep.
+
+    Any blocking call on the loop (a synchronous query, file I/O, heavy CPU work)
+    shows up as lag. Results are kept in `loop_lag_stats` and summarised in the log.
+    """
+    loop = asyncio.get_running_loop()
+    last_report = loop.time()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        now = loop.time()
+        lag = max(0.0, now - started - interval)
+        lag_ms = lag * 1000
+
+        loop_lag_stats['samples'] += 1
+        loop_lag_stats['last_ms'] = lag_ms
+        loop_lag_stats['total_ms'] += lag_ms
+        loop_lag_stats['max_ms'] = max(loop_lag_stats['max_ms'], lag_ms)
+        if lag >= LOOP_LAG_WARN_THRESHOLD:
+            loop_lag_stats['stalls'] += 1
+            logging.warning(f"Event loop stalled for {lag_ms:.0f} ms.")
+
+        if now - last_report >= LOOP_LAG_REPORT_INTERVAL:
+            avg_ms = loop_lag_stats['total_ms'] / loop_lag_stats['samples']
+            logging.info(
+                f"Event loop lag: avg {avg_ms:.1f} ms, max {loop_lag_stats['max_ms']:.1f} ms, "
+                f"{loop_lag_stats['stalls']} stalls over {loop_lag_stats['samples']} samples."
+            )
+            last_report = now
@@ -0,0 +1,285 @@
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+from telethon import TelegramClient, utils
+from telethon.tl.types import MessageMediaDocument, MessageMediaPhoto
+
+from src.config import (
+    DOWNLOADS_DIR, MEDIA_BANDWIDTH_BYTES_PER_SECOND, MEDIA_CHUNK_SIZE, MEDIA_DOWNLOAD_MAX_ATTEMPTS,
+    MEDIA_DOWNLOAD_WORKERS, MEDIA_ORPHAN_SWEEP_BATCH, MEDIA_QUEUE_SIZE, MEDIA_RECOVERY_BATCH_SIZE,
+    MEDIA_RECOVERY_INTERVAL, MEDIA_RETRY_BASE_DELAY, MEDIA_STORE_DIR
+)
+from src.database.async_queries import (
+    db_get_pending_media, db_link_known_media, db_store_media, db_sweep_orphan_media, db_update_media_status
+)
+from src.services.rate_limiter import PRIORITY_MEDIA, RequestGovernor
+
+PARTIAL_DIR = DOWNLOADS_DIR / ".partial"
+MediaKey = Tuple[int, int]  # (chat_id, telethon_message_id)
+
+def has_downloadable_media(msg) -> bool:
+    """True for photos and documents; web previews, polls, locations etc. have no file."""
+    media = msg.media
+    return (
+        isinstance(media, MessageMediaDocument) and media.document is not None
+        or isinstance(media, MessageMediaPhoto) and media.photo is not None
+    )
+
+def telegram_media_id(msg) -> str:
+    """Id of the file behind a message; a sticker or forwarded video keeps it across chats."""
+    media = msg.media
+    if isinstance(media, MessageMediaDocument):
+        return f"document:{media.document.id}"
+    return f"photo:{media.photo.id}"
+
+def media_store_path(content_hash: str, ext: str) -> Path:
+    """A new, never used path for a file; two levels of 256 shards keep every store directory small.
+
+    The random suffix keeps a new file from taking the path of an orphan being swept.
+    """
+    return MEDIA_STORE_DIR / content_hash[:2] / content_hash[2:4] / f"{content_hash}-{secrets.token_hex(4)}{ext}"
+
+def _move_into_store(source: Path, store_path: Path):
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(source, store_path)
+
+def _hash_prefix(path: Path, length: int):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while length > 0:
+            block = f.read(min(length, MEDIA_CHUNK_SIZE))
+            if not block:
+                break
+            digest.update(block)
+            length -= len(block)
+    return digest
+
+def _open_partial(path: Path, offset: int):
+    """Opens a partial download for appending at `offset`, dropping anything past it."""
+    if offset:
+        f = open(path, 'r+b')
+        f.truncate(offset)
+        f.seek(offset)
+        return f
+    return open(path, 'wb')
+
+def _append_chunk(f, digest, chunk: bytes):
+    f.write(chunk)
+    digest.update(chunk)
+
+def _resume_offset(path: Path) -> int:
+    """Telegram serves files in whole requests, so a partial file resumes from its last complete chunk."""
+    try:
+        return path.stat().st_size // MEDIA_CHUNK_SIZE * MEDIA_CHUNK_SIZE
+    except FileNotFoundError:
+        return 0
+
+async def sweep_orphan_media() -> int:
+    """Removes stored files that no message references any more. Returns the number removed."""
+    total = 0
+    while True:
+        removed, _, paths = await db_sweep_orphan_media(MEDIA_ORPHAN_SWEEP_BATCH)
+        for path in paths:
+            await asyncio.to_thread(_remove_quietly, path)
+        total += removed
+        if removed < MEDIA_ORPHAN_SWEEP_BATCH:
+            return total
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.warning(f"Could not remove media file {path}: {e}")
+
+class BandwidthLimiter:
+    """Paces downloaded bytes to `rate` bytes per second, allowing one second of burst. 0 disables it."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._available_at = 0.0
+
+    async def consume(self, nbytes: int):
+        if self.rate <= 0:
+            return
+        now = asyncio.get_running_loop().time()
+        self._available_at = max(now, self._available_at) + nbytes / self.rate
+        delay = self._available_at - now - 1.0
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class MediaPipeline:
+    """Downloads a session's media outside the ingest path.
+
+    Ingest stores messages with media_status 'pending' and submits them here. Media whose
+    Telegram id is already in the store is linked without a download. Otherwise a bounded
+    pool of downloaders fetches the file into PARTIAL_DIR, resuming partial files on a
+    MEDIA_CHUNK_SIZE boundary, and adds it to the content-addressed store under its
+    SHA-256, where a file with identical content is shared instead of kept twice. Failures are
+    retried with exponential back-off up to MEDIA_DOWNLOAD_MAX_ATTEMPTS. Pending rows that
+    are not queued in memory (after a restart, or when the queue was full) are picked up
+    from the database every MEDIA_RECOVERY_INTERVAL seconds, which is also when files
+    no message references any more are swept.
+    """
+
+    def __init__(self, client: TelegramClient, governor: RequestGovernor, session_phone: str,
+                 workers: int = MEDIA_DOWNLOAD_WORKERS, bandwidth: float = MEDIA_BANDWIDTH_BYTES_PER_SECOND):
+        self.client = client
+        self.governor = governor
+        self.session_phone = session_phone
+        self.workers = workers
+        self._bandwidth = BandwidthLimiter(bandwidth)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=MEDIA_QUEUE_SIZE)
+        self._tracked: Set[MediaKey] = set()
+        self._attempts: Dict[MediaKey, int] = {}
+        self._settled: Set[MediaKey] = set()  # Finished while a recovery page was being read
+        # One download per Telegram file at a time. Each entry: lock, users (holders and waiters);
+        # the last user removes it.
+        self._media_locks: Dict[str, Dict[str, Any]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.stats: Dict[str, int] = {'downloaded': 0, 'bytes': 0, 'deduplicated': 0, 'retries': 0, 'failed': 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._tracked)
+
+    def start(self):
+        if not self._tasks:
+            PARTIAL_DIR.mkdir(exist_ok=True)
+            self._tasks.append(asyncio.create_task(self._recover()))
+            self._tasks.extend(asyncio.create_task(self._work()) for _ in range(self.workers))
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+    def submit(self, chat_id: int, message_id: int, msg=None, attempts: int = 0) -> bool:
+        """Queues a message's media. `msg` may be None, in which case it is fetched first.
+
+        Returns False if the media is already queued or the queue is full; the row then
+        stays pending in the database for the recovery scan.
+        """
+        key = (chat_id, message_id)
+        if key in self._tracked or self._queue.full():
+            return False
+        self._tracked.add(key)
+        self._attempts.setdefault(key, attempts)
+        self._queue.put_nowait((chat_id, message_id, msg))
+        return True
+
+    async def _recover(self):
+        while True:
+            try:
+                after_id = 0
+                while not self._queue.full():
+                    self._settled.clear()
+                    rows = await db_get_pending_media(self.session_phone, after_id, MEDIA_RECOVERY_BATCH_SIZE)
+                    if not rows:
+                        break
+                    after_id = rows[-1]['id']
+                    for row in rows:
+                        if (row['chat_id'], row['telethon_message_id']) not in self._settled:
+                            self.submit(row['chat_id'], row['telethon_message_id'], attempts=row['media_attempts'])
+                await sweep_orphan_media()
+            except Exception as e:
+                logging.error(f"Media recovery scan for {self.session_phone} failed: {e}")
+            await asyncio.sleep(MEDIA_RECOVERY_INTERVAL)
+
+    async def _work(self):
+        while True:
+            chat_id, message_id, msg = await self._queue.get()
+            key = (chat_id, message_id)
+            try:
+                if msg is None:
+                    msg = await self.governor.call(self.client.get_messages, chat_id, ids=message_id, priority=PRIORITY_MEDIA)
+                    if msg is None or not has_downloadable_media(msg):
+                        # Gone upstream before we got to it; nothing left to fetch.
+                        await self._give_up(key, "message no longer available")
+                        continue
+                await self._store(chat_id, message_id, msg)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._retry_later(key, e)
+                continue
+            self._settle(key)
+
+    async def _store(self, chat_id: int, message_id: int, msg):
+        media_id = telegram_media_id(msg)
+        entry = self._media_locks.setdefault(media_id, {'lock': asyncio.Lock(), 'users': 0})
+        entry['users'] += 1
+        try:
+            async with entry['lock']:
+                if await db_link_known_media(self.session_phone, chat_id, message_id, media_id):
+                    self.stats['deduplicated'] += 1
+                    return
+                partial_path, content_hash, file_size = await self.governor.call(self._download, chat_id, msg, priority=PRIORITY_MEDIA)
+                store_path = media_store_path(content_hash, utils.get_extension(msg.media))
+                # Moved before it is recorded, so no row ever points at a missing file.
+                # If the message row is gone by now, the new file is left unreferenced and swept later.
+                await asyncio.to_thread(_move_into_store, partial_path, store_path)
+                if await db_store_media(self.session_phone, chat_id, message_id, media_id, content_hash, file_size, str(store_path)):
+                    self.stats['downloaded'] += 1
+                    self.stats['bytes'] += file_size
+                else:
+                    self.stats['deduplicated'] += 1
+                    await asyncio.to_thread(_remove_quietly, store_path)
+        finally:
+            entry['users'] -= 1
+            if entry['users'] == 0:
+                del self._media_locks[media_id]
+
+    def _settle(self, key: MediaKey):
+        self._tracked.discard(key)
+        self._attempts.pop(key, None)
+        self._settled.add(key)
+
+    async def _download(self, chat_id: int, msg) -> Tuple[Path, str, int]:
+        """Fetches the message's file into PARTIAL_DIR. Returns (path, sha256 hex digest, size)."""
+        partial_path = PARTIAL_DIR / f"{self.session_phone.lstrip('+')}_{chat_id}_{msg.id}.part"
+        offset = await asyncio.to_thread(_resume_offset, partial_path)
+        digest = await asyncio.to_thread(_hash_prefix, partial_path, offset) if offset else hashlib.sha256()
+        size = offset
+        # Disk writes and hashing run off the event loop; a slow disk must not stall every session.
+        f = await asyncio.to_thread(_open_partial, partial_path, offset)
+        try:
+            async for chunk in self.client.iter_download(msg.media, offset=offset, request_size=MEDIA_CHUNK_SIZE):
+                await asyncio.to_thread(_append_chunk, f, digest, chunk)
+                size += len(chunk)
+                await self._bandwidth.consume(len(chunk))
+        finally:
+            await asyncio.to_thread(f.close)
+        return partial_path, digest.hexdigest(), size
+
+    async def _retry_later(self, key: MediaKey, error: Exception):
+        attempts = self._attempts.get(key, 0) + 1
+        if attempts >= MEDIA_DOWNLOAD_MAX_ATTEMPTS:
+            await self._give_up(key, error, attempts)
+            return
+        self._attempts[key] = attempts
+        self.stats['retries'] += 1
+        await db_update_media_status(self.session_phone, key[0], key[1], 'pending', attempts)
+        delay = MEDIA_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+        logging.warning(f"Media download for message {key[1]} in chat {key[0]} ({self.session_phone}) failed: {error}. Retry {attempts} in {delay}s.")
+
+        def requeue():
+            self._tracked.discard(key)
+            # Refetch the message: a stale file reference is a common cause of failure.
+            if not self.submit(key[0], key[1], attempts=attempts):
+                self._attempts.pop(key, None)  # Left to the recovery scan
+        asyncio.get_running_loop().call_later(delay, requeue)
+
+    async def _give_up(self, key: MediaKey, reason, attempts: int | None = None):
+        attempts = attempts if attempts is not None else self._attempts.get(key, 0)
+        self.stats['failed'] += 1
+        await db_update_media_status(self.session_phone, key[0], key[1], 'failed', attempts)
+        self._settle(key)
+        await asyncio.to_thread(_remove_quietly, PARTIAL_DIR / f"{self.session_phone.lstrip('+')}_{key[0]}_{key[1]}.part")
+        logging.warning(f"Giving up on media of message {key[1]} in chat {key[0]} ({self.session_phone}): {reason}")
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+
+from src.config import MEDIA_EVICTION_BATCH_SIZE, MEDIA_QUOTA_GLOBAL_BYTES, MEDIA_QUOTA_INTERVAL, MEDIA_QUOTA_SESSION_BYTES
+from src.database.async_queries import db_evict_media, db_get_chats_over_media_quota, db_get_media_usage_by_session
+from src.services.autoclean import unlink_media_files
+from src.services.media_pipeline import sweep_orphan_media
+
+async def evict_media(excess: int, session_phone: str | None = None, chat_id: int | None = None) -> int:
+    """Evicts media in the given scope until `excess` bytes are released or nothing is left.
+
+    Works in transactions of MEDIA_EVICTION_BATCH_SIZE messages. Returns the bytes released.
+    """
+    released = 0
+    while released < excess:
+        evicted, freed, file_paths = await db_evict_media(excess - released, session_phone, chat_id, MEDIA_EVICTION_BATCH_SIZE)
+        if file_paths:
+            await asyncio.to_thread(unlink_media_files, file_paths)
+        released += freed
+        if evicted < MEDIA_EVICTION_BATCH_SIZE and released < excess:
+            break  # Nothing left to evict in this scope
+    return released
+
+async def enforce_media_quotas() -> int:
+    """Brings every chat, session and the whole bot back under its media quota.
+
+    Usage comes from the chat_stats aggregates, so no directory is scanned. Files shared
+    through the media store count once per message that carries them, which keeps the
+    session and global bounds conservative. Returns the bytes released.
+    """
+    released = 0
+    for chat in await db_get_chats_over_media_quota():
+        released += await evict_media(chat['excess'], chat['session_phone'], chat['chat_id'])
+
+    usage = await db_get_media_usage_by_session()
+    if MEDIA_QUOTA_SESSION_BYTES > 0:
+        for session_phone, used in usage.items():
+            if used > MEDIA_QUOTA_SESSION_BYTES:
+                freed = await evict_media(used - MEDIA_QUOTA_SESSION_BYTES, session_phone)
+                usage[session_phone] -= freed
+                released += freed
+
+    total = sum(usage.values())
+    if MEDIA_QUOTA_GLOBAL_BYTES > 0 and total > MEDIA_QUOTA_GLOBAL_BYTES:
+        released += await evict_media(total - MEDIA_QUOTA_GLOBAL_BYTES)
+
+    if released:
+        await sweep_orphan_media()
+    return released
+
+async def run_media_quota_enforcer(interval: float = MEDIA_QUOTA_INTERVAL):
+    """Enforces the media quotas every `interval` seconds."""
+    while True:
+        try:
+            released = await enforce_media_quotas()
+            if released:
+                logging.info(f"Media quotas: evicted {released / 1048576:.1f} MiB of media.")
+        except Exception as e:
+            logging.error(f"Media quota enforcement failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,198 @@
+import asyncio
+import functools
+import logging
+import math
+from typing import TYPE_CHECKING, Any, Callable, Dict
+
+from aiogram import Bot
+
+from src.config import LIVE_CLIENT_WAIT_TIMEOUT, MONITOR_IPC_TIMEOUT, RESTORE_TIME_BUDGET, RESTORE_WAVE_INTERVAL, RESTORE_WAVE_SIZE
+from src.database.async_queries import db_get_monitored_sessions, db_set_monitoring_enabled
+from src.globals import monitoring_tasks
+from src.services.chat_registry import add_chat_listener
+from src.services.client_registry import RemoteRunner, SessionOwnedElsewhere, close_session_client, set_remote_runner
+from src.services.monitoring import session_supervisor
+
+from src.services.leases import LeaseManager
+
+if TYPE_CHECKING:
+    from src.services.sharding import MonitorShards
+
+# Set when supervisors run in monitor worker processes instead of this one.
+_shards: 'MonitorShards | None' = None
+# Set when this node shares the sessions with other nodes through leases.
+_leases: LeaseManager | None = None
+
+def use_monitor_workers(shards: 'MonitorShards'):
+    """Routes every monitoring command to `shards` from now on; chat changes are forwarded too."""
+    global _shards
+    _shards = shards
+    set_remote_runner(_remote_runner)
+    add_chat_listener(lambda user_id, session_phone, chat_id: shards.notify(user_id, session_phone, 'chat_changed', chat_id))
+
+def use_session_leases(node_id: str, bot: Bot, on_live_nodes: Callable[[int], None] | None = None) -> LeaseManager:
+    """Runs only the sessions this node holds a lease on from now on, and starts the heartbeat.
+
+    `on_live_nodes` gets the number of live nodes whenever it changes.
+    """
+    global _leases
+    _leases = LeaseManager(
+        node_id,
+        launch=lambda user_id, session_phone: _launch(user_id, session_phone, bot),
+        halt=lambda user_id, session_phone: _halt(user_id, session_phone, wait=True),
+        on_live_nodes=on_live_nodes
+    )
+    set_remote_runner(_remote_runner)
+    _leases.start()
+    return _leases
+
+async def _run_on_other_node(func, *args):
+    raise SessionOwnedElsewhere("the session is monitored by another bot instance")
+
+def _remote_runner(user_id: int, session_phone: str) -> RemoteRunner | None:
+    """How UI actions reach the client of a session whose supervisor runs in another process."""
+    key = (user_id, session_phone)
+    if _leases is not None and key in _leases.leased and key not in _leases.owned:
+        return _run_on_other_node
+    if _shards is not None and _shards.is_running(user_id, session_phone):
+        # The worker may first wait for its supervisor to connect
+        return functools.partial(_shards.request, user_id, session_phone, 'with_client', timeout=MONITOR_IPC_TIMEOUT + LIVE_CLIENT_WAIT_TIMEOUT)
+    return None
+
+# --- Supervisors of this process ---
+
+def supervisor_running(user_id: int, session_phone: str) -> bool:
+    session_info = monitoring_tasks.get((user_id, session_phone))
+    return session_info is not None and not session_info['supervisor'].done()
+
+def run_supervisor(user_id: int, session_phone: str, bot: Bot) -> asyncio.Task | None:
+    """Starts the session's supervisor in this process. None if it is already running."""
+    if supervisor_running(user_id, session_phone):
+        return None
+    supervisor_task = asyncio.create_task(session_supervisor(user_id, session_phone, bot))
+    monitoring_tasks[(user_id, session_phone)] = {'supervisor': supervisor_task, 'chats': {}}
+    return supervisor_task
+
+def cancel_supervisor(user_id: int, session_phone: str) -> bool:
+    session_info = monitoring_tasks.pop((user_id, session_phone), None)
+    if session_info is None or session_info['supervisor'].done():
+        return False
+    session_info['supervisor'].cancel()
+    return True
+
+async def stop_supervisor(user_id: int, session_phone: str) -> bool:
+    """Cancels the session's supervisor here and returns once it has disconnected its client.
+
+    A pooled client of the session is closed too, so nothing in this process holds the
+    session's auth key any more, e.g. before its lease is released to another node.
+    """
+    supervisor_task = monitoring_tasks.get((user_id, session_phone), {}).get('supervisor')
+    stopped = cancel_supervisor(user_id, session_phone)
+    if stopped:
+        await asyncio.gather(supervisor_task, return_exceptions=True)
+    await close_session_client(user_id, session_phone)
+    return stopped
+
+def local_poll_status(user_id: int, session_phone: str, chat_id: int) -> Dict[str, Any]:
+    return dict(monitoring_tasks.get((user_id, session_phone), {}).get('chats', {}).get(chat_id, {}))
+
+async def cancel_all_supervisors():
+    supervisors = [info['supervisor'] for info in monitoring_tasks.values() if info.get('supervisor')]
+    for task in supervisors:
+        task.cancel()
+    if supervisors:
+        await asyncio.gather(*supervisors, return_exceptions=True)
+
+# --- Facade used by the bot process ---
+
+def is_monitoring(user_id: int, session_phone: str) -> bool:
+    if _leases is not None:
+        return _leases.is_running(user_id, session_phone)
+    if _shards is not None:
+        return _shards.is_running(user_id, session_phone)
+    return supervisor_running(user_id, session_phone)
+
+async def _launch(user_id: int, session_phone: str, bot: Bot) -> bool:
+    if _shards is not None:
+        await close_session_client(user_id, session_phone)  # The worker connects the session from now on
+        return await _shards.start(user_id, session_phone)
+    return run_supervisor(user_id, session_phone, bot) is not None
+
+async def _halt(user_id: int, session_phone: str, wait: bool = False) -> bool:
+    """Stops the supervisor; `wait` also lets it disconnect, e.g. before its lease is released."""
+    if _shards is not None:
+        return await _shards.stop(user_id, session_phone, wait=wait)
+    if wait:
+        return await stop_supervisor(user_id, session_phone)
+    return cancel_supervisor(user_id, session_phone)
+
+async def start_monitoring(user_id: int, session_phone: str, bot: Bot) -> bool:
+    """Starts the session's supervisor and remembers it across restarts. False if already running."""
+    if is_monitoring(user_id, session_phone):
+        return False
+    await db_set_monitoring_enabled(user_id, session_phone, True)
+    if _leases is not None:
+        # If another node holds the lease, it runs the session from now on.
+        await _leases.claim_now(user_id, session_phone)
+        return True
+    return await _launch(user_id, session_phone, bot)
+
+async def stop_monitoring(user_id: int, session_phone: str) -> bool:
+    """Stops the session's supervisor for good. False if it was not running."""
+    await db_set_monitoring_enabled(user_id, session_phone, False)
+    if _leases is not None:
+        # A session leased by another node stops at that node's next heartbeat.
+        was_running = _leases.is_running(user_id, session_phone)
+        await _leases.release_now(user_id, session_phone)
+        return was_running
+    return await _halt(user_id, session_phone)
+
+async def get_poll_status(user_id: int, session_phone: str, chat_id: int) -> Dict[str, Any]:
+    """The scheduler's status of a chat poll, e.g. the interval last used; empty if unknown."""
+    if _leases is not None and (user_id, session_phone) not in _leases.owned:
+        return {}  # Polled by another node
+    if _shards is not None:
+        try:
+            return await _shards.poll_status(user_id, session_phone, chat_id)
+        except (asyncio.TimeoutError, OSError) as e:
+            logging.warning(f"No poll status for chat {chat_id} from the worker of {session_phone}: {e!r}")
+            return {}
+    return local_poll_status(user_id, session_phone, chat_id)
+
+async def restore_monitoring(bot: Bot):
+    """Restarts the supervisors that were running before the bot stopped.
+
+    They start in waves of RESTORE_WAVE_SIZE, RESTORE_WAVE_INTERVAL seconds apart, or
+    closer together so that the last wave starts within RESTORE_TIME_BUDGET. Connects
+    are further bounded by SUPERVISOR_CONNECT_CONCURRENCY in the supervisor itself.
+    With session leases the heartbeat claims the sessions instead, LEASE_CLAIM_BATCH at a time.
+    """
+    if _leases is not None:
+        return
+    sessions = [s for s in await db_get_monitored_sessions() if not is_monitoring(*s)]
+    if not sessions:
+        return
+    waves = math.ceil(len(sessions) / RESTORE_WAVE_SIZE)
+    interval = min(RESTORE_WAVE_INTERVAL, RESTORE_TIME_BUDGET / waves)
+    logging.info(f"Restoring monitoring of {len(sessions)} session(s) in {waves} wave(s), {interval:.1f}s apart.")
+    for wave in range(waves):
+        if wave:
+            await asyncio.sleep(interval)
+        # The user may have started a session meanwhile
+        wave_sessions = [s for s in sessions[wave * RESTORE_WAVE_SIZE:(wave + 1) * RESTORE_WAVE_SIZE] if not is_monitoring(*s)]
+        results = await asyncio.gather(*[_launch(user_id, session_phone, bot) for user_id, session_phone in wave_sessions], return_exceptions=True)
+        for (_, session_phone), result in zip(wave_sessions, results):
+            if isinstance(result, Exception):
+                logging.error(f"Could not restore monitoring of {session_phone}: {result!r}")
+
+async def shutdown_monitoring():
+    """Stops every supervisor without forgetting it, so the next start restores it.
+
+    A node sharing sessions through leases drains first, so other nodes take them over at once.
+    """
+    if _leases is not None:
+        await _leases.drain()
+    if _shards is not None:
+        await _shards.close()
+    else:
+        await cancel_all_supervisors()
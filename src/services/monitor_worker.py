@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import signal
+import sys
+import threading
+from typing import Any, Dict
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+
+from src.database.connection import close_pool, use_database_file
+from src.database.executor import shutdown_executor
+from src.globals import monitoring_tasks
+from src.services.bot_outbox import OutboundLimiter, report_outbox_stats
+from src.services.chat_registry import reload_chat_settings
+from src.services.client_registry import close_all_clients, run_with_client
+from src.services.deletion_notifier import flush_deletion_notifications
+from src.services.loop_monitor import monitor_event_loop_lag
+from src.services.monitor_control import cancel_all_supervisors, cancel_supervisor, local_poll_status, run_supervisor, stop_supervisor
+from src.services.scheduler import shutdown_scheduler
+from src.services.session_status import add_authorization_listener
+
+def start_pipe_reader(conn, name: str) -> asyncio.Queue:
+    """Receives from `conn` on a dedicated daemon thread and queues the messages on the running loop.
+
+    A blocked recv() must not occupy a thread of the loop's default executor: that pool
+    is shared and asyncio.run() waits for it on exit. None is queued once the pipe closes.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def pump():
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                message = None
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                return  # The loop is closed
+            if message is None:
+                return
+
+    threading.Thread(target=pump, name=name, daemon=True).start()
+    return queue
+
+def worker_main(worker_id: int, conn, token: str, db_file: str, global_rate: float, global_burst: int):
+    """Entry point of a monitor worker process, started by MonitorShards.
+
+    The worker runs the supervisors of its shard with its own Bot for notifications,
+    poll scheduler, database pool and Telethon clients, and executes the commands the
+    bot process sends over `conn`. `db_file` is the database the bot process uses, so
+    the worker cannot resolve a different one from its own environment.
+    """
+    use_database_file(db_file)
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - worker {worker_id} - %(name)s - %(levelname)s - %(message)s'
+    )
+    # Ctrl+C reaches the whole process group; the bot process decides when workers stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(_serve(worker_id, conn, token, global_rate, global_burst))
+
+async def _serve(worker_id: int, conn, token: str, global_rate: float, global_burst: int):
+    bot = Bot(token=token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    outbox = OutboundLimiter(global_rate, global_burst)
+    bot.session.middleware(outbox)
+
+    def send_event(event: str, *args):
+        try:
+            conn.send({'event': event, 'args': args})
+        except OSError:
+            pass  # The bot process is gone; the command loop ends on its own
+
+    authorized: Dict[tuple, bool] = {}
+
+    def forward_authorization(user_id: int, session_phone: str, is_authorized: bool):
+        if authorized.get((user_id, session_phone)) != is_authorized:
+            authorized[(user_id, session_phone)] = is_authorized
+            send_event('authorized', user_id, session_phone, is_authorized)
+
+    add_authorization_listener(forward_authorization)
+
+    def start(user_id: int, session_phone: str) -> bool:
+        task = run_supervisor(user_id, session_phone, bot)
+        if task is None:
+            return False
+
+        def exited(_):
+            # Still registered means it stopped on its own rather than by a stop command.
+            if monitoring_tasks.get((user_id, session_phone), {}).get('supervisor') is task:
+                send_event('supervisor_exited', user_id, session_phone)
+        task.add_done_callback(exited)
+        return True
+
+    handlers = {
+        'start': start,
+        'stop': cancel_supervisor,
+        'stop_and_wait': stop_supervisor,
+        'poll_status': local_poll_status,
+        'chat_changed': reload_chat_settings,
+        'outbox_limits': outbox.set_global_limit,
+        'with_client': run_with_client,
+    }
+    replies: set = set()
+
+    def send_reply(request_id: int, result: Any = None, error: BaseException | None = None):
+        if error is None:
+            conn.send({'id': request_id, 'result': result})
+            return
+        try:
+            conn.send({'id': request_id, 'error': error})
+        except Exception:  # Not picklable
+            conn.send({'id': request_id, 'error': RuntimeError(repr(error))})
+
+    async def reply_when_done(request_id: int | None, op: str, awaitable):
+        try:
+            result = await awaitable
+        except Exception as e:
+            logging.error(f"Monitor command {op} failed: {e!r}")
+            if request_id is not None:
+                send_reply(request_id, error=e)
+        else:
+            if request_id is not None:
+                send_reply(request_id, result)
+
+    loop_monitor_task = asyncio.create_task(monitor_event_loop_lag())
+    outbox_report_task = asyncio.create_task(report_outbox_stats(outbox))
+    commands = start_pipe_reader(conn, f"monitor-worker-{worker_id}-pipe")
+    logging.info(f"Monitor worker {worker_id} is running.")
+    try:
+        while True:
+            message: Dict[str, Any] | None = await commands.get()
+            if message is None:
+                logging.warning("Lost the connection to the bot process; stopping.")
+                break
+            if message['op'] == 'shutdown':
+                break
+            try:
+                result = handlers[message['op']](*message['args'])
+            except Exception as e:
+                logging.error(f"Monitor command {message['op']} failed: {e!r}")
+                if 'id' in message:
+                    send_reply(message['id'], error=e)
+                continue
+            if asyncio.iscoroutine(result):
+                # Commands that talk to Telegram must not hold up the ones behind them.
+                task = asyncio.create_task(reply_when_done(message.get('id'), message['op'], result))
+                replies.add(task)
+                task.add_done_callback(replies.discard)
+            elif 'id' in message:
+                send_reply(message['id'], result)
+    finally:
+        for task in replies:
+            task.cancel()
+        await cancel_all_supervisors()
+        await shutdown_scheduler()
+        await flush_deletion_notifications()
+        await close_all_clients()
+        loop_monitor_task.cancel()
+        outbox_report_task.cancel()
+        await bot.session.close()
+        shutdown_executor()
+        close_pool()
+        conn.close()
+        logging.info(f"Monitor worker {worker_id} has stopped.")
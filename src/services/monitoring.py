@@ -1,145 +1,333 @@
 import asyncio
+import functools
 import logging
-import os
-from contextlib import suppress
-from datetime import datetime
+import time
+from typing import Any, Dict, List
 
 from aiogram import Bot
-from aiogram.exceptions import TelegramBadRequest
-from telethon import TelegramClient
+from telethon import TelegramClient, events, utils
+from telethon.errors import UserAlreadyParticipantError
 from telethon.sessions import StringSession
+from telethon.tl.functions.channels import JoinChannelRequest
+from telethon.tl.types import Channel, Chat, User
 
-from src.config import DOWNLOADS_DIR, SESSIONS_DIR, SUPERVISOR_SLEEP_INTERVAL
-from src.database.queries import (
-    db_add_message, db_autoclean_messages, db_get_chat_settings,
-    db_get_chats, db_get_last_message_id, db_get_recent_active_messages,
-    db_get_session_credentials, db_mark_message_as_deleted
+from src.config import (
+    DELETION_CHECK_BATCH_SIZE, EVENT_DRIVEN_INGEST, INGEST_METRICS_REPORT_INTERVAL,
+    RECONCILE_INTERVAL, SUPERVISOR_CONNECT_CONCURRENCY, SUPERVISOR_SLEEP_INTERVAL
+)
+from src.database.async_queries import (
+    db_add_messages, db_get_active_messages_by_ids, db_get_chats,
+    db_get_last_message_id, db_get_pending_deletion_notices, db_is_chat_monitored, db_mark_messages_as_deleted
 )
 from src.globals import monitoring_tasks
-from src.utils.lexicon import LEXICON
+from src.services.adaptive_polling import next_poll_interval
+from src.services.autoclean import autoclean_chat
+from src.services.chat_registry import get_chat_settings
+from src.services.client_registry import expect_live_client, load_session, register_live_client, unregister_live_client
+from src.services.deletion_checks import check_due_deletions
+from src.services.deletion_notifier import get_deletion_notifier
+from src.services.media_pipeline import MediaPipeline, has_downloadable_media
+from src.services.rate_limiter import PRIORITY_DELETION_CHECK, PRIORITY_INGEST, RequestGovernor
+from src.services.scheduler import get_scheduler
+from src.services.session_status import set_session_authorized
+
+HISTORY_PAGE_SIZE = 100  # Messages per messages.getHistory request
+
+# Bounds concurrent connects (handshake, auth key checks, catching up on updates) so a
+# restart or a network blip does not hit Telegram's DCs with every session at once.
+_connect_slots = asyncio.Semaphore(SUPERVISOR_CONNECT_CONCURRENCY)
+
+def new_ingest_metrics() -> dict:
+    """Per-session counters for message delivery latency. API calls are counted by the RequestGovernor."""
+    return {
+        'polled_messages': 0, 'pushed_messages': 0,
+        'latency_total': 0.0, 'latency_samples': 0, 'latency_max': 0.0
+    }
+
+def log_ingest_metrics(session_phone: str, metrics: dict, governor: RequestGovernor, media: MediaPipeline):
+    samples = metrics['latency_samples']
+    avg = metrics['latency_total'] / samples if samples else 0.0
+    requests, downloads = governor.stats, media.stats
+    logging.info(
+        f"Ingest for {session_phone}: {requests['requests']} API calls, "
+        f"{metrics['pushed_messages']} pushed / {metrics['polled_messages']} polled messages, "
+        f"latency avg {avg:.1f}s, max {metrics['latency_max']:.1f}s. "
+        f"Throttled {requests['throttled_seconds']:.0f}s, "
+        f"{requests['flood_waits']} flood waits ({requests['flood_wait_seconds']:.0f}s). "
+        f"Media: {downloads['downloaded']} downloaded ({downloads['bytes'] / 1048576:.1f} MiB), {downloads['deduplicated']} deduplicated, "
+        f"{media.queued} queued, {downloads['retries']} retries, {downloads['failed']} failed."
+    )
+
+async def load_cursor(task_key: tuple, chat_id: int) -> int:
+    """Returns the chat's in-memory poll cursor, loading it from the database once."""
+    cursors = monitoring_tasks[task_key]['cursors']
+    if chat_id not in cursors:
+        cursors[chat_id] = await db_get_last_message_id(task_key[1], chat_id)
+    return cursors[chat_id]
+
+async def store_messages(task_key: tuple, chat_id: int, settings: dict, messages: list, source: str) -> int:
+    """Archives the `messages` (oldest first) above the chat's cursor and queues their media.
+
+    Pushed updates and reconciliation polls both end up here. The cursor is the id up to
+    which a poll has fetched the history completely, so only polls (`source` 'polled')
+    move it; a pushed message (`source` 'pushed') is stored without it, and the next poll
+    still fetches everything above the cursor, filling the holes around pushed messages.
+    The database skips messages that are already archived, so nothing is stored or
+    downloaded twice. Returns the number of newly stored messages.
+    """
+    info = monitoring_tasks[task_key]
+    lock = info['ingest_locks'].setdefault(chat_id, asyncio.Lock())
+    async with lock:
+        last_id = await load_cursor(task_key, chat_id)
+        messages = [msg for msg in messages if msg.id > last_id]
+        if not messages:
+            return 0
+
+        rows = []
+        for msg in messages:
+            sender_id_val = getattr(msg.sender_id, 'user_id', msg.sender_id) if msg.sender_id else None
+            rows.append((msg.id, msg.text, sender_id_val, msg.date, None, None))
+        with_media = {msg.id for msg in messages if settings['download_media'] and has_downloadable_media(msg)}
+        polled = source == 'polled'
+        inserted = set(await db_add_messages(task_key[1], chat_id, rows, pending_media=with_media, advance_mark=polled))
+        if polled:
+            info['cursors'][chat_id] = max(last_id, max(row[0] for row in rows))
+        messages = [msg for msg in messages if msg.id in inserted]
+        for msg in messages:
+            if msg.id in with_media:
+                info['media'].submit(chat_id, msg.id, msg)
+
+    metrics = info['metrics']
+    metrics[f'{source}_messages'] += len(messages)
+    status = info['chats'].get(chat_id)
+    if source == 'pushed' and status is not None:
+        # Pushed messages are traffic the next poll no longer sees; adaptive polling counts them too.
+        status['pushed_since_poll'] = status.get('pushed_since_poll', 0) + len(messages)
+    if last_id:  # The initial history fetch would only skew the latency figures
+        now = time.time()
+        for msg in messages:
+            latency = max(0.0, now - msg.date.timestamp())
+            metrics['latency_total'] += latency
+            metrics['latency_samples'] += 1
+            metrics['latency_max'] = max(metrics['latency_max'], latency)
+    return len(messages)
 
-async def notify_user_of_deletion(bot: Bot, user_id: int, session_phone: str, chat_title: str, deleted_message_details: dict):
-    header = LEXICON['deletion_notification_title']
+async def report_deletions(bot: Bot, user_id: int, session_phone: str, settings: dict, deleted_messages: List[dict]):
+    await db_mark_messages_as_deleted([db_msg['id'] for db_msg in deleted_messages])
+    get_deletion_notifier().add(
+        bot, user_id, session_phone, settings['chat_id'], settings['title'], deleted_messages, settings['deletion_digest_minutes']
+    )
+
+async def resend_pending_deletions(bot: Bot, user_id: int, session_phone: str):
+    """Collects deletions again whose notification was lost, e.g. to a crash before it was sent."""
+    by_chat: Dict[int, List[dict]] = {}
+    for row in await db_get_pending_deletion_notices(user_id, session_phone):
+        by_chat.setdefault(row['chat_id'], []).append(row)
+    for chat_id, rows in by_chat.items():
+        get_deletion_notifier().add(bot, user_id, session_phone, chat_id, rows[0]['title'], rows, rows[0]['deletion_digest_minutes'])
+
+async def resolve_and_join_chat(client, user_id: int, session_phone: str, identifier: str) -> Dict[str, Any] | None:
+    """Looks up a chat for the add-chat dialog and joins it unless it is a user or already monitored.
+
+    Runs through client_registry.run_with_client, so possibly in a monitor worker process.
+    Returns None if the session is gone, otherwise a dict with 'outcome' (one of 'monitored',
+    'user', 'joined', 'already_joined', 'unsupported'), 'id', 'title' and 'type'. Raises
+    ValueError or TypeError if no such chat exists.
+    """
+    if client is None:
+        return None
+    entity = await client.get_entity(identifier)
+    if isinstance(entity, User):
+        chat = {'id': entity.id, 'title': f"{entity.first_name} {entity.last_name or ''}".strip(), 'type': 'user'}
+    elif isinstance(entity, (Channel, Chat)):
+        chat = {'id': entity.id, 'title': entity.title, 'type': 'chat'}
+    else:
+        return {'outcome': 'unsupported', 'id': None, 'title': None, 'type': None}
+    if await db_is_chat_monitored(user_id, session_phone, entity.id):
+        return {'outcome': 'monitored', **chat}
+    if chat['type'] == 'user':
+        return {'outcome': 'user', **chat}
     try:
-        date_obj = datetime.fromisoformat(deleted_message_details['date'])
-        date_str = date_obj.strftime('%Y-%m-%d %H:%M:%S UTC')
-    except (ValueError, TypeError):
-        date_str = "N/A"
+        await client(JoinChannelRequest(entity))
+        return {'outcome': 'joined', **chat}
+    except UserAlreadyParticipantError:
+        return {'outcome': 'already_joined', **chat}
+
+async def fetch_new_messages(client: TelegramClient, governor: RequestGovernor, chat_id: int, last_id: int, initial_limit: int) -> list:
+    """Messages above `last_id`, or the newest `initial_limit` of a new chat, newest first.
+
+    History is paged by hand so every getHistory request goes through the governor.
+    """
+    messages = []
+    while True:
+        limit = HISTORY_PAGE_SIZE if last_id else min(HISTORY_PAGE_SIZE, initial_limit - len(messages))
+        if limit <= 0:
+            break
+        offset_id = messages[-1].id if messages else 0
+        page = await governor.call(client.get_messages, chat_id, limit=limit, min_id=last_id, offset_id=offset_id, priority=PRIORITY_INGEST)
+        messages.extend(page)
+        if len(page) < limit:
+            break
+    return messages
+
+async def poll_chat(user_id: int, session_phone: str, chat_id: int, client: TelegramClient, bot: Bot) -> float | None:
+    """One monitoring cycle for a chat, run by the poll scheduler.
+
+    Returns the number of seconds until the next cycle, or None once the chat is gone.
+    """
+    task_key = (user_id, session_phone)
+    settings = await get_chat_settings(user_id, session_phone, chat_id)
+    if not settings:
+        logging.warning(f"Chat {chat_id} removed from DB for {session_phone}. Polling stops.")
+        return None
+
+    governor = monitoring_tasks[task_key]['governor']
+    last_id = await load_cursor(task_key, chat_id)
     
-    body = LEXICON['deletion_notification_body'].format(
-        chat_title=chat_title, session_phone=session_phone, date=date_str
-    )
+    messages_to_process = await fetch_new_messages(client, governor, chat_id, last_id, settings['initial_fetch_limit'])
+    new_messages = await store_messages(task_key, chat_id, settings, list(reversed(messages_to_process)), 'polled')
     
-    content = ""
-    if deleted_message_details.get('text'):
-        content += LEXICON['deleted_text_content'].format(text=deleted_message_details['text'])
-    if deleted_message_details.get('file_path'):
-        content += "\n" + LEXICON['deleted_file_content'].format(file_path=deleted_message_details['file_path'])
-    if not content:
-        content = LEXICON['deleted_media_only_content']
-        
-    full_message = f"{header}\n{body}{content}"
+    if settings['detect_deletions']:
+        deleted = await check_due_deletions(client, governor, session_phone, chat_id, settings['deletion_check_budget'])
+        await report_deletions(bot, user_id, session_phone, settings, deleted)
     
-    try:
-        await bot.send_message(user_id, full_message)
-    except TelegramBadRequest as e:
-        logging.warning(f"Failed to send deletion notification to user {user_id}: {e}")
+    if settings['db_autoclean_limit'] > 0:
+        await autoclean_chat(session_phone, chat_id, settings['db_autoclean_limit'])
+    
+    interval = settings['check_frequency_seconds']
+    status = monitoring_tasks[task_key]['chats'].get(chat_id, {})
+    arrived = new_messages + status.pop('pushed_since_poll', 0)
+    if settings['adaptive_polling']:
+        interval, status['message_rate'] = next_poll_interval(
+            status.get('adaptive_interval', interval), arrived, status.get('message_rate', 0.0),
+            settings['min_check_frequency_seconds'], settings['max_check_frequency_seconds']
+        )
+        status['adaptive_interval'] = interval
+    elif EVENT_DRIVEN_INGEST:
+        # New messages and deletions arrive as updates; this poll only fills gaps
+        # such as updates missed while disconnected. With adaptive polling the chat's
+        # traffic, pushed messages included, paces these polls within the user's bounds.
+        interval = max(interval, RECONCILE_INTERVAL)
+    status['interval'] = interval  # Shown as the effective interval in the chat settings menu
+    return interval
 
-async def chat_worker(user_id: int, session_phone: str, chat_id: int, client: TelegramClient, bot: Bot):
-    while True:
+def register_update_handlers(client: TelegramClient, bot: Bot, user_id: int, session_phone: str):
+    """Ingests pushed new-message and deletion updates for the session's monitored chats."""
+    task_key = (user_id, session_phone)
+
+    def is_monitored(chat_id: int) -> bool:
+        return chat_id in monitoring_tasks.get(task_key, {}).get('chats', {})
+
+    async def on_new_message(event: events.NewMessage.Event):
+        # Chats are stored by their bare id, updates carry the marked (-100...) form.
+        chat_id = utils.resolve_id(event.chat_id)[0]
+        if not is_monitored(chat_id):
+            return
         try:
-            settings = db_get_chat_settings(user_id, session_phone, chat_id)
-            if not settings:
-                logging.warning(f"Chat {chat_id} removed from DB for {session_phone}. Worker stopping.")
-                break
+            settings = await get_chat_settings(user_id, session_phone, chat_id)
+            if settings:
+                await store_messages(task_key, chat_id, settings, [event.message], 'pushed')
+        except Exception as e:
+            logging.error(f"Failed to store pushed message in chat {chat_id} ({session_phone}): {e}")
 
-            last_id = db_get_last_message_id(session_phone, chat_id)
-            
-            messages_to_process = []
-            if last_id == 0:
-                async for msg in client.iter_messages(chat_id, limit=settings['initial_fetch_limit']):
-                    messages_to_process.append(msg)
-            else:
-                async for msg in client.iter_messages(chat_id, min_id=last_id):
-                    messages_to_process.append(msg)
-            
-            for msg in reversed(messages_to_process):
-                file_path, file_size = None, None
-                if settings['download_media'] and msg.media and not getattr(msg, 'web_preview', None):
-                    with suppress(Exception):
-                        file_path = await msg.download_media(file=DOWNLOADS_DIR)
-                        if file_path and os.path.exists(file_path):
-                            file_size = os.path.getsize(file_path)
-
-                sender_id_val = getattr(msg.sender_id, 'user_id', msg.sender_id) if msg.sender_id else None
-                db_add_message(msg.id, chat_id, session_phone, msg.text, sender_id_val, msg.date, file_path, file_size)
-            
-            if settings['detect_deletions']:
-                db_msgs = db_get_recent_active_messages(session_phone, chat_id)
-                if db_msgs:
-                    ids_to_check = [m['telethon_message_id'] for m in db_msgs]
-                    live_msgs = {m.id for m in await client.get_messages(chat_id, ids=ids_to_check) if m}
-                    for db_msg in db_msgs:
-                        if db_msg['telethon_message_id'] not in live_msgs:
-                            await notify_user_of_deletion(bot, user_id, session_phone, settings['title'], db_msg)
-                            db_mark_message_as_deleted(db_msg['id'])
-            
-            if settings['db_autoclean_limit'] > 0:
-                db_autoclean_messages(session_phone, chat_id, settings['db_autoclean_limit'])
-            
-            await asyncio.sleep(settings['check_frequency_seconds'])
-
-        except asyncio.CancelledError:
-            logging.info(f"Worker for chat {chat_id} ({session_phone}) cancelled.")
-            break
+    async def on_message_deleted(event: events.MessageDeleted.Event):
+        # Only channel deletions name their chat. Other deletions are looked up by
+        # message id across the session's chats and confirmed per chat, since ids
+        # from different channels can collide with them.
+        scoped_chat_id = utils.resolve_id(event.chat_id)[0] if event.chat_id is not None else None
+        if scoped_chat_id is not None and not is_monitored(scoped_chat_id):
+            return
+        try:
+            candidates: Dict[int, List[dict]] = {}
+            for db_msg in await db_get_active_messages_by_ids(session_phone, event.deleted_ids, scoped_chat_id):
+                if is_monitored(db_msg['chat_id']):
+                    candidates.setdefault(db_msg['chat_id'], []).append(db_msg)
+
+            for chat_id, db_msgs in candidates.items():
+                settings = await get_chat_settings(user_id, session_phone, chat_id)
+                if not settings or not settings['detect_deletions']:
+                    continue
+                if scoped_chat_id is None:
+                    governor = monitoring_tasks[task_key]['governor']
+                    ids = [m['telethon_message_id'] for m in db_msgs]
+                    live_msgs = set()
+                    for start in range(0, len(ids), DELETION_CHECK_BATCH_SIZE):
+                        batch = ids[start:start + DELETION_CHECK_BATCH_SIZE]
+                        live_msgs.update(m.id for m in await governor.call(client.get_messages, chat_id, ids=batch, priority=PRIORITY_DELETION_CHECK) if m)
+                    db_msgs = [m for m in db_msgs if m['telethon_message_id'] not in live_msgs]
+                await report_deletions(bot, user_id, session_phone, settings, db_msgs)
         except Exception as e:
-            logging.error(f"Error in worker for chat {chat_id} ({session_phone}): {e}. Retrying in 60s.")
-            await asyncio.sleep(60)
+            logging.error(f"Failed to process pushed deletion for {session_phone}: {e}")
+
+    client.add_event_handler(on_new_message, events.NewMessage())
+    client.add_event_handler(on_message_deleted, events.MessageDeleted())
 
 async def session_supervisor(user_id: int, session_phone: str, bot: Bot):
     task_key = (user_id, session_phone)
     if task_key not in monitoring_tasks:
         return
-    monitoring_tasks[task_key]['workers'] = {}
+    # Kept locally as well: stopping monitoring pops the entry before cancelling us.
+    session_info = monitoring_tasks[task_key]
+    governor = RequestGovernor(session_phone)
+    session_info.update(chats={}, cursors={}, ingest_locks={}, metrics=new_ingest_metrics(), governor=governor)
+    scheduler = get_scheduler()
 
-    credentials = db_get_session_credentials(user_id, session_phone)
-    session_path = SESSIONS_DIR / f"{user_id}_{session_phone}.session"
-
-    if not credentials or not session_path.exists():
+    session = await load_session(user_id, session_phone)
+    if session is None:
         logging.error(f"Credentials or session file for {session_phone} not found. Supervisor exiting.")
         return
-    
-    api_id, api_hash = credentials
-    with open(session_path, "r") as f:
-        session_string = f.read()
-    
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
+    api_id, api_hash, session_string = session
+
+    # flood_sleep_threshold=0: every FloodWaitError reaches the governor instead of Telethon sleeping on it
+    client = TelegramClient(StringSession(session_string), api_id, api_hash, flood_sleep_threshold=0)
+    session_info['media'] = media = MediaPipeline(client, governor, session_phone)
+    if EVENT_DRIVEN_INGEST:
+        register_update_handlers(client, bot, user_id, session_phone)
+    await resend_pending_deletions(bot, user_id, session_phone)
+    last_report = time.monotonic()
 
     try:
+        expect_live_client(user_id, session_phone)
         while True: # Main reconnection loop
             try:
                 logging.info(f"Supervisor for {session_phone} connecting...")
-                await client.connect()
+                async with _connect_slots:
+                    await client.connect()
                 logging.info(f"Supervisor for {session_phone} connected.")
+                register_live_client(user_id, session_phone, client)
+                media.start()
+                # Updates pushed while disconnected are lost; reconcile every chat now.
+                for chat_id in session_info['chats']:
+                    scheduler.wake((user_id, session_phone, chat_id))
                 
-                while True: # Worker management loop
-                    if not await client.is_user_authorized():
+                while True: # Chat management loop
+                    authorized = await client.is_user_authorized()
+                    set_session_authorized(user_id, session_phone, authorized)
+                    if not authorized:
                         logging.warning(f"Auth lost for {session_phone}. Supervisor pausing.")
                         await asyncio.sleep(300)
                         continue
 
-                    db_chats = {c['id'] for c in db_get_chats(user_id, session_phone)}
-                    running_workers = set(monitoring_tasks[task_key]['workers'].keys())
+                    db_chats = {c['id'] for c in await db_get_chats(user_id, session_phone)}
+                    scheduled_chats = set(session_info['chats'].keys())
+                    
+                    for chat_id in db_chats - scheduled_chats:
+                        logging.info(f"Supervisor scheduling new chat {chat_id} on {session_phone}")
+                        session_info['chats'][chat_id] = scheduler.register(
+                            (user_id, session_phone, chat_id),
+                            functools.partial(poll_chat, user_id, session_phone, chat_id, client, bot)
+                        )
                     
-                    for chat_id in db_chats - running_workers:
-                        logging.info(f"Supervisor starting worker for new chat {chat_id} on {session_phone}")
-                        task = asyncio.create_task(chat_worker(user_id, session_phone, chat_id, client, bot))
-                        monitoring_tasks[task_key]['workers'][chat_id] = task
+                    for chat_id in scheduled_chats - db_chats:
+                        logging.info(f"Supervisor unscheduling removed chat {chat_id} on {session_phone}")
+                        scheduler.unregister((user_id, session_phone, chat_id))
+                        del session_info['chats'][chat_id]
+                        session_info['cursors'].pop(chat_id, None)
+                        session_info['ingest_locks'].pop(chat_id, None)
                     
-                    for chat_id in running_workers - db_chats:
-                        logging.info(f"Supervisor stopping worker for removed chat {chat_id} on {session_phone}")
-                        task = monitoring_tasks[task_key]['workers'].pop(chat_id)
-                        task.cancel()
+                    if time.monotonic() - last_report >= INGEST_METRICS_REPORT_INTERVAL:
+                        log_ingest_metrics(session_phone, session_info['metrics'], governor, media)
+                        last_report = time.monotonic()
                     
                     await asyncio.sleep(SUPERVISOR_SLEEP_INTERVAL)
 
@@ -156,14 +344,12 @@ async def session_supervisor(user_id: int, session_phone: str, bot: Bot):
         logging.info(f"Supervisor for {session_phone} cancelled during setup.")
     finally:
         logging.info(f"Cleaning up supervisor for {session_phone}.")
-        worker_tasks_to_cancel = []
-        if task_key in monitoring_tasks and 'workers' in monitoring_tasks[task_key]:
-            for worker_task in monitoring_tasks[task_key]['workers'].values():
-                worker_task.cancel()
-                worker_tasks_to_cancel.append(worker_task)
-        
-        if worker_tasks_to_cancel:
-            await asyncio.gather(*worker_tasks_to_cancel, return_exceptions=True)
+        cancelled_polls = [scheduler.unregister((user_id, session_phone, chat_id)) for chat_id in session_info['chats']]
+        # Let cancelled polls unwind before their client goes away.
+        await asyncio.gather(*[t for t in cancelled_polls if t], return_exceptions=True)
+        unregister_live_client(user_id, session_phone, client)
+        media.close()
+        governor.close()
 
         if client.is_connected():
             await client.disconnect()
@@ -0,0 +1,97 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from telethon.errors import FloodWaitError
+
+from src.config import FLOOD_WAIT_MAX_RETRIES, TELEGRAM_REQUEST_BURST, TELEGRAM_REQUESTS_PER_SECOND
+
+# Lower values are served first, both from the token bucket and after a flood wait.
+PRIORITY_INGEST = 0
+PRIORITY_DELETION_CHECK = 1
+PRIORITY_MEDIA = 2
+
+class RequestGovernor:
+    """Token bucket shared by every Telegram API request of one session.
+
+    Requests wait for a token in priority order. A FloodWaitError pauses the whole
+    session for the number of seconds the server asked for; afterwards the waiting
+    requests are let through by priority at the normal rate.
+    """
+
+    def __init__(self, session_phone: str, rate: float = TELEGRAM_REQUESTS_PER_SECOND, burst: int = TELEGRAM_REQUEST_BURST):
+        self.session_phone = session_phone
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._refilled_at: float | None = None
+        self._paused_until = 0.0
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._pump: asyncio.Task | None = None
+        self.stats: Dict[str, float] = {'requests': 0, 'throttled_seconds': 0.0, 'flood_waits': 0, 'flood_wait_seconds': 0.0}
+
+    async def acquire(self, priority: int = PRIORITY_INGEST):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        grant = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), grant))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._grant_tokens())
+        try:
+            await grant
+        finally:
+            grant.cancel()  # A cancelled waiter is skipped when its turn comes
+        self.stats['requests'] += 1
+        self.stats['throttled_seconds'] += loop.time() - started
+
+    def pause(self, seconds: float):
+        """Holds back every request of the session for `seconds`."""
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+        # Resume at the normal rate instead of with a burst
+        self._tokens = 0.0
+        self._refilled_at = self._paused_until
+        self.stats['flood_waits'] += 1
+        self.stats['flood_wait_seconds'] += seconds
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, priority: int = PRIORITY_INGEST, **kwargs) -> Any:
+        """Awaits `func(*args, **kwargs)` once a token is available, retrying after flood waits."""
+        for attempt in range(FLOOD_WAIT_MAX_RETRIES + 1):
+            await self.acquire(priority)
+            try:
+                return await func(*args, **kwargs)
+            except FloodWaitError as e:
+                logging.warning(f"Flood wait of {e.seconds}s for {self.session_phone}; pausing all requests of the session.")
+                self.pause(e.seconds)
+                if attempt == FLOOD_WAIT_MAX_RETRIES:
+                    raise
+
+    def _refill(self, now: float):
+        if self._refilled_at is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    async def _grant_tokens(self):
+        loop = asyncio.get_running_loop()
+        while self._waiters:
+            if self._waiters[0][2].done():
+                heapq.heappop(self._waiters)  # Cancelled while waiting
+                continue
+            now = loop.time()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            _, _, grant = heapq.heappop(self._waiters)
+            self._tokens -= 1
+            grant.set_result(None)
+
+    def close(self):
+        if self._pump is not None:
+            self._pump.cancel()
@@ -0,0 +1,199 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Tuple
+
+from src.config import (
+    SCHEDULER_ERROR_RETRY, SCHEDULER_JITTER, SCHEDULER_SESSION_CONCURRENCY,
+    SCHEDULER_STARTUP_SPREAD, SCHEDULER_WORKERS
+)
+
+PollKey = Tuple[int, str, int]  # (user_id, session_phone, chat_id)
+PollFunc = Callable[[], Awaitable[float | None]]  # Returns seconds until the next poll, None to stop
+
+class PollScheduler:
+    """Runs every chat poll in the process from one priority queue of due times.
+
+    A dispatcher pops due chats off a heap and hands them to a fixed pool of worker
+    tasks, so the number of polls in flight is bounded no matter how many chats are
+    monitored. At most `session_limit` polls of one session run at once; the rest wait
+    in that session's backlog in due order. Every delay is jittered so chats that
+    started together drift apart instead of polling in bursts.
+    """
+
+    def __init__(self, workers: int = SCHEDULER_WORKERS, session_limit: int = SCHEDULER_SESSION_CONCURRENCY, jitter: float = SCHEDULER_JITTER):
+        self.workers = workers
+        self.session_limit = session_limit
+        self.jitter = jitter
+        self._heap: List[Tuple[float, int, PollKey]] = []
+        self._seq = itertools.count()
+        self._jobs: Dict[PollKey, Dict[str, Any]] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._backlog: Dict[Tuple[int, str], Deque[PollKey]] = {}
+        self._in_flight: Dict[Tuple[int, str], int] = {}
+        self._changed = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks.append(asyncio.create_task(self._dispatch()))
+            self._tasks.extend(asyncio.create_task(self._work()) for _ in range(self.workers))
+
+    async def stop(self):
+        for key in list(self._jobs):
+            self.unregister(key)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def register(self, key: PollKey, poll: PollFunc) -> Dict[str, Any]:
+        """Schedules `poll` for a chat, first run spread over SCHEDULER_STARTUP_SPREAD seconds.
+
+        Returns the chat's live status dict (state, next_run, last_run, runs, errors).
+        """
+        self.unregister(key)
+        status = {'state': 'scheduled', 'next_run': None, 'last_run': None, 'last_duration': None, 'runs': 0, 'errors': 0}
+        self._jobs[key] = {'poll': poll, 'status': status, 'due': None, 'task': None, 'rerun': False}
+        self._schedule(key, random.uniform(0, SCHEDULER_STARTUP_SPREAD))
+        return status
+
+    def unregister(self, key: PollKey) -> asyncio.Task | None:
+        """Stops scheduling the chat. Returns its cancelled poll task if one was running."""
+        job = self._jobs.pop(key, None)
+        if job is None:
+            return None
+        job['status'].update(state='stopped', next_run=None)
+        if job['task'] is not None:
+            job['task'].cancel()
+        return job['task']
+
+    def wake(self, key: PollKey):
+        """Runs the chat's next poll as soon as possible."""
+        job = self._jobs.get(key)
+        if job is None:
+            return
+        if job['status']['state'] == 'scheduled':
+            self._schedule(key, 0)
+        else:
+            job['rerun'] = True  # Queued or running: poll again right after this run
+
+    def _schedule(self, key: PollKey, delay: float):
+        job = self._jobs[key]
+        job['due'] = asyncio.get_running_loop().time() + delay
+        job['status'].update(state='scheduled', next_run=time.time() + delay)
+        heapq.heappush(self._heap, (job['due'], next(self._seq), key))
+        self._changed.set()
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._changed.clear()
+            now = loop.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, _, key = heapq.heappop(self._heap)
+                job = self._jobs.get(key)
+                # Rescheduling leaves the old heap entry behind; only the latest one counts.
+                if job is None or job['due'] != due or job['status']['state'] != 'scheduled':
+                    continue
+                self._enqueue(key)
+            timeout = self._heap[0][0] - now if self._heap else None
+            # asyncio.wait rather than wait_for: the latter can swallow a cancellation
+            # that arrives together with the event, which would hang stop().
+            waiter = asyncio.ensure_future(self._changed.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=timeout)
+            finally:
+                waiter.cancel()
+
+    def _enqueue(self, key: PollKey):
+        session = key[:2]
+        job = self._jobs[key]
+        job['status'].update(state='queued', next_run=None)
+        if self._in_flight.get(session, 0) < self.session_limit:
+            self._in_flight[session] = self._in_flight.get(session, 0) + 1
+            self._ready.put_nowait(key)
+        else:
+            job['status']['state'] = 'waiting'
+            self._backlog.setdefault(session, deque()).append(key)
+
+    def _release(self, session: Tuple[int, str]):
+        backlog = self._backlog.get(session)
+        while backlog:
+            key = backlog.popleft()
+            if key in self._jobs:
+                self._jobs[key]['status']['state'] = 'queued'
+                self._ready.put_nowait(key)
+                return
+        self._backlog.pop(session, None)
+        self._in_flight[session] -= 1
+        if not self._in_flight[session]:
+            del self._in_flight[session]
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key = await self._ready.get()
+            job = self._jobs.get(key)
+            if job is None:
+                self._release(key[:2])
+                continue
+            status = job['status']
+            status.update(state='running', last_run=time.time())
+            started = loop.time()
+            job['rerun'] = False
+            job['task'] = task = asyncio.create_task(job['poll']())
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                job['task'] = None
+                self._release(key[:2])
+
+            status['last_duration'] = loop.time() - started
+            status['runs'] += 1
+            if self._jobs.get(key) is not job:
+                continue  # Unregistered (or replaced) while running
+            if task.cancelled():
+                delay = SCHEDULER_ERROR_RETRY
+            elif task.exception() is not None:
+                status['errors'] += 1
+                logging.error(f"Poll for chat {key[2]} ({key[1]}) failed: {task.exception()}. Retrying in {SCHEDULER_ERROR_RETRY}s.")
+                delay = SCHEDULER_ERROR_RETRY
+            else:
+                delay = task.result()
+                if delay is None:
+                    self.unregister(key)
+                    continue
+            if job['rerun']:
+                delay = 0
+            self._schedule(key, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+_scheduler: PollScheduler | None = None
+
+def get_scheduler() -> PollScheduler:
+    """Returns the process-wide poll scheduler, starting it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = PollScheduler()
+    _scheduler.start()
+    return _scheduler
+
+def wake_poll(key: PollKey):
+    """Polls the chat as soon as possible if it is scheduled."""
+    if _scheduler is not None:
+        _scheduler.wake(key)
+
+async def shutdown_scheduler():
+    """Stops the scheduler's dispatcher and workers, cancelling polls in flight."""
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.stop()
+        _scheduler = None
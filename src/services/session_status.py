@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.config import SESSION_STATUS_TTL
+from src.services.client_registry import SessionOwnedElsewhere, run_with_client
+
+SessionKey = Tuple[int, str]  # (user_id, session_phone)
+
+# Last known profile and authorization state per session. Each entry: authorized,
+# first_name, last_name, tg_user_id, fetched_at (monotonic time of the last profile fetch),
+# elsewhere (another bot instance runs the session, so its profile cannot be fetched here).
+_status: Dict[SessionKey, Dict[str, Any]] = {}
+_refreshing: Dict[SessionKey, asyncio.Task] = {}
+# Called with (user_id, session_phone, authorized) for every state a supervisor reports,
+# e.g. to pass it from a monitor worker process to the bot process.
+_listeners: List[Callable[[int, str, bool], None]] = []
+
+def add_authorization_listener(listener: Callable[[int, str, bool], None]):
+    _listeners.append(listener)
+
+async def fetch_profile(client) -> Dict[str, Any] | None:
+    """A status entry read from `client`; runs in whichever process holds the session's connection."""
+    if client is None:
+        return None
+    entry = {'authorized': False, 'first_name': None, 'last_name': "", 'tg_user_id': None, 'elsewhere': False}
+    if await client.is_user_authorized():
+        me = await client.get_me()
+        entry.update(authorized=True, first_name=me.first_name, last_name=me.last_name or "", tg_user_id=me.id)
+    return entry
+
+async def _fetch(key: SessionKey) -> Dict[str, Any] | None:
+    try:
+        try:
+            entry = await run_with_client(*key, fetch_profile)
+        except SessionOwnedElsewhere:
+            entry = {'authorized': False, 'first_name': None, 'last_name': "", 'tg_user_id': None, 'elsewhere': True}
+        if entry is None:
+            return None
+        entry['fetched_at'] = time.monotonic()  # Monotonic clocks differ between processes
+        _status[key] = entry
+        return entry
+    finally:
+        _refreshing.pop(key, None)
+
+async def refresh_session_status(user_id: int, session_phone: str) -> Dict[str, Any] | None:
+    """Fetches the session's profile now; concurrent callers share one fetch.
+
+    Returns the new entry, or None if the session data is gone. Connection errors propagate.
+    """
+    key = (user_id, session_phone)
+    task = _refreshing.get(key)
+    if task is None:
+        task = _refreshing[key] = asyncio.create_task(_fetch(key))
+    return await asyncio.shield(task)
+
+async def _refresh_quietly(user_id: int, session_phone: str):
+    try:
+        await refresh_session_status(user_id, session_phone)
+    except Exception as e:
+        logging.warning(f"Background status refresh for {session_phone} failed: {e}")
+
+async def get_session_status(user_id: int, session_phone: str) -> Dict[str, Any] | None:
+    """Returns the cached status of a session, fetching it only if there is none yet.
+
+    An entry older than SESSION_STATUS_TTL is returned as is and refreshed in the background.
+    """
+    key = (user_id, session_phone)
+    entry = _status.get(key)
+    if entry is None:
+        return await refresh_session_status(user_id, session_phone)
+    if time.monotonic() - entry['fetched_at'] >= SESSION_STATUS_TTL and key not in _refreshing:
+        asyncio.create_task(_refresh_quietly(user_id, session_phone))
+    return entry
+
+def set_session_authorized(user_id: int, session_phone: str, authorized: bool):
+    """Records the authorization state a supervisor has observed, keeping the cached profile."""
+    for listener in _listeners:
+        listener(user_id, session_phone, authorized)
+    key = (user_id, session_phone)
+    entry = _status.get(key)
+    if entry is None or entry['authorized'] == authorized:
+        return
+    if authorized:
+        del _status[key]  # The profile was not known while unauthorized; fetch it on the next view
+    else:
+        entry['authorized'] = False
+
+def forget_session_status(user_id: int, session_phone: str):
+    _status.pop((user_id, session_phone), None)
@@ -0,0 +1,207 @@
+import asyncio
+import bisect
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import time
+from typing import Any, Dict, Hashable, Iterable, Set, Tuple
+
+from src.config import (
+    BOT_GLOBAL_BURST, BOT_GLOBAL_RATE, MONITOR_HASH_REPLICAS, MONITOR_IPC_TIMEOUT,
+    MONITOR_WORKER_RESTART_DELAY, MONITOR_WORKER_SHUTDOWN_TIMEOUT
+)
+from src.database.connection import database_file
+from src.services.monitor_worker import start_pipe_reader, worker_main
+from src.services.session_status import set_session_authorized
+
+SessionKey = Tuple[int, str]  # (user_id, session_phone)
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+def outbox_limits(processes: int, nodes: int = 1) -> Tuple[float, int]:
+    """Each process's share of the bot token's global Bot API limit, with `processes` per node."""
+    total = processes * max(1, nodes)
+    return BOT_GLOBAL_RATE / total, max(1, BOT_GLOBAL_BURST // total)
+
+async def _wait_for_exit(process: multiprocessing.Process, timeout: float | None = None):
+    """Waits for `process` to exit without tying up an executor thread in join()."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while process.is_alive() and (deadline is None or time.monotonic() < deadline):
+        await asyncio.sleep(0.1)
+
+class HashRing:
+    """Consistent hashing of sessions onto nodes.
+
+    Every node owns MONITOR_HASH_REPLICAS points on the ring and a session belongs to the
+    first point after its own hash, so adding or removing a node only moves the sessions
+    of that node's points.
+    """
+
+    def __init__(self, nodes: Iterable[Hashable], replicas: int = MONITOR_HASH_REPLICAS):
+        self._ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self._hashes = [h for h, _ in self._ring]
+
+    def node_for(self, user_id: int, session_phone: str) -> Hashable:
+        i = bisect.bisect(self._hashes, _hash(f"{user_id}:{session_phone}")) % len(self._ring)
+        return self._ring[i][1]
+
+class _Worker:
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.process: multiprocessing.Process | None = None
+        self.conn = None
+        self.reader: asyncio.Task | None = None
+        self.sessions: Set[SessionKey] = set()  # Sessions whose supervisor runs there
+
+class MonitorShards:
+    """Runs session supervisors in `workers` child processes, each owning a shard of sessions.
+
+    Sessions are assigned with a HashRing. The bot process talks to a worker over a
+    multiprocessing Pipe: commands are dicts with an 'op', and those with an 'id' get a
+    reply carrying the same id and the result or the exception raised. Workers report events (a supervisor exiting on its own,
+    a session's authorization state) without an id. A worker that dies is started again
+    after MONITOR_WORKER_RESTART_DELAY seconds with the sessions it was running.
+    """
+
+    def __init__(self, token: str, workers: int):
+        self.token = token
+        self._workers = {i: _Worker(i) for i in range(workers)}
+        self._ring = HashRing(self._workers)
+        self._context = multiprocessing.get_context('spawn')  # Children must not inherit open SQLite connections
+        self._requests: Dict[int, Tuple[int, asyncio.Future]] = {}
+        self._seq = itertools.count()
+        self._closing = False
+        self._nodes = 1  # Bot instances sharing the token, see set_cluster_nodes()
+
+    def _worker_for(self, user_id: int, session_phone: str) -> _Worker:
+        return self._workers[self._ring.node_for(user_id, session_phone)]
+
+    def start_workers(self):
+        for worker in self._workers.values():
+            self._spawn(worker)
+        logging.info(f"Started {len(self._workers)} monitor worker processes.")
+
+    def _spawn(self, worker: _Worker):
+        parent_conn, child_conn = self._context.Pipe()
+        rate, burst = outbox_limits(len(self._workers) + 1, self._nodes)
+        worker.process = self._context.Process(
+            target=worker_main, args=(worker.worker_id, child_conn, self.token, str(database_file()), rate, burst),
+            name=f"monitor-worker-{worker.worker_id}", daemon=True
+        )
+        worker.process.start()
+        child_conn.close()
+        worker.conn = parent_conn
+        worker.reader = asyncio.create_task(self._read(worker))
+
+    async def _read(self, worker: _Worker):
+        conn = worker.conn
+        messages = start_pipe_reader(conn, f"monitor-worker-{worker.worker_id}-reader")
+        while (message := await messages.get()) is not None:
+            if 'id' in message:
+                _, future = self._requests.pop(message['id'], (None, None))
+                if future is not None and not future.done():
+                    if 'error' in message:
+                        future.set_exception(message['error'])
+                    else:
+                        future.set_result(message['result'])
+            else:
+                self._on_event(worker, message['event'], message['args'])
+        conn.close()
+        for request_id, (worker_id, future) in list(self._requests.items()):
+            if worker_id == worker.worker_id:
+                del self._requests[request_id]
+                future.set_exception(ConnectionResetError(f"monitor worker {worker_id} exited"))
+        if not self._closing:
+            await self._restart(worker)
+
+    def _on_event(self, worker: _Worker, event: str, args: tuple):
+        if event == 'supervisor_exited':
+            worker.sessions.discard(tuple(args))
+        elif event == 'authorized':
+            set_session_authorized(*args)
+
+    async def _restart(self, worker: _Worker):
+        await _wait_for_exit(worker.process)
+        logging.error(
+            f"Monitor worker {worker.worker_id} exited with code {worker.process.exitcode}. "
+            f"Restarting it with {len(worker.sessions)} session(s) in {MONITOR_WORKER_RESTART_DELAY}s."
+        )
+        await asyncio.sleep(MONITOR_WORKER_RESTART_DELAY)
+        if self._closing:
+            return
+        self._spawn(worker)
+        sessions, worker.sessions = worker.sessions, set()
+        for user_id, session_phone in sessions:
+            try:
+                await self.start(user_id, session_phone)
+            except Exception as e:
+                logging.error(f"Could not restart monitoring of {session_phone} on worker {worker.worker_id}: {e!r}")
+
+    def _send(self, worker: _Worker, message: Dict[str, Any]):
+        worker.conn.send(message)
+
+    def notify(self, user_id: int, session_phone: str, op: str, *args):
+        """Sends a command to the session's worker without waiting for it."""
+        try:
+            self._send(self._worker_for(user_id, session_phone), {'op': op, 'args': (user_id, session_phone, *args)})
+        except OSError as e:
+            logging.warning(f"Could not send {op} for {session_phone} to its monitor worker: {e!r}")
+
+    async def request(self, user_id: int, session_phone: str, op: str, *args, timeout: float = MONITOR_IPC_TIMEOUT) -> Any:
+        """Sends a command to the session's worker and returns its reply."""
+        worker = self._worker_for(user_id, session_phone)
+        request_id = next(self._seq)
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = (worker.worker_id, future)
+        try:
+            self._send(worker, {'id': request_id, 'op': op, 'args': (user_id, session_phone, *args)})
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._requests.pop(request_id, None)
+
+    def set_cluster_nodes(self, nodes: int):
+        """Rescales every worker's outbox to its share when the number of bot instances changes."""
+        self._nodes = nodes
+        message = {'op': 'outbox_limits', 'args': outbox_limits(len(self._workers) + 1, nodes)}
+        for worker in self._workers.values():
+            try:
+                self._send(worker, message)
+            except OSError:
+                pass  # A restarted worker starts with the new share
+
+    def is_running(self, user_id: int, session_phone: str) -> bool:
+        return (user_id, session_phone) in self._worker_for(user_id, session_phone).sessions
+
+    async def start(self, user_id: int, session_phone: str) -> bool:
+        started = await self.request(user_id, session_phone, 'start')
+        self._worker_for(user_id, session_phone).sessions.add((user_id, session_phone))
+        return started
+
+    async def stop(self, user_id: int, session_phone: str, wait: bool = False) -> bool:
+        """Stops the session's supervisor; with `wait` the reply comes once its client is disconnected."""
+        worker = self._worker_for(user_id, session_phone)
+        worker.sessions.discard((user_id, session_phone))
+        if wait:
+            return await self.request(user_id, session_phone, 'stop_and_wait', timeout=MONITOR_WORKER_SHUTDOWN_TIMEOUT)
+        return await self.request(user_id, session_phone, 'stop')
+
+    async def poll_status(self, user_id: int, session_phone: str, chat_id: int) -> Dict[str, Any]:
+        return await self.request(user_id, session_phone, 'poll_status', chat_id)
+
+    async def close(self):
+        """Asks every worker to stop its supervisors and exit, killing those that take too long."""
+        self._closing = True
+        for worker in self._workers.values():
+            try:
+                self._send(worker, {'op': 'shutdown'})
+            except OSError:
+                pass
+        for worker in self._workers.values():
+            await _wait_for_exit(worker.process, MONITOR_WORKER_SHUTDOWN_TIMEOUT)
+            if worker.process.is_alive():
+                logging.warning(f"Monitor worker {worker.worker_id} did not stop in time; terminating it.")
+                worker.process.terminate()
+                await _wait_for_exit(worker.process)
+        await asyncio.gather(*[w.reader for w in self._workers.values() if w.reader], return_exceptions=True)
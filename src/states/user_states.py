@@ -18,5 +18,13 @@ class ChatManagement(StatesGroup):
 
 class ChatSettings(StatesGroup):
     entering_frequency = State()
+    entering_min_frequency = State()
+    entering_max_frequency = State()
     entering_initial_fetch = State()
-    entering_autoclean = State()
\ No newline at end of file
+    entering_autoclean = State()
+    entering_deletion_budget = State()
+    entering_media_quota = State()
+    entering_deletion_digest = State()
+
+class SearchMessages(StatesGroup):
+    entering_query = State()
\ No newline at end of file
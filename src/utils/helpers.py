@@ -1,4 +1,7 @@
+import html
 import math
+import re
+from datetime import datetime, timezone
 
 from aiogram.types import CallbackQuery
 
@@ -27,4 +30,38 @@ def format_bytes(size_bytes: int | None) -> str:
     i = int(math.floor(math.log(size_bytes, 1024)))
     p = math.pow(1024, i)
     s = round(size_bytes / p, 2)
-    return f"{s} {size_name[i]}"
\ No newline at end of file
+    return f"{s} {size_name[i]}"
+
+def format_age(seconds: float) -> str:
+    """Short human-readable duration, e.g. '45s', '12m', '3h'."""
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m"
+    return f"{int(seconds // 3600)}h"
+
+def format_timestamp(ts: int | None, fmt: str = '%Y-%m-%d %H:%M:%S') -> str | None:
+    """Formats a stored epoch-seconds timestamp in UTC. Returns None when there is no timestamp.
+
+    Datetime text, written by an older bot and not yet converted by init_db, is accepted too.
+    """
+    if ts is None:
+        return None
+    if isinstance(ts, str) and not ts.isdigit():
+        dt = datetime.fromisoformat(ts)
+        return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).astimezone(timezone.utc).strftime(fmt)
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).strftime(fmt)
+
+def build_fts_query(text: str) -> str | None:
+    """Turns free user input into a safe FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+def render_snippet(snippet: str | None, open_marker: str, close_marker: str) -> str:
+    """HTML-escapes a search snippet and turns its highlight markers into bold tags."""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(open_marker, "<b>").replace(close_marker, "</b>")
\ No newline at end of file
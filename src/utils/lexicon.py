@@ -1,7 +1,7 @@
 LEXICON = {
     'start_message_no_sessions': "<b>Welcome to the Monitoring Bot!</b>\n\nYou don't have any connected accounts yet. Let's add your first one to get started.",
     'session_menu_title': "<b>🎛️ Session Management</b>\n\nSelect an account to manage or add a new one.",
-    'session_details_template': "<b>Account Details</b>\n\n👤 <b>Name:</b> {first_name} {last_name}\n📞 <b>Phone:</b> <code>{phone}</code>\n🆔 <b>User ID:</b> <code>{user_id}</code>\n\n<b>Connection:</b> {status}\n<b>Monitoring:</b> {monitoring_status}",
+    'session_details_template': "<b>Account Details</b>\n\n👤 <b>Name:</b> {first_name} {last_name}\n📞 <b>Phone:</b> <code>{phone}</code>\n🆔 <b>User ID:</b> <code>{user_id}</code>\n\n<b>Connection:</b> {status}\n<b>Monitoring:</b> {monitoring_status}\n\n<i>Profile checked {age} ago</i>",
     'my_chats_button': " monitored chats",
     'chat_list_title': "<b> monitored chats</b>\n\nHere is the list of chats and users you are monitoring with this account.",
     'chat_details_title': "<b>Managing Chat:</b> {chat_title}",
@@ -19,19 +19,38 @@ LEXICON = {
     'cancel_button': "❌ Cancel",
     'chat_settings_button': "⚙️ Settings",
     'chat_settings_title': "<b>⚙️ Settings for:</b> {chat_title}",
-    'chat_settings_menu_text': ("<b>Frequency:</b> {frequency}s\n" "<b>Initial Fetch:</b> {initial_fetch} msgs\n" "<b>DB Auto-Clean:</b> {autoclean_limit}\n" "<b>Download Media:</b> {download_media}\n" "<b>Detect Deletions:</b> {detect_deletions}"),
+    'chat_settings_menu_text': ("<b>Frequency:</b> {frequency}s\n" "<b>Adaptive Polling:</b> {adaptive_polling}\n" "<b>Effective Interval:</b> {effective_interval}\n" "<b>Initial Fetch:</b> {initial_fetch} msgs\n" "<b>DB Auto-Clean:</b> {autoclean_limit}\n" "<b>Download Media:</b> {download_media}\n" "<b>Media Quota:</b> {media_quota}\n" "<b>Detect Deletions:</b> {detect_deletions}\n" "<b>Deletion Alerts:</b> {deletion_alerts}\n" "<b>Deletion Check Budget:</b> {deletion_budget} API calls/cycle"),
     'autoclean_disabled_text': "Disabled",
     'autoclean_enabled_text': "{count} msgs",
+    'media_quota_disabled_text': "Unlimited",
+    'deletion_alerts_instant_text': "Instant",
+    'deletion_alerts_digest_text': "Digest every {minutes} min",
+    'media_quota_enabled_text': "{mb} MB",
     'on_text': "ON",
     'off_text': "OFF",
+    'adaptive_enabled_text': "ON ({min_interval}–{max_interval}s)",
+    'adaptive_event_driven_note': ", paces gap-filling polls only (new messages arrive as updates)",
+    'effective_interval_text': "{interval}s",
+    'effective_interval_unknown': "not polled yet",
     'set_frequency_button': "Set Frequency",
+    'toggle_adaptive_button': "Toggle Adaptive Polling",
+    'set_min_frequency_button': "Set Min Interval",
+    'set_max_frequency_button': "Set Max Interval",
     'set_initial_fetch_button': "Set Initial Fetch",
     'set_autoclean_button': "Set DB Auto-Clean",
     'toggle_media_button': "Toggle Media Download",
+    'set_media_quota_button': "Set Media Quota",
     'toggle_deletions_button': "Toggle Deletion Detection",
+    'set_deletion_budget_button': "Set Deletion Check Budget",
+    'set_deletion_digest_button': "Set Deletion Digest",
     'back_to_chat_details_button': "⬅️ Back to Chat Details",
     'prompt_frequency': "Please send the new check frequency in seconds (e.g., 10). Minimum is 5.",
+    'prompt_min_frequency': "Please send the shortest interval in seconds adaptive polling may use for this chat. Minimum is 5.",
+    'prompt_max_frequency': "Please send the longest interval in seconds adaptive polling may use for this chat (e.g., 300).",
     'prompt_initial_fetch': "Please send the number of messages to fetch when a chat is first added (e.g., 20).",
+    'prompt_deletion_budget': "Please send how many API requests this chat may spend on deletion checks per cycle. Each request checks up to 100 messages. Minimum is 1.",
+    'prompt_media_quota': "Please send the maximum size in MB of downloaded media to keep for this chat. The oldest files are removed first; files of deleted messages are kept longest. Send 0 for no limit.",
+    'prompt_deletion_digest': "Please send how many minutes deletions in this chat should be collected before one digest is sent. Send 0 to be notified right away.",
     'prompt_autoclean': "Please send the maximum number of messages to keep in the database for this chat. Send 0 to disable auto-cleaning.",
     'error_invalid_number': "⚠️ Please send a valid positive number.",
     'setting_updated_alert': "✅ Setting updated!",
@@ -40,6 +59,11 @@ LEXICON = {
     'deleted_text_content': "<b>Content:</b>\n<pre>{text}</pre>",
     'deleted_file_content': "<b>Attached File:</b> <code>{file_path}</code>",
     'deleted_media_only_content': "<i>(Message contained media but no text)</i>",
+    'deletion_summary_title': "<b>🗑️ {count} Messages Deleted</b>\nIn chat: <b>{chat_title}</b>\nMonitored by: <code>{session_phone}</code>\n",
+    'deletion_summary_item': "• <i>{date}</i>: {text}",
+    'deletion_summary_media_only': "<i>(media)</i>",
+    'deletion_summary_empty': "<i>(empty)</i>",
+    'deletion_summary_more': "…and {count} more. Full details are in the attached file.",
     'confirm_delete_prompt': "⚠️ <b>Are you sure?</b>\n\nDo you really want to delete the session for <b><code>{phone}</code></b>? This action cannot be undone.",
     'session_deleted_message': "✅ Session for <b><code>{phone}</code></b> has been successfully deleted.",
     'session_set_active_alert': "✅ Session for {phone} is now active.",
@@ -51,6 +75,7 @@ LEXICON = {
     'confirm_delete_chat_prompt': "⚠️ <b>Are you sure?</b>\n\nDo you really want to remove <b>{chat_title}</b> from the monitoring list? The account will remain in the chat, but the bot will stop tracking it.",
     'add_user_success': "✅ Successfully added user <b>{user_name}</b> to the monitoring list.",
     'add_chat_already_joined': "✅ This account is already a member of <b>{chat_title}</b>. Added to the monitoring list.",
+    'add_chat_session_elsewhere': "❌ This session is being monitored by another bot instance right now, so it cannot look up chats here. Try again later, or stop monitoring it first.",
     'prompt_api_id': "<b>Step 1: API ID</b>\n\nPlease send your <code>api_id</code>.",
     'prompt_api_hash': "<b>Step 2: API Hash</b>\n\nGreat! Now please send your <code>api_hash</code>.",
     'prompt_phone': "<b>Step 3: Phone Number</b>\n\nFinally, enter the phone number in international format.",
@@ -78,6 +103,7 @@ LEXICON = {
     'delete_button_kb': "⌫",
     'send_code_button': "➤ Send Code",
     'statistics_button': "📊 Statistics",
+    'refresh_session_button': "🔄 Refresh",
     'statistics_title': "<b>📊 Chat Statistics for {phone}</b>\n\nSelect a chat to view detailed stats. Use the buttons below to sort the list.",
     'no_stats_yet': "No messages have been logged for any chat yet. Statistics will appear here once monitoring begins.",
     'detailed_stats_title': "<b>📊 Statistics for:</b> {chat_title}",
@@ -99,4 +125,15 @@ LEXICON = {
     'sort_by_deleted': "Sort: Deletions",
     'sort_by_volume': "Sort: Volume",
     'sort_by_activity': "Sort: Activity",
+    'search_button': "🔎 Search Messages",
+    'search_chat_button': "🔎 Search in Chat",
+    'prompt_search_session': "🔎 Send the words to search for across all chats monitored by <code>{phone}</code>.",
+    'prompt_search_chat': "🔎 Send the words to search for in <b>{chat_title}</b>.",
+    'search_invalid_query': "⚠️ Please send at least one word to search for.",
+    'search_results_title': "<b>🔎 Results for:</b> <code>{query}</code>\n<i>Page {page}, best matches first</i>",
+    'search_no_results': "<b>🔎 No messages match</b> <code>{query}</code>.",
+    'search_result_item': "<b>{chat_title}</b> · {date}{deleted_mark}\n{snippet}",
+    'search_deleted_mark': " · 🗑️ deleted",
+    'search_expired': "This search has expired. Please start a new one.",
+    'new_search_button': "🔎 New Search",
 }
\ No newline at end of file
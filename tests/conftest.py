@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+os.environ["DB_FILE"] = str(Path(tempfile.mkdtemp(prefix="tmb_test_")) / "test.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config import DB_FILE  # noqa: E402
+from src.database.connection import close_pool  # noqa: E402
+from src.database.executor import shutdown_executor  # noqa: E402
+from src.database.migrations import init_db  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """A freshly migrated database file for every test."""
+    init_db()
+    yield DB_FILE
+    shutdown_executor()
+    close_pool()
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{DB_FILE}{suffix}").unlink(missing_ok=True)
@@ -0,0 +1,47 @@
+import asyncio
+
+from src.config import DELETION_SUMMARY_PREVIEW
+from src.services.deletion_notifier import CAPTION_MAX_LENGTH, format_deletion_summary
+
+
+def test_summary_of_long_messages_fits_in_a_caption():
+    deleted = [{'telethon_message_id': i, 'date': 1704164645, 'text': "<&>" * 200} for i in range(DELETION_SUMMARY_PREVIEW + 5)]
+
+    summary = format_deletion_summary("+10000000000", "chat & co" * 10, deleted)
+
+    assert len(summary) <= CAPTION_MAX_LENGTH
+    assert summary.count("•") >= 1
+    assert f"and {len(deleted) - summary.count('•')} more" in summary
+
+
+def test_deletions_lost_before_sending_are_sent_after_a_restart():
+    from src.database import queries
+    from src.services import deletion_notifier, monitoring
+
+    user_id, phone, chat_id = 1, "+10000000000", 2
+    queries.db_add_chat(user_id, phone, chat_id, "chat", "group")
+    queries.db_add_messages(phone, chat_id, [(7, "gone", 42, 1704164645, None, None)])
+    queries.db_mark_messages_as_deleted([row['id'] for row in queries.db_get_active_messages_by_ids(phone, [7])])  # ...and the process dies before the notification goes out
+
+    class FakeBot:
+        def __init__(self):
+            self.sent = []
+
+        async def send_message(self, user_id, text):
+            self.sent.append((user_id, text))
+
+    async def restart():
+        bot = FakeBot()
+        notifier = deletion_notifier._notifier = deletion_notifier.DeletionNotifier()
+        try:
+            await monitoring.resend_pending_deletions(bot, user_id, phone)
+            await monitoring.resend_pending_deletions(bot, user_id, phone)
+            await notifier.flush()
+        finally:
+            deletion_notifier._notifier = None
+        return bot.sent
+
+    sent = asyncio.run(restart())
+
+    assert len(sent) == 1 and "gone" in sent[0][1]
+    assert queries.db_get_pending_deletion_notices(user_id, phone) == []
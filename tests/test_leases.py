@@ -0,0 +1,141 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.database import queries
+from src.services import leases
+from src.services.leases import LeaseManager
+
+USER_ID = 1
+SESSIONS = [(USER_ID, f"+1555000000{i}") for i in range(4)]
+TTL = leases.LEASE_TTL
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(leases, 'time', SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+@pytest.fixture
+def sessions():
+    for user_id, phone in SESSIONS:
+        queries.db_add_session_credentials(user_id, phone, 1, "hash")
+        queries.db_set_monitoring_enabled(user_id, phone, True)
+    return SESSIONS
+
+
+class Node:
+    """A LeaseManager whose supervisors only record which sessions run on it."""
+
+    def __init__(self, node_id: str):
+        self.running = set()
+        self.live_nodes = []
+        self.manager = LeaseManager(node_id, self.launch, self.halt, on_live_nodes=self.live_nodes.append)
+
+    async def launch(self, user_id, session_phone):
+        self.running.add((user_id, session_phone))
+
+    async def halt(self, user_id, session_phone):
+        self.running.remove((user_id, session_phone))
+
+
+def test_claim_renew_expire_and_takeover():
+    key = (USER_ID, "+15550000000")
+    now = 1_000_000.0
+    assert queries.db_claim_lease(*key, "a", now, now + TTL)
+    assert queries.db_claim_lease(*key, "a", now, now + TTL)  # Re-claiming its own lease
+    assert not queries.db_claim_lease(*key, "b", now + 1, now + 1 + TTL)
+
+    assert queries.db_renew_leases("a", now + TTL - 1, now + 2 * TTL - 1) == [key]
+    assert not queries.db_claim_lease(*key, "b", now + TTL + 1, now + 2 * TTL + 1)  # Renewed, still held
+
+    later = now + 3 * TTL
+    assert queries.db_claim_lease(*key, "b", later, later + TTL)  # Expired: taken over
+    assert queries.db_renew_leases("a", later, later + TTL) == []
+    assert queries.db_renew_leases("b", later, later + TTL) == [key]
+
+    queries.db_release_leases("b", [key])
+    assert queries.db_claim_lease(*key, "a", later, later + TTL)
+
+
+def test_nodes_split_sessions_evenly(clock, sessions):
+    a, b = Node("a"), Node("b")
+
+    async def scenario():
+        await a.manager.heartbeat()
+        assert a.running == set(sessions)
+        assert a.live_nodes == []  # Still the single node it assumed
+
+        await b.manager.heartbeat()  # Joins; everything is still leased by a
+        assert b.running == set()
+        await a.manager.heartbeat()  # Hands its excess over
+        await b.manager.heartbeat()
+        assert len(a.running) == len(b.running) == 2
+        assert not a.running & b.running
+        assert a.live_nodes == [2] and b.live_nodes == [2]
+
+    asyncio.run(scenario())
+
+
+def test_sessions_of_a_crashed_node_are_taken_over(clock, sessions):
+    a, b = Node("a"), Node("b")
+
+    async def scenario():
+        await a.manager.heartbeat()
+        await b.manager.heartbeat()
+        clock.value += TTL + 1  # a is gone: its registration and leases expire
+        await b.manager.heartbeat()
+        assert b.running == set(sessions)
+        assert b.live_nodes == [2, 1]
+
+        restarted = Node("a")
+        await restarted.manager.heartbeat()
+        assert restarted.running == set()
+
+    asyncio.run(scenario())
+
+
+def test_a_stalled_node_stops_sessions_taken_over_meanwhile(clock, sessions):
+    a, b = Node("a"), Node("b")
+
+    async def scenario():
+        await a.manager.heartbeat()
+        clock.value += TTL + 1  # a misses its heartbeats, b claims the expired leases
+        await b.manager.heartbeat()
+        assert b.running == set(sessions)
+
+        await a.manager.heartbeat()
+        assert a.running == set()
+        assert a.manager.owned == set()
+
+    asyncio.run(scenario())
+
+
+def test_drain_hands_sessions_over_at_once(clock, sessions):
+    a, b = Node("a"), Node("b")
+
+    async def scenario():
+        await a.manager.heartbeat()
+        await b.manager.heartbeat()
+        await a.manager.drain()
+        assert a.running == set()
+        await b.manager.heartbeat()
+        assert b.running == set(sessions)
+
+    asyncio.run(scenario())
+
+
+def test_stopped_sessions_are_released(clock, sessions):
+    a = Node("a")
+
+    async def scenario():
+        await a.manager.heartbeat()
+        queries.db_set_monitoring_enabled(*sessions[0], False)
+        await a.manager.heartbeat()
+        assert a.running == set(sessions[1:])
+        assert queries.db_claim_lease(*sessions[0], "b", clock.value, clock.value + TTL)
+
+    asyncio.run(scenario())
@@ -0,0 +1,99 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+from src.services import media_pipeline
+from src.services.media_pipeline import MediaPipeline
+
+
+class DirectGovernor:
+    async def call(self, func, *args, priority=None, **kwargs):
+        return await func(*args, **kwargs)
+
+
+def test_one_download_per_file_while_others_wait(monkeypatch):
+    active, peak = 0, 0
+
+    async def download(chat_id, msg):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return Path("/nonexistent.part"), "ab" * 32, 1
+
+    async def not_known(*args):
+        return False
+
+    async def stored(*args):
+        return True
+
+    monkeypatch.setattr(media_pipeline, 'db_link_known_media', not_known)
+    monkeypatch.setattr(media_pipeline, 'db_store_media', stored)
+    monkeypatch.setattr(media_pipeline, 'telegram_media_id', lambda msg: "document:1")
+    monkeypatch.setattr(media_pipeline.utils, 'get_extension', lambda media: ".bin")
+    monkeypatch.setattr(media_pipeline, '_move_into_store', lambda source, store_path: None)
+
+    async def run():
+        pipeline = MediaPipeline(None, DirectGovernor(), "+10000000000")
+        monkeypatch.setattr(pipeline, '_download', download)
+        msg = SimpleNamespace(media=None)
+
+        async def late_store():
+            await asyncio.sleep(0.07)  # The first download is done, the second one is running
+            await pipeline._store(1, 3, msg)
+
+        await asyncio.gather(pipeline._store(1, 1, msg), pipeline._store(1, 2, msg), late_store())
+        return pipeline
+
+    pipeline = asyncio.run(run())
+    assert peak == 1
+    assert pipeline.stats['downloaded'] == 3
+    assert pipeline._media_locks == {}
+
+
+def test_download_resumes_from_the_last_complete_chunk(monkeypatch, tmp_path):
+    chunk_size = media_pipeline.MEDIA_CHUNK_SIZE
+    content = bytes(range(256)) * (chunk_size * 3 // 256)
+    offsets = []
+
+    class FakeClient:
+        async def iter_download(self, media, offset, request_size):
+            offsets.append(offset)
+            for start in range(offset, len(content), request_size):
+                yield content[start:start + request_size]
+
+    monkeypatch.setattr(media_pipeline, 'PARTIAL_DIR', tmp_path)
+    partial = tmp_path / "10000000000_1_7.part"
+    partial.write_bytes(content[:chunk_size] + b"torn second chunk")
+
+    pipeline = MediaPipeline(FakeClient(), DirectGovernor(), "+10000000000")
+    path, content_hash, size = asyncio.run(pipeline._download(1, SimpleNamespace(id=7, media=None)))
+
+    assert offsets == [chunk_size]
+    assert path.read_bytes() == content
+    assert size == len(content)
+    assert content_hash == media_pipeline.hashlib.sha256(content).hexdigest()
+
+
+def test_orphan_sweep_unlinks_after_commit_and_new_files_get_new_paths(monkeypatch, tmp_path):
+    from src.database import queries
+
+    monkeypatch.setattr(media_pipeline, 'MEDIA_STORE_DIR', tmp_path)
+    queries.db_add_chat(1, "+10000000000", 1, "chat", "group")
+    queries.db_add_messages("+10000000000", 1, [(1, "photo", 42, 0, None, None)], pending_media={1})
+
+    old_path = media_pipeline.media_store_path("ab" * 32, ".jpg")
+    media_pipeline._move_into_store(_write(tmp_path / "a.part"), old_path)
+    assert queries.db_store_media("+10000000000", 1, 1, "photo:1", "ab" * 32, 4, str(old_path))
+    assert queries.db_evict_media(1 << 30)[0] == 1  # The only reference goes away
+
+    new_path = media_pipeline.media_store_path("ab" * 32, ".jpg")
+    assert new_path != old_path
+    assert asyncio.run(media_pipeline.sweep_orphan_media()) == 1
+    assert not old_path.exists()
+
+
+def _write(path):
+    path.write_bytes(b"data")
+    return path
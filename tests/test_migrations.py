@@ -0,0 +1,62 @@
+from src.database import queries
+from src.database.connection import get_pool
+from src.database.migrations import init_db
+from src.utils.helpers import format_timestamp
+
+PHONE, CHAT_ID = "+10000000000", 2
+
+
+def test_init_db_converts_text_dates_written_after_migration():
+    queries.db_add_chat(1, PHONE, CHAT_ID, "chat", "group")
+    with get_pool().writer() as conn:  # What an older bot writes: str(datetime)
+        conn.execute(
+            "INSERT INTO messages (telethon_message_id, chat_id, session_phone, text, date) VALUES (1, ?, ?, 'hi', '2024-01-02 03:04:05+00:00')",
+            (CHAT_ID, PHONE)
+        )
+
+    init_db()
+
+    with get_pool().reader() as conn:
+        date, kind = conn.execute("SELECT date, typeof(date) FROM messages").fetchone()
+        first_ts = conn.execute("SELECT first_message_ts FROM chat_stats").fetchone()[0]
+    assert kind == 'integer'
+    assert format_timestamp(date) == '2024-01-02 03:04:05'
+    assert format_timestamp(first_ts) == '2024-01-02 03:04:05'
+
+
+def test_text_date_check_reads_only_the_partial_index():
+    with get_pool().reader() as conn:
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT 1 FROM messages WHERE typeof(date) = 'text' LIMIT 1").fetchall()
+        pending = conn.execute("SELECT COUNT(*) FROM messages INDEXED BY idx_messages_text_date WHERE typeof(date) = 'text'").fetchone()[0]
+    assert 'idx_messages_text_date' in plan[0][3]
+    assert pending == 0
+
+
+def test_format_timestamp_accepts_unconverted_text():
+    assert format_timestamp('2024-01-02 03:04:05+00:00') == '2024-01-02 03:04:05'
+    assert format_timestamp('2024-01-02 03:04:05') == '2024-01-02 03:04:05'
+    assert format_timestamp(1704164645) == '2024-01-02 03:04:05'
+
+
+def test_search_index_backfill_covers_existing_messages(tmp_path):
+    from src.database import migrations
+    from src.database.connection import ConnectionPool
+    from src.utils.helpers import build_fts_query
+
+    pool = ConnectionPool(tmp_path / "old.db")
+    try:
+        for target, _, migrate in migrations.MIGRATIONS[:3]:
+            migrate(pool)
+            migrations._set_version(pool, target)
+        with pool.writer() as conn:
+            conn.execute("INSERT INTO messages (telethon_message_id, chat_id, session_phone, text, date) VALUES (1, 2, ?, 'archived text', 0)", (PHONE,))
+
+        assert migrations.run_migrations(pool) == migrations.MIGRATIONS[-1][0]
+        with pool.reader() as conn:
+            hits = conn.execute(
+                "SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?",
+                (f'session_phone : "{PHONE}" AND text : ({build_fts_query("archiv")})',)
+            ).fetchall()
+        assert len(hits) == 1
+    finally:
+        pool.close()
@@ -0,0 +1,35 @@
+from src.database import queries
+from src.utils.helpers import build_fts_query
+
+USER_ID = 1
+
+
+def add(phone, chat_id, texts):
+    queries.db_add_chat(USER_ID, phone, chat_id, f"chat {chat_id}", "group")
+    queries.db_add_messages(phone, chat_id, [(i, text, 42, 0, None, None) for i, text in enumerate(texts, 1)])
+
+
+def test_search_only_returns_the_sessions_messages():
+    add("+10000000001", 1, ["deleted evidence", "other words", "evidence again"])
+    add("+10000000002", 2, ["evidence elsewhere"] * 50)
+
+    hits = queries.db_search_messages(USER_ID, "+10000000001", build_fts_query("evid"), 10, 0)
+    assert sorted(h['telethon_message_id'] for h in hits) == [1, 3]
+    assert all(h['chat_id'] == 1 for h in hits)
+
+
+def test_query_terms_do_not_match_the_session_column():
+    add("+10000000001", 1, ["call me", "10000000001"])
+
+    hits = queries.db_search_messages(USER_ID, "+10000000001", build_fts_query("10000000001"), 10, 0)
+    assert [h['telethon_message_id'] for h in hits] == [2]
+
+
+def test_index_follows_text_edits_and_deletes():
+    add("+10000000001", 1, ["before"])
+    from src.database.connection import writer
+    with writer() as conn:
+        conn.execute("UPDATE messages SET text='after' WHERE telethon_message_id=1")
+
+    assert queries.db_search_messages(USER_ID, "+10000000001", build_fts_query("before"), 10, 0) == []
+    assert len(queries.db_search_messages(USER_ID, "+10000000001", build_fts_query("after"), 10, 0)) == 1
@@ -0,0 +1,70 @@
+from src.services.sharding import HashRing, outbox_limits
+
+SESSIONS = [(user_id, f"+1555{i:06d}") for user_id in range(1, 5) for i in range(1000)]
+
+
+def assignment(ring):
+    return {session: ring.node_for(*session) for session in SESSIONS}
+
+
+def test_assignment_is_deterministic():
+    assert assignment(HashRing(range(4))) == assignment(HashRing([3, 2, 1, 0]))
+
+
+def test_sessions_are_spread_evenly():
+    counts = {}
+    for node in assignment(HashRing(range(4))).values():
+        counts[node] = counts.get(node, 0) + 1
+    assert set(counts) == {0, 1, 2, 3}
+    assert all(abs(count - len(SESSIONS) / 4) < len(SESSIONS) / 4 * 0.3 for count in counts.values())
+
+
+def test_adding_a_node_only_moves_sessions_to_it():
+    before, after = assignment(HashRing(range(4))), assignment(HashRing(range(5)))
+    moved = [session for session in SESSIONS if before[session] != after[session]]
+    assert all(after[session] == 4 for session in moved)
+    assert len(moved) < len(SESSIONS) / 5 * 1.3
+
+
+def test_removing_a_node_only_moves_its_sessions():
+    before, after = assignment(HashRing(range(4))), assignment(HashRing([0, 1, 3]))
+    moved = [session for session in SESSIONS if before[session] != after[session]]
+    assert moved and all(before[session] == 2 for session in moved)
+    assert all(after[session] != 2 for session in SESSIONS)
+
+
+def test_outbox_limits_split_the_global_limit():
+    rate, burst = outbox_limits(1)
+    assert outbox_limits(4) == (rate / 4, max(1, burst // 4))
+    assert outbox_limits(2, nodes=3) == outbox_limits(6)
+
+
+def test_ui_action_waits_for_a_connecting_supervisor(monkeypatch):
+    import asyncio
+
+    from src.services import client_registry
+
+    class FakeClient:
+        def is_connected(self):
+            return True
+
+    async def whoami(client):
+        return client
+
+    async def load_session(user_id, session_phone):
+        raise AssertionError("a second client was opened")
+
+    monkeypatch.setattr(client_registry, 'load_session', load_session)
+
+    async def scenario():
+        live = FakeClient()
+        client_registry.expect_live_client(1, "+1")
+        action = asyncio.create_task(client_registry.run_with_client(1, "+1", whoami))
+        await asyncio.sleep(0.01)
+        client_registry.register_live_client(1, "+1", live)
+        try:
+            return await action is live
+        finally:
+            client_registry.unregister_live_client(1, "+1", live)
+
+    assert asyncio.run(scenario())
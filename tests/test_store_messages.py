@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from src.database import queries
+from src.services import monitoring
+
+USER_ID, PHONE, CHAT_ID = 1, "+10000000000", 2
+SETTINGS = {'download_media': True}
+
+
+class FakeMedia:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, chat_id, message_id, message):
+        self.submitted.append(message_id)
+
+
+def make_messages(first_id: int, last_id: int) -> list:
+    now = datetime.now(timezone.utc)
+    return [
+        SimpleNamespace(id=i, text=f"message {i}", sender_id=42, date=now, media=None)
+        for i in range(first_id, last_id + 1)
+    ]
+
+
+@pytest.fixture
+def task_key():
+    queries.db_add_chat(USER_ID, PHONE, CHAT_ID, "chat", "group")
+    key = (USER_ID, PHONE)
+    monitoring.monitoring_tasks[key] = {
+        'cursors': {}, 'ingest_locks': {}, 'metrics': monitoring.new_ingest_metrics(), 'media': FakeMedia(),
+        'chats': {CHAT_ID: {}}
+    }
+    yield key
+    del monitoring.monitoring_tasks[key]
+
+
+def store(key, messages, source):
+    return asyncio.run(monitoring.store_messages(key, CHAT_ID, SETTINGS, messages, source))
+
+
+def test_push_does_not_skip_unpolled_backlog(task_key):
+    assert store(task_key, make_messages(1, 100), 'polled') == 100
+    assert store(task_key, make_messages(151, 151), 'pushed') == 1
+    assert monitoring.monitoring_tasks[task_key]['cursors'][CHAT_ID] == 100
+    assert queries.db_get_last_message_id(PHONE, CHAT_ID) == 100
+
+    assert store(task_key, make_messages(101, 151), 'polled') == 50
+    assert queries.db_count_chat_messages(PHONE, CHAT_ID) == 151
+    assert monitoring.monitoring_tasks[task_key]['cursors'][CHAT_ID] == 151
+    assert queries.db_get_last_message_id(PHONE, CHAT_ID) == 151
+
+
+def test_poll_fills_holes_between_pushes(task_key):
+    store(task_key, make_messages(1, 10), 'polled')
+    for message_id in (13, 17, 20):
+        store(task_key, make_messages(message_id, message_id), 'pushed')
+
+    assert store(task_key, make_messages(11, 20), 'polled') == 7
+    assert queries.db_count_chat_messages(PHONE, CHAT_ID) == 20
+    metrics = monitoring.monitoring_tasks[task_key]['metrics']
+    assert (metrics['pushed_messages'], metrics['polled_messages']) == (3, 17)
+
+
+def test_duplicates_are_neither_stored_nor_downloaded_twice(task_key, monkeypatch):
+    monkeypatch.setattr(monitoring, 'has_downloadable_media', lambda msg: True)
+    store(task_key, make_messages(1, 5), 'polled')
+    store(task_key, make_messages(6, 6), 'pushed')
+    store(task_key, make_messages(6, 6), 'pushed')
+    store(task_key, make_messages(6, 8), 'polled')
+
+    assert queries.db_count_chat_messages(PHONE, CHAT_ID) == 8
+    assert monitoring.monitoring_tasks[task_key]['media'].submitted == list(range(1, 9))
+
+
+def test_pushed_messages_count_towards_the_poll_rate(task_key):
+    store(task_key, make_messages(1, 10), 'polled')
+    for message_id in (11, 12, 13):
+        store(task_key, make_messages(message_id, message_id), 'pushed')
+    store(task_key, make_messages(13, 13), 'pushed')  # Duplicate update
+
+    status = monitoring.monitoring_tasks[task_key]['chats'][CHAT_ID]
+    assert status['pushed_since_poll'] == 3